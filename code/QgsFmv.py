@@ -34,6 +34,7 @@ from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction, QHBoxLayout, QSizePolicy
 from QGIS_FMV.about.QgsFmvAbout import FmvAbout
 from QGIS_FMV.manager.QgsManager import FmvManager
+from QGIS_FMV.utils.QgsFmvLayers import DisposeVideoLayers
 from QGIS_FMV.utils.QgsFmvLog import log
 from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
 from qgis.core import QgsApplication
@@ -120,6 +121,7 @@ class Fmv:
             self.actionAbout,
         )
         self.iface.removeToolBarIcon(self.actionFMV)
+        DisposeVideoLayers()
         log.removeLogging()
 
     def About(self):
@@ -11,6 +11,17 @@ parser.read(fileConfig)
 ffmpegConf = parser["GENERAL"]["ffmpeg"]
 DemConf = parser["GENERAL"]["DTM_file"]
 min_buffer_size = int(parser["GENERAL"]["min_buffer_size"])
+max_buffer_size = int(parser["GENERAL"].get("max_buffer_size", 30))
+prefetch_workers = int(parser["GENERAL"].get("prefetch_workers", 2))
+ingest_workers = int(parser["GENERAL"].get("ingest_workers", 0))
+max_refresh_rate = float(parser["GENERAL"].get("max_refresh_rate", 10))
+trajectory_chunk_size = int(parser["GENERAL"].get("trajectory_chunk_size", 1000))
+trajectory_min_interval = float(parser["GENERAL"].get("trajectory_min_interval", 0))
+trajectory_tolerance = float(parser["GENERAL"].get("trajectory_tolerance", 0))
+footprint_max_gap = float(parser["GENERAL"].get("footprint_max_gap", 2000))
+live_queue_size = int(parser["GENERAL"].get("live_queue_size", 50))
+live_latest = parser["GENERAL"].getboolean("live_latest", True)
+live_demux = parser["GENERAL"].getboolean("live_demux", True)
 
 Platform_lyr = parser["LAYERS"]["Platform_lyr"]
 Beams_lyr = parser["LAYERS"]["Beams_lyr"]
@@ -24,6 +35,8 @@ frames_g = parser["LAYERS"]["frames_g"]
 Trajectory_lyr = parser["LAYERS"]["Trajectory_lyr"]
 epsg = parser["LAYERS"]["epsg"]
 Reverse_geocoding_url = parser["GENERAL"]["Reverse_geocoding_url"]
+geocode_precision = int(parser["GENERAL"].get("geocode_precision", 2))
+geocode_timeout = float(parser["GENERAL"].get("geocode_timeout", 10))
 dtm_buffer = int(parser["GENERAL"]["DTM_buffer_size"])
 
 # Geo variables
@@ -0,0 +1,667 @@
+import mmap
+import os
+import threading
+
+import numpy as np
+
+from QGIS_FMV.QgsFmvConstants import KlvHeaderKeyOther, UASLocalMetadataSet
+from QGIS_FMV.klvdata.QgsFmvMpegTs import (
+    AU_CELL_HEADER_SIZE,
+    KLV_STREAM_TYPE,
+    PAT_PID,
+    PTS_PER_MS,
+    PTS_WRAP,
+    TS_PACKET_SIZE,
+    TS_SYNC,
+    _section,
+    parsePat,
+    parsePesHeader,
+    parsePmt,
+    ptsToMs,
+)
+from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
+from QGIS_FMV.utils.QgsFmvUtils import (
+    _spawn,
+    getVideoCacheFolder,
+    getVideoFingerprint,
+)
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+# Video PES packets read to find the start of the first GOP
+GOP_SCAN_SIZE = 120
+
+
+class FfprobePacketParser:
+    """Incremental parser for the default output of
+    ffprobe -show_packets -show_data.
+
+    Packets are yielded as (stream_index, pts, data) tuples, with pts in
+    seconds (None if the packet has no timestamp). The container start time
+    is stored in start_time once the [FORMAT] section has been read, and
+    every [STREAM] section is added to streams as a dict of its fields.
+    """
+
+    def __init__(self):
+        self.start_time = None
+        self.streams = []
+
+    @staticmethod
+    def _float(value):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    def parse(self, lines):
+        """ Yield packets from an iterable of output lines (bytes) """
+        section = None
+        stream_index = None
+        pts = dts = None
+        data = []
+        for line in lines:
+            line = line.rstrip(b"\r\n")
+            if line == b"[PACKET]":
+                section = "packet"
+                stream_index = pts = dts = None
+                data = []
+            elif line == b"[/PACKET]":
+                section = None
+                yield stream_index, pts if pts is not None else dts, b"".join(data)
+            elif line == b"[FORMAT]":
+                section = "format"
+            elif line == b"[/FORMAT]":
+                section = None
+            elif line == b"[STREAM]":
+                section = "stream"
+                self.streams.append({})
+            elif line == b"[/STREAM]":
+                section = None
+            elif section == "packet":
+                # Hexdump line : "00000000: 060e 2b34 ...  ..+4...."
+                if len(line) > 10 and line[8:10] == b": ":
+                    data.append(bytes.fromhex(line[10:51].decode("ascii")))
+                elif line.startswith(b"pts_time="):
+                    pts = self._float(line[9:])
+                elif line.startswith(b"dts_time="):
+                    dts = self._float(line[9:])
+                elif line.startswith(b"stream_index="):
+                    stream_index = int(line[13:])
+            elif section == "format" and line.startswith(b"start_time="):
+                self.start_time = self._float(line[11:])
+            elif section == "stream" and b"=" in line:
+                name, value = line.split(b"=", 1)
+                self.streams[-1][name.decode("ascii")] = value.decode(
+                    "utf-8", "replace"
+                )
+
+
+class KlvIndex:
+    """Time -> packet index of a video KLV data stream.
+
+    pts holds the presentation time of every packet in milliseconds (sorted),
+    offsets the position of every packet inside data (one extra entry for
+    the end of the last packet).
+    """
+
+    def __init__(self, pts, offsets, data):
+        self.pts = np.asarray(pts, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.data = bytes(data)
+
+    @classmethod
+    def fromPackets(cls, packets):
+        """Build the index from an iterable of (pts_ms, bytes) tuples.
+        Packets are sorted by time, keeping stream order for equal times.
+        """
+        packets = sorted(packets, key=lambda p: p[0])
+        pts = [p[0] for p in packets]
+        sizes = [len(p[1]) for p in packets]
+        offsets = np.zeros(len(packets) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        return cls(pts, offsets, b"".join(p[1] for p in packets))
+
+    def __len__(self):
+        return len(self.pts)
+
+    def packet(self, i):
+        """ Return packet bytes by position """
+        return self.data[self.offsets[i] : self.offsets[i + 1]]
+
+    def find(self, ms):
+        """ Return position of the last packet at or before ms """
+        return max(int(np.searchsorted(self.pts, ms, side="right")) - 1, 0)
+
+    def _range(self, ms, window):
+        """ Positions [start, end) of the packets returned by get """
+        start = self.find(ms)
+        end = max(int(np.searchsorted(self.pts, ms + window, side="left")), start + 1)
+        return start, end
+
+    def get(self, ms, window=0):
+        """Return the packet shown at ms followed by the packets
+        inside [ms, ms + window)
+        """
+        if not len(self):
+            return b""
+        start, end = self._range(ms, window)
+        return self.data[self.offsets[start] : self.offsets[end]]
+
+    def close(self):
+        """ Release the resources held by the index """
+
+    def save(self, path):
+        """ Save index to disk (npz) """
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                pts=self.pts,
+                offsets=self.offsets,
+                data=np.frombuffer(self.data, dtype=np.uint8),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """ Load index from disk (npz) """
+        with np.load(path) as f:
+            return cls(f["pts"], f["offsets"], f["data"].tobytes())
+
+
+class TsKlvIndex(KlvIndex):
+    """KlvIndex of a MPEG-TS file read in place.
+
+    The KLV PES packets are spread over TS packets of the file: rows holds
+    the file offset and sizes the size of every KLV TS packet payload.
+    Packet i is made of rows [first[i], end[i]), without its skip[i] bytes
+    of PES header and cut to lengths[i] bytes. The file is memory mapped,
+    so packets are read without any copy of the KLV stream in memory.
+    """
+
+    def __init__(self, videoPath, pts, first, end, skip, lengths, rows, sizes):
+        self.videoPath = videoPath
+        self.pts = np.asarray(pts, dtype=np.int64)
+        self.first = np.asarray(first, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.skip = np.asarray(skip, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.sizes = np.asarray(sizes, dtype=np.int64)
+        self._file = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._map is None:
+            self._file = open(self.videoPath, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def close(self):
+        """ Unmap the file, it is mapped again when a packet is read """
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._file.close()
+                self._map = self._file = None
+
+    def packet(self, i):
+        """ Return packet bytes by position """
+        rows = slice(self.first[i], self.end[i])
+        with self._lock:
+            data = self._open()
+            pes = b"".join(
+                data[offset : offset + size]
+                for offset, size in zip(
+                    self.rows[rows].tolist(), self.sizes[rows].tolist()
+                )
+            )
+        skip = self.skip[i]
+        return pes[skip : skip + self.lengths[i]]
+
+    def get(self, ms, window=0):
+        """Return the packet shown at ms followed by the packets
+        inside [ms, ms + window)
+        """
+        if not len(self):
+            return b""
+        start, end = self._range(ms, window)
+        return b"".join(self.packet(i) for i in range(start, end))
+
+    def save(self, path):
+        """ Save index to disk (npz), with the identity of the file it indexes """
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                pts=self.pts,
+                first=self.first,
+                end=self.end,
+                skip=self.skip,
+                lengths=self.lengths,
+                rows=self.rows,
+                sizes=self.sizes.astype(np.uint8),
+                mtime=os.stat(self.videoPath).st_mtime_ns,
+                fingerprint=getVideoFingerprint(self.videoPath),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, videoPath):
+        """ Load index from disk (npz), None if it is not the one of videoPath """
+        with np.load(path) as f:
+            if int(f["mtime"]) != os.stat(videoPath).st_mtime_ns or str(
+                f["fingerprint"]
+            ) != getVideoFingerprint(videoPath):
+                return None
+            return cls(
+                videoPath,
+                f["pts"],
+                f["first"],
+                f["end"],
+                f["skip"],
+                f["lengths"],
+                f["rows"],
+                f["sizes"],
+            )
+
+
+def _tsLayout(data):
+    """ (offset of the first TS packet, packet size) of a TS or M2TS file """
+    for size, prefix in ((TS_PACKET_SIZE, 0), (TS_PACKET_SIZE + 4, 4)):
+        for offset in range(prefix, min(len(data), size) + prefix):
+            if len(data) < offset + 2 * size + 1:
+                break
+            if (
+                data[offset] == TS_SYNC
+                and data[offset + size] == TS_SYNC
+                and data[offset + 2 * size] == TS_SYNC
+            ):
+                return offset, size
+    return None
+
+
+def _payload(packets, row):
+    """ Payload of a TS packet, after its adaptation field """
+    payload = bytes(packets[row, 4:])
+    if packets[row, 3] & 0x20:
+        payload = payload[1 + payload[0] :]
+    return payload
+
+
+def _firstSection(packets, pids, pid, tableId):
+    """ First PSI section of a table in the TS packets """
+    for row in np.flatnonzero((pids == pid) & (packets[:, 1] & 0x40 != 0)):
+        section = _section(_payload(packets, row), True)
+        if section is not None and section[0] == tableId:
+            return section
+    return None
+
+
+def _videoStart(packets, pids, pid):
+    """Smallest PTS of the first GOP of a video stream, None if it has no
+    PTS. With B-frames the first frame is not the first one shown. The
+    GOP ends at the next random access point, or after GOP_SCAN_SIZE PES
+    packets if they are not flagged.
+    """
+    rows = np.flatnonzero((pids == pid) & (packets[:, 1] & 0x40 != 0))
+    rows = rows[:GOP_SCAN_SIZE]
+    # random_access_indicator of the adaptation field
+    adaptation = (packets[rows, 3] & 0x20 != 0) & (packets[rows, 4] > 0)
+    randomAccess = np.flatnonzero(adaptation & (packets[rows, 5] & 0x40 != 0))
+    randomAccess = randomAccess[randomAccess > 0]
+    if len(randomAccess):
+        rows = rows[: randomAccess[0]]
+
+    start = None
+    for row in rows:
+        header = parsePesHeader(_payload(packets, row))
+        if header is None or header[1] is None:
+            continue
+        if start is None or ptsToMs(header[1], start) < 0:
+            start = header[1]
+    return start
+
+
+def scanTsFile(videoPath, klv_index=0):
+    """Index the KLV stream number klv_index of a MPEG-TS file without
+    ffmpeg. klv_index counts all the data streams, as ffprobe does.
+    Return a TsKlvIndex with times relative to the start of the video,
+    None if it is not a TS file or that stream is not KLV.
+    """
+    with open(videoPath, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            index = _scanTs(videoPath, np.frombuffer(mm, dtype=np.uint8), klv_index)
+            # The arrays must not hold the mapping when it is closed
+            return index
+
+
+def _scanTs(videoPath, data, klv_index):
+    layout = _tsLayout(data)
+    if layout is None:
+        return None
+    offset, size = layout
+    count = (len(data) - offset) // size
+    packets = np.lib.stride_tricks.as_strided(
+        data[offset:], shape=(count, TS_PACKET_SIZE), strides=(size, 1)
+    )
+    pids = (packets[:, 1].astype(np.int32) & 0x1F) << 8 | packets[:, 2]
+    pids[packets[:, 0] != TS_SYNC] = -1
+
+    # Streams of the first program
+    pat = _firstSection(packets, pids, PAT_PID, 0x00)
+    if pat is None:
+        return None
+    streams = {}
+    for pmtPid in sorted(parsePat(pat)):
+        pmt = _firstSection(packets, pids, pmtPid, 0x02)
+        if pmt is not None:
+            streams = parsePmt(pmt)
+            break
+    # ffprobe numbers the data streams in the PMT order
+    dataPids = [pid for pid, (kind, _) in streams.items() if kind != "video"]
+    videoPids = [pid for pid, (kind, _) in streams.items() if kind == "video"]
+    if klv_index >= len(dataPids) or streams[dataPids[klv_index]][0] != "klv":
+        return None
+    klvPid = dataPids[klv_index]
+
+    control = packets[:, 3] >> 4
+    selected = np.flatnonzero((pids == klvPid) & (control & 0x01 != 0))
+    starts = 4 + np.where(
+        control[selected] & 0x02, 1 + packets[selected, 4].astype(np.int64), 0
+    )
+    keep = starts < TS_PACKET_SIZE
+    selected = selected[keep]
+    starts = starts[keep]
+    rows = offset + selected.astype(np.int64) * size + starts
+    sizes = TS_PACKET_SIZE - starts
+    pesRows = np.flatnonzero(packets[selected, 1] & 0x40 != 0)
+    if not len(pesRows):
+        return None
+    # Rows before the first PES start belong to a packet cut by the file start
+    rows = rows[pesRows[0] :]
+    sizes = sizes[pesRows[0] :]
+    pesRows = pesRows - pesRows[0]
+
+    # PES headers, the first 14 bytes of each PES packet, expected to be in
+    # its first TS packet
+    headers = np.minimum(rows[pesRows][:, None] + np.arange(14), len(data) - 1)
+    headers = data[headers].astype(np.int64)
+    valid = (headers[:, 0] == 0) & (headers[:, 1] == 0) & (headers[:, 2] == 1)
+    valid &= sizes[pesRows] >= 14
+    first = pesRows
+    end = np.append(pesRows[1:], len(rows))
+    total = np.add.reduceat(sizes, pesRows)
+    pesLength = headers[:, 4] << 8 | headers[:, 5]
+    skip = 9 + headers[:, 8]
+    lengths = np.where(pesLength > 0, np.minimum(6 + pesLength, total), total) - skip
+    if streams[klvPid][1] == KLV_STREAM_TYPE:
+        skip += AU_CELL_HEADER_SIZE
+        lengths -= AU_CELL_HEADER_SIZE
+
+    hasPts = headers[:, 7] & 0x80 != 0
+    pts = (
+        ((headers[:, 9] >> 1) & 0x07) << 30
+        | headers[:, 10] << 22
+        | (headers[:, 11] >> 1) << 15
+        | headers[:, 12] << 7
+        | headers[:, 13] >> 1
+    )
+    keep = valid & (lengths > 0)
+    first, end, skip, lengths = first[keep], end[keep], skip[keep], lengths[keep]
+    pts, hasPts = pts[keep], hasPts[keep]
+    if not hasPts.any():
+        return None
+
+    # Packets without time stamp get the time of the previous one
+    last = np.maximum.accumulate(np.where(hasPts, np.arange(len(pts)), 0))
+    pts = pts[last]
+    pts[: np.argmax(hasPts)] = pts[np.argmax(hasPts)]
+
+    # Start of the video, as ffprobe start_time
+    origin = int(pts[0])
+    for pid in videoPids:
+        start = _videoStart(packets, pids, pid)
+        if start is not None:
+            if ptsToMs(start, origin) < 0:
+                origin = start
+            break
+    ms = ((pts - origin) % PTS_WRAP).astype(np.int64)
+    ms[ms >= PTS_WRAP // 2] -= PTS_WRAP
+    ms = np.round(ms / PTS_PER_MS).astype(np.int64)
+
+    order = np.argsort(ms, kind="stable")
+    return TsKlvIndex(
+        videoPath,
+        ms[order],
+        first[order],
+        end[order],
+        skip[order],
+        lengths[order],
+        rows,
+        sizes,
+    )
+
+
+def getKlvIndexPath(videoPath, klv_index=0):
+    """ Get path of the KLV index file of a video """
+    folder = getVideoCacheFolder(videoPath)
+    return os.path.join(folder, "klv_index_%d.npz" % klv_index)
+
+
+def buildKlvIndex(videoPath, klv_index=0, thread=None):
+    """Demux the whole KLV data stream with a single ffprobe pass and
+    return a KlvIndex with times relative to the start of the video, None
+    if ffprobe failed or found no packet.
+    The ffprobe process is kept in thread.process, so it can be killed.
+    """
+    p = _spawn(
+        [
+            "-v",
+            "quiet",
+            "-select_streams",
+            "d:" + str(klv_index),
+            "-show_packets",
+            "-show_data",
+            "-show_entries",
+            "packet=stream_index,pts_time,dts_time,data:format=start_time",
+            videoPath,
+        ],
+        t="probe",
+    )
+    if thread is not None:
+        thread.process = p
+        if thread.canceled:
+            thread.cancel()
+
+    parser = FfprobePacketParser()
+    packets = []
+    last = 0.0
+    for _, pts, data in parser.parse(p.stdout):
+        if pts is None:
+            pts = last
+        last = pts
+        if data:
+            packets.append((pts, data))
+    if p.wait() != 0 or not packets:
+        qgsu.showUserAndLogMessage(
+            "",
+            "ffprobe found no KLV packets, exit status: " + str(p.returncode),
+            onlyLog=True,
+        )
+        return None
+
+    start = parser.start_time or 0.0
+    return KlvIndex.fromPackets(
+        (int(round((pts - start) * 1000)), data) for pts, data in packets
+    )
+
+
+def selectKlvStream(streams, packets):
+    """Choose the KLV stream among the data streams of a video.
+    streams are the ffprobe stream dicts, packets (stream_index, data)
+    tuples. Return (data stream number, bytes of its packets), the first
+    stream with MISB keys in its packets or else the first one tagged as
+    KLV. None if there is no KLV stream.
+    """
+    data = [s for s in streams if s.get("codec_type") == "data"]
+    data.sort(key=lambda s: int(s.get("index", 0)))
+    content = {}
+    for stream_index, packet in packets:
+        content.setdefault(stream_index, []).append(packet)
+
+    tagged = None
+    for i, stream in enumerate(data):
+        raw = b"".join(content.get(int(stream.get("index", -1)), []))
+        if UASLocalMetadataSet in raw or KlvHeaderKeyOther in raw:
+            return i, raw
+        if raw:
+            qgsu.showUserAndLogMessage(
+                "", "skipping stream " + str(i) + " not a klv stream.", onlyLog=True
+            )
+        if tagged is None and (
+            stream.get("codec_tag_string", "").upper() == "KLVA"
+            or stream.get("codec_name") in ("klv", "smpte_klv")
+        ):
+            tagged = i, raw
+    return tagged
+
+
+def probeKlvStream(videoPath, seconds=1):
+    """Find the KLV data stream of a video with a single ffprobe pass over
+    all its data streams. Return (data stream number, bytes of its first
+    seconds of packets), None if there is no KLV stream.
+    """
+    p = _spawn(
+        [
+            "-v",
+            "quiet",
+            "-select_streams",
+            "d",
+            "-read_intervals",
+            "%+" + str(seconds),
+            "-show_streams",
+            "-show_packets",
+            "-show_data",
+            "-show_entries",
+            "packet=stream_index,data:"
+            "stream=index,codec_type,codec_name,codec_tag_string",
+            videoPath,
+        ],
+        t="probe",
+    )
+
+    parser = FfprobePacketParser()
+    packets = [(i, data) for i, _, data in parser.parse(p.stdout) if data]
+    p.wait()
+    return selectKlvStream(parser.streams, packets)
+
+
+def loadKlvIndex(videoPath, klv_index=0):
+    """ Load the KLV index from the video cache, None if not cached """
+    path = getKlvIndexPath(videoPath, klv_index)
+    if os.path.exists(path):
+        try:
+            with np.load(path) as f:
+                inPlace = "rows" in f.files
+            if inPlace:
+                # None if the file changed since it was indexed
+                index = TsKlvIndex.load(path, videoPath)
+            else:
+                index = KlvIndex.load(path)
+            # An empty index is never saved, build it again
+            if index is not None and len(index):
+                return index
+        except Exception as e:
+            qgsu.showUserAndLogMessage(
+                "", "Invalid KLV index, rebuilding it: " + str(e), onlyLog=True
+            )
+    return None
+
+
+def loadOrBuildKlvIndex(videoPath, klv_index=0, thread=None):
+    """Load the KLV index from the video cache or build and save it.
+    Return None if the KlvIndexThread thread was canceled or no packet was
+    indexed, nothing is saved.
+    """
+    index = loadKlvIndex(videoPath, klv_index)
+    if index is not None:
+        return index
+
+    # MPEG-TS files are indexed in place, without ffprobe
+    try:
+        index = scanTsFile(videoPath, klv_index)
+    except Exception as e:
+        index = None
+        qgsu.showUserAndLogMessage(
+            "", "MPEG-TS scan failed, using ffprobe: " + str(e), onlyLog=True
+        )
+    if index is None:
+        index = buildKlvIndex(videoPath, klv_index, thread)
+    if index is None or not len(index) or (thread is not None and thread.canceled):
+        return None
+    try:
+        index.save(getKlvIndexPath(videoPath, klv_index))
+    except OSError as e:
+        qgsu.showUserAndLogMessage(
+            "", "KLV index could not be saved: " + str(e), onlyLog=True
+        )
+    return index
+
+
+class KlvIndexThread(threading.Thread):
+    """Build the KLV index in other thread.
+    A cached index is loaded right away, so it is ready before start().
+    """
+
+    def __init__(self, video_path, klv_index=0):
+        self.video_path = video_path
+        self.klv_index = klv_index
+        self.index = loadKlvIndex(video_path, klv_index)
+        # ffprobe process building the index
+        self.process = None
+        self.canceled = False
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def cancel(self):
+        """ Stop building the index, kill the ffprobe process """
+        self.canceled = True
+        if self.process is not None:
+            try:
+                self.process.kill()
+            except OSError:
+                # can't kill a dead proc
+                pass
+
+    def run(self):
+        if self.index is not None:
+            return
+        try:
+            index = loadOrBuildKlvIndex(self.video_path, self.klv_index, self)
+            if self.canceled:
+                qgsu.showUserAndLogMessage(
+                    "", "KLV index build canceled.", onlyLog=True
+                )
+                return
+            if index is None:
+                qgsu.showUserAndLogMessage(
+                    "", "KLV index not available, buffering by windows.", onlyLog=True
+                )
+                return
+            self.index = index
+            qgsu.showUserAndLogMessage(
+                "",
+                "KLV index ready: " + str(len(self.index)) + " packets.",
+                onlyLog=True,
+            )
+        except Exception as e:
+            qgsu.showUserAndLogMessage(
+                "", "KLV index build failed: " + str(e), onlyLog=True
+            )
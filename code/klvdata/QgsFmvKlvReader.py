@@ -1,17 +1,26 @@
-from queue import Queue, Empty
+from bisect import bisect_right, insort
+from collections import deque
+from heapq import heapify, heappop, heappush
+import ipaddress
+import socket
 import threading
-import collections
 import subprocess
+import time
 from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
 from QGIS_FMV.utils.QgsFmvUtils import (
     _spawn,
 )
-
-from datetime import datetime
+from QGIS_FMV.klvdata.QgsFmvKlvIndex import KlvIndexThread
+from QGIS_FMV.klvdata.QgsFmvMpegTs import TS_SYNC, TsDemuxer, ptsToMs
 
 from QGIS_FMV.QgsFmvConstants import (
     isWindows,
     min_buffer_size,
+    max_buffer_size,
+    prefetch_workers,
+    live_queue_size,
+    live_latest,
+    live_demux,
     ffmpeg_path,
     ffprobe_path,
     UASLocalMetadataSet,
@@ -19,44 +28,280 @@ from QGIS_FMV.QgsFmvConstants import (
 )
 
 
-class NonBlockingStreamReader:
-    def __init__(self, process):
-        self._p = process
-        self._q = Queue()
+class KlvFramer:
+    """Split a raw KLV byte stream into packets.
+
+    The stream is fed in chunks of any size and the complete packets (key,
+    BER length and value) are returned as soon as they are whole. Bytes
+    before a known key, or a packet with an impossible length, are skipped
+    up to the next key.
+    """
+
+    KEYS = (UASLocalMetadataSet, KlvHeaderKeyOther)
+
+    def __init__(self, keys=KEYS, max_length=0xFFFF):
+        self.keys = keys
+        self.key_length = len(keys[0])
+        self.max_length = max_length
+        self.buffer = bytearray()
+        # Bytes skipped while looking for a key
+        self.skipped = 0
+
+    def _findKey(self, pos):
+        found = [self.buffer.find(key, pos) for key in self.keys]
+        found = [i for i in found if i >= 0]
+        return min(found) if found else -1
+
+    def _length(self, pos):
+        """(value length, BER length size) at pos, None if not read yet,
+        (None, 0) if it is not a valid length.
+        """
+        buf = self.buffer
+        if pos >= len(buf):
+            return None
+        first = buf[pos]
+        if first < 128:
+            return first, 1
+        size = first & 0x7F
+        if size == 0 or size > 4:
+            return None, 0
+        if pos + 1 + size > len(buf):
+            return None
+        return int.from_bytes(buf[pos + 1 : pos + 1 + size], "big"), size + 1
+
+    def feed(self, data):
+        """ Add stream bytes, return the list of packets completed by them """
+        buf = self.buffer
+        buf += data
+        packets = []
+        pos = 0
+        while True:
+            start = self._findKey(pos)
+            if start < 0:
+                # The tail may be the beginning of a key
+                keep = max(pos, len(buf) - self.key_length + 1)
+                self.skipped += keep - pos
+                pos = keep
+                break
+            self.skipped += start - pos
+            pos = start
+
+            header = pos + self.key_length
+            length = self._length(header)
+            if length is None:
+                break
+            length, size = length
+            if length is None or length > self.max_length:
+                # Not a packet, look for the next key
+                self.skipped += 1
+                pos += 1
+                continue
+            end = header + size + length
+            if end > len(buf):
+                break
+            packets.append(bytes(buf[pos:end]))
+            pos = end
+        del buf[:pos]
+        return packets
+
+
+class PacketRing:
+    """Bounded queue of live packets.
+
+    When it is full the oldest packet is dropped, so memory stays flat
+    however late the reader is. latest() returns the newest packet and
+    skips the older ones. dropped and skipped count the packets never read.
+    """
+
+    def __init__(self, size=live_queue_size):
+        self._packets = deque(maxlen=max(int(size), 1))
+        self._ready = threading.Condition()
+        self.received = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def put(self, packet):
+        with self._ready:
+            if len(self._packets) == self._packets.maxlen:
+                self.dropped += 1
+            self._packets.append(packet)
+            self.received += 1
+            self._ready.notify()
+
+    def _wait(self, timeout):
+        """ Wait for a packet, with the lock held. False if there is none """
+        if timeout is None:
+            return bool(self._packets)
+        return self._ready.wait_for(lambda: self._packets, timeout)
+
+    def get(self, timeout=None):
+        """Oldest packet, None if there is none after timeout seconds
+        (None: do not wait).
+        """
+        with self._ready:
+            if not self._wait(timeout):
+                return None
+            return self._packets.popleft()
+
+    def latest(self, timeout=None):
+        """ Newest packet, the older ones are skipped """
+        with self._ready:
+            if not self._wait(timeout):
+                return None
+            self.skipped += len(self._packets) - 1
+            packet = self._packets.pop()
+            self._packets.clear()
+            return packet
+
+    def qsize(self):
+        return len(self._packets)
+
+    def stats(self):
+        """ Packet counters of the queue """
+        with self._ready:
+            return {
+                "received": self.received,
+                "dropped": self.dropped,
+                "skipped": self.skipped,
+                "queued": len(self._packets),
+            }
+
+
+class PacketTimeline:
+    """Newest live packets by stream time in milliseconds, to find the
+    packet of the video frame shown.
+    """
+
+    def __init__(self, size=live_queue_size):
+        size = max(int(size), 1)
+        self._times = deque(maxlen=size)
+        self._packets = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, ms, packet):
+        with self._lock:
+            self._times.append(ms)
+            self._packets.append(packet)
+
+    def last(self):
+        """ Time of the newest packet, None if there is none """
+        with self._lock:
+            return self._times[-1] if self._times else None
+
+    def at(self, ms):
+        """Last packet at or before ms (the oldest one kept if they are all
+        later), None if there is none.
+        """
+        with self._lock:
+            if not self._times:
+                return None
+            i = bisect_right(self._times, ms) - 1
+            return self._packets[max(i, 0)]
+
+
+class LiveKlvStream:
+    """KLV packets of a live stream, fed with the stream bytes.
+    The stream is raw KLV, or an MPEG-TS (mpegts) with the KLV stream.
+    The time of every packet is kept to look them up by video position,
+    see at: its PTS, or when it was read if it has none (raw KLV, or
+    asynchronous KLV without PTS).
+    """
+
+    def __init__(self, size=live_queue_size, mpegts=False):
+        self._q = PacketRing(size)
         self.stopped = False
+        self.framer = KlvFramer()
+        self.demuxer = TsDemuxer() if mpegts else None
+        self.timeline = PacketTimeline(size)
+        # First PTS of the stream, and when the reading started
+        self._origin = None
+        self._start = time.monotonic()
+        # Stream time of the player position 0, and the last position
+        self.anchor = None
+        self._position = None
+
+    def feed(self, data):
+        """ Add stream bytes """
+        if self.demuxer is None:
+            self._put(self.framer.feed(data))
+            return
+
+        for kind, _, pts, payload in self.demuxer.feed(data):
+            if kind != "klv":
+                continue
+            ms = None
+            if pts is not None:
+                if self._origin is None:
+                    self._origin = pts
+                ms = ptsToMs(pts, self._origin)
+            self._put(self.framer.feed(payload), ms)
+
+    def _put(self, packets, ms=None):
+        """ Queue packets of the stream time ms, now if it is unknown """
+        if not packets:
+            return
+        if ms is None:
+            ms = (time.monotonic() - self._start) * 1000.0
+        for packet in packets:
+            self._q.put(packet)
+            self.timeline.add(ms, packet)
+
+    def at(self, position):
+        """Packet of the video frame at a media position in milliseconds.
+        The player starts on a frame of the live stream, not on its first
+        one: when the position starts, or goes back because the player
+        restarted, it is anchored on the newest packet read.
+        None until a packet is read.
+        """
+        last = self.timeline.last()
+        if last is None:
+            return None
+        if self.anchor is None or position < self._position:
+            self.anchor = last - position
+        self._position = position
+        return self.timeline.at(self.anchor + position)
+
+    def readline(self, timeout=None):
+        return self._q.get(timeout)
+
+    def latest(self, timeout=None):
+        return self._q.latest(timeout)
+
+    def stats(self):
+        """ Packet counters, and the stream bytes that were not KLV """
+        stats = self._q.stats()
+        stats["skipped_bytes"] = self.framer.skipped
+        return stats
+
 
-        def _populateQueue(process, queue):
+class NonBlockingStreamReader(LiveKlvStream):
+    """ Read the KLV packets of a process stdout, see LiveKlvStream """
+
+    # Bytes read from the stream at once
+    READ_SIZE = 65536
+
+    def __init__(self, process, size=live_queue_size, mpegts=False):
+        super().__init__(size, mpegts)
+        self._p = process
+
+        def _populateQueue(process):
             """
-            Collect lines from metadata stream and put them in 'queue'.
+            Collect packets from metadata stream.
             """
-            packetsPerQueueElement = 1
-            metaFound = 0
-            data = b""
-            while self._p.poll() is None and not self.stopped:
-                line = process.stdout.read(16)
-                if line:
-                    # find starting block for misb0601 or misbeg0104
-                    if line == UASLocalMetadataSet or line == KlvHeaderKeyOther:
-                        # qgsu.showUserAndLogMessage("", "metaFound" + str(metaFound), onlyLog=True)
-                        metaFound = metaFound + 1
-
-                    # feed the current packet
-                    if metaFound <= packetsPerQueueElement:
-                        # qgsu.showUserAndLogMessage("", "feeding packet" + str(metaFound), onlyLog=True)
-                        data = data + line
-                    # add to queue and start a new one
-                    else:
-                        # qgsu.showUserAndLogMessage("", "Put to queue and start over" + repr(data), onlyLog=True)
-                        queue.put(data)
-                        data = line
-                        metaFound = 1
-
+            stdout = process.stdout
+            # Return what the pipe has, do not wait for READ_SIZE bytes
+            readinto = getattr(stdout, "readinto1", stdout.readinto)
+            chunk = bytearray(self.READ_SIZE)
+            view = memoryview(chunk)
+            while not self.stopped:
+                n = readinto(chunk)
                 # End of stream
-                else:
+                if not n:
                     qgsu.showUserAndLogMessage(
                         "", "reader got end of stream.", onlyLog=True
                     )
                     break
+                self.feed(view[:n])
 
             if self.stopped:
                 qgsu.showUserAndLogMessage(
@@ -65,16 +310,9 @@ class NonBlockingStreamReader:
                     onlyLog=True,
                 )
 
-        self._t = threading.Thread(target=_populateQueue, args=(self._p, self._q))
+        self._t = threading.Thread(target=_populateQueue, args=(self._p,))
         self._t.daemon = True
-        self._t.start()  # start collecting lines from the stream
-
-    def readline(self, timeout=None):
-        try:
-            return self._q.get(block=timeout is not None, timeout=timeout)
-        except Empty:
-            return None
-            # return "---"
+        self._t.start()  # start collecting packets from the stream
 
 
 # Splitter class for streaming.
@@ -116,6 +354,88 @@ class Splitter(threading.Thread):
         self.nbsr._t.join()
         qgsu.showUserAndLogMessage("", "Splitter thread ended.", onlyLog=True)
 
+    def stop(self):
+        """ Stop reading, kill the process to release the source port """
+        self.nbsr.stopped = True
+        try:
+            self.p.kill()
+            qgsu.showUserAndLogMessage(
+                "", "Splitter Popen process killed.", onlyLog=True
+            )
+        except OSError:
+            # can't kill a dead proc
+            pass
+
+
+def _tsPayload(datagram):
+    """ MPEG-TS bytes of a datagram, without its RTP header if it has one """
+    if len(datagram) > 12 and datagram[0] != TS_SYNC and datagram[0] & 0xC0 == 0x80:
+        return datagram[12 + 4 * (datagram[0] & 0x0F) :]
+    return datagram
+
+
+class UdpTsSplitter(threading.Thread):
+    """In-process splitter of a live MPEG-TS over UDP or RTP.
+
+    The datagrams are forwarded untouched to the player port and demuxed
+    here for their KLV, without an ffmpeg process in between.
+    """
+
+    # Room for the bursts of the video stream
+    RECEIVE_BUFFER = 4 * 1024 * 1024
+
+    def __init__(
+        self, host, port, destPort, destHost="127.0.0.1", size=live_queue_size
+    ):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.nbsr = LiveKlvStream(size, mpegts=True)
+        self.dest = (destHost, destPort)
+        self.forwarded = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            self.sock.setsockopt(
+                socket.SOL_SOCKET, socket.SO_RCVBUF, self.RECEIVE_BUFFER
+            )
+        except OSError:
+            pass
+        if host and ipaddress.ip_address(host).is_multicast:
+            self.sock.bind(("", port))
+            self.sock.setsockopt(
+                socket.IPPROTO_IP,
+                socket.IP_ADD_MEMBERSHIP,
+                socket.inet_aton(host) + socket.inet_aton("0.0.0.0"),
+            )
+        else:
+            self.sock.bind((host, port))
+        # Wake up to check the stop flag
+        self.sock.settimeout(0.5)
+        self.port = self.sock.getsockname()[1]
+        self.out = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def run(self):
+        chunk = bytearray(65536)
+        view = memoryview(chunk)
+        while not self.nbsr.stopped:
+            try:
+                n = self.sock.recv_into(chunk)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.out.sendto(view[:n], self.dest)
+            self.forwarded += 1
+            self.nbsr.feed(_tsPayload(view[:n]))
+        self.sock.close()
+        self.out.close()
+        qgsu.showUserAndLogMessage("", "Splitter thread ended.", onlyLog=True)
+
+    def stop(self):
+        """ Stop reading, the source port is released by the thread """
+        self.nbsr.stopped = True
+
 
 class StreamMetaReader:
     def __init__(self, video_path):
@@ -128,6 +448,13 @@ class StreamMetaReader:
             self.srcProtocol + ":" + self.srcHost + ":" + str(self.srcPort)
         )
         self.connectionDest = self.srcProtocol + "://127.0.0.1:" + str(self.destPort)
+        if live_demux and self.srcProtocol in ("udp", "rtp"):
+            # "//host" or "//@" (any address)
+            host = self.srcHost.lstrip("/").lstrip("@")
+            self.splitter = UdpTsSplitter(host, self.srcPort, self.destPort)
+            self.splitter.start()
+            qgsu.showUserAndLogMessage("", "In-process splitter started.", onlyLog=True)
+            return
         self.splitter = Splitter(
             [
                 "-i",
@@ -141,6 +468,8 @@ class StreamMetaReader:
                 "-f",
                 "rtp_mpegts",
                 self.connectionDest,
+                # Only the KLV to stdout, timed when it is read: the muxer
+                # drops the PTS of asynchronous KLV
                 "-map",
                 "0:d?",
                 "-f",
@@ -154,22 +483,34 @@ class StreamMetaReader:
     def getSize(self):
         return self.splitter.nbsr._q.qsize()
 
-    def get(self, _):
+    def stats(self):
+        """ Counters of the live packets, see PacketRing """
+        return self.splitter.nbsr.stats()
+
+    def hasIndex(self):
+        return False
+
+    def get(self, position=None):
+        """Packet of the frame at the player position in milliseconds, or
+        the next live packet if the position is unknown or not matched yet.
+        """
         # qgsu.showUserAndLogMessage("", "Get called on Streamreader.", onlyLog=True)
+        if position is not None:
+            packet = self.splitter.nbsr.at(position)
+            if packet is not None:
+                return packet
+        # The map shows the newest packet, the player asks only on position ticks
+        if live_latest:
+            return self.splitter.nbsr.latest()
         return self.splitter.nbsr.readline()
 
     def dispose(self):
         # qgsu.showUserAndLogMessage("", "Dispose called on StreamMetaReader.", onlyLog=True)
-        self.splitter.nbsr.stopped = True
-        # kill the process if open, releases source port
-        try:
-            self.splitter.p.kill()
-            qgsu.showUserAndLogMessage(
-                "", "Splitter Popen process killed.", onlyLog=True
-            )
-        except OSError:
-            # can't kill a dead proc
-            pass
+        qgsu.showUserAndLogMessage(
+            "", "Live metadata: " + str(self.stats()), onlyLog=True
+        )
+        # releases source port
+        self.splitter.stop()
 
 
 class BufferedMetaReader:
@@ -187,66 +528,104 @@ class BufferedMetaReader:
         self.video_path = video_path
         self.pass_time = pass_time
         self.interval = interval
+        # Buffer slots keyed by start time in milliseconds, with the keys
+        # kept sorted to look them up by bisection.
         self._meta = {}
+        self._keys = []
         self._min_buffer_size = min_buffer_size
+        # Keep at least the slots ahead of the playhead
+        self._max_buffer_size = max(max_buffer_size, min_buffer_size + 1)
+        # Slots are read by a fixed number of workers, nearest first
+        self._prefetcher = MetadataPrefetcher(prefetch_workers)
         self.klv_index = klv_index
-        self._initialize("00:00:00.0000", self._min_buffer_size)
+        # Single pass time -> packet index, while it is not ready the
+        # metadata is buffered window by window.
+        self._index_thread = KlvIndexThread(video_path, klv_index)
+        self._index_thread.start()
+        self._initialize(0, self._min_buffer_size)
+
+    @property
+    def index(self):
+        return self._index_thread.index
+
+    def hasIndex(self):
+        """ The KLV index is ready and has packets """
+        return self.index is not None and len(self.index) > 0
+
+    @staticmethod
+    def _to_milliseconds(t):
+        """ Buffer key for a "HH:MM:SS.ffff" time or a milliseconds value """
+        if isinstance(t, str):
+            return qgsu._time_to_milliseconds(t)
+        return int(t)
 
     def _initialize(self, start, size):
-        self.bufferParalell(start, size)
+        if not self.hasIndex():
+            self.bufferParalell(start, size)
 
     def _check_buffer(self, start):
-        self.bufferParalell(start, self._min_buffer_size)
+        if not self.hasIndex():
+            self.bufferParalell(start, self._min_buffer_size)
+            self._evict(self._to_milliseconds(start))
+
+    def _evict(self, ms):
+        """ Release the buffer slots farthest from the playhead """
+        while len(self._keys) > self._max_buffer_size:
+            if ms - self._keys[0] > self._keys[-1] - ms:
+                key = self._keys.pop(0)
+            else:
+                key = self._keys.pop()
+            self._meta.pop(key).dispose()
+
+    def _cancel_stale(self, ms):
+        """After a seek, drop the slots not read yet that are outside
+        the new buffer window
+        """
+        start = ms - self.interval
+        end = ms + self._min_buffer_size * self.interval
+        for key in [k for k in self._keys if k < start or k >= end]:
+            slot = self._meta[key]
+            if slot.p is None or slot.p.returncode is None:
+                self._keys.remove(key)
+                self._meta.pop(key).dispose()
+
+    def _slot(self, ms):
+        """ Return the key of the buffer slot covering ms, or None """
+        i = bisect_right(self._keys, ms) - 1
+        if i >= 0 and ms - self._keys[i] < self.interval:
+            return self._keys[i]
+        return None
 
     def getSize(self, t):
+        """ Buffer size ahead of supplied time (contiguous values only) """
+        ms = self._to_milliseconds(t)
+        i = bisect_right(self._keys, ms)
+        if i == 0:
+            i = 1
         size = 0
-        s_date = datetime.strptime(t, "%H:%M:%S.%f")
-        last_date = None
-        # calculate buffer size ahead of supplied time (contiguous values
-        # only).
-        od = collections.OrderedDict(sorted(self._meta.items()))
-        for ele in od.keys():
-            c_date = datetime.strptime(ele, "%H:%M:%S.%f")
-            if last_date is None:
-                last_date = c_date
-                continue
-
-            if c_date > s_date:
-                # qgsu.showUserAndLogMessage("", "Comparing: ele:" + ele + " greater than t (as date):" + t + " : yes", onlyLog=True)
-                # qgsu.showUserAndLogMessage("", "c_date:" + c_date.strftime('%H:%M:%S.%f') + " last_date:" + last_date.strftime('%H:%M:%S.%f'), onlyLog=True)
-                delta_millisec = (c_date - last_date).microseconds / 1000 + (
-                    c_date - last_date
-                ).seconds * 1000
-                # qgsu.showUserAndLogMessage("", "delta: " + str(delta_millisec), onlyLog=True)
-                if delta_millisec <= self.interval:
-                    size += 1
-                    # qgsu.showUserAndLogMessage("", "Smaller or equal than pass_time:" + str(delta_millisec), onlyLog=True)
-                else:
-                    # qgsu.showUserAndLogMessage("", "Greater than pass_time:" + str(delta_millisec), onlyLog=True)
-                    break
-
-            last_date = c_date
-
+        for k in range(i, len(self._keys)):
+            if self._keys[k] - self._keys[k - 1] > self.interval:
+                break
+            size += 1
         return size
 
     def bufferParalell(self, start, size):
-        start_sec = qgsu._time_to_seconds(start)
-        start_milisec = int(start_sec * 1000)
+        start_milisec = self._to_milliseconds(start)
 
         for k in range(
             start_milisec, start_milisec + (size * self.interval), self.interval
         ):
-            cTime = k / 1000.0
-            nTime = (k + self.pass_time) / 1000.0
-            new_key = qgsu._seconds_to_time_frac(cTime)
-            if new_key not in self._meta:
+            if k not in self._meta:
+                cTime = k / 1000.0
+                nTime = (k + self.pass_time) / 1000.0
                 # qgsu.showUserAndLogMessage("QgsFmvUtils", 'buffering: ' + _seconds_to_time_frac(cTime) + " to " + _seconds_to_time_frac(nTime), onlyLog=True)
-                self._meta[new_key] = callBackMetadataThread(
+                self._meta[k] = MetadataSlot(
+                    k,
                     cmds=[
                         "-i",
                         self.video_path,
                         "-ss",
-                        new_key,
+                        qgsu._seconds_to_time_frac(cTime),
                         "-to",
                         qgsu._seconds_to_time_frac(nTime),
                         "-map",
@@ -256,118 +635,184 @@ class BufferedMetaReader:
                         "-",
                     ]
                 )
-                self._meta[new_key].start()
+                insort(self._keys, k)
+                self._prefetcher.submit(self._meta[k])
 
     def get(self, t):
         """ read a value and check the buffer """
-        value = b""
-        # get the closest value for this time from the buffer
-        s = t.split(".")
-        new_t = ""
         try:
-            milis = int(s[1][:-1])
-
-            if self.interval > 1000:
-                inte = 1000
-
-            r_milis = round(milis / inte) * inte
-            if r_milis != 1000:
-                if r_milis < 1000:
-                    new_t = s[0] + "." + str(r_milis) + "0"
-                if r_milis < 100:
-                    new_t = s[0] + ".0" + str(r_milis) + "0"
-                if r_milis < 10:
-                    new_t = s[0] + ".00" + str(r_milis) + "0"
-            else:
-                date = datetime.strptime(s[0], "%H:%M:%S")
-                new_t = qgsu._add_secs_to_time(date, 1) + ".0000"
-        except Exception:
+            ms = self._to_milliseconds(t)
+        except ValueError:
             qgsu.showUserAndLogMessage(
-                "", "wrong value for time, need . decimal" + t, onlyLog=True
+                "", "wrong value for time, need . decimal" + str(t), onlyLog=True
             )
+            return b""
+
+        if self.hasIndex():
+            return self.index.get(ms, self.pass_time)
+
+        value = b""
+        # get the buffer slot covering this time
+        key = self._slot(ms)
+        self._prefetcher.seek(ms)
         try:
             # after skip, buffer may not have been initialized
-            if new_t not in self._meta:
+            if key is None:
                 qgsu.showUserAndLogMessage(
                     "",
                     "Meta reader -> get: "
-                    + t
-                    + " cache: "
-                    + new_t
+                    + str(t)
                     + " values have not been init yet.",
                     onlyLog=True,
                 )
-                self._check_buffer(new_t)
-                value = "BUFFERING"
-            elif self._meta[new_t].p is None:
-                value = "NOT_READY"
-                qgsu.showUserAndLogMessage(
-                    "",
-                    "Meta reader -> get: "
-                    + t
-                    + " cache: "
-                    + new_t
-                    + " values not ready yet.",
-                    onlyLog=True,
-                )
-            elif self._meta[new_t].p.returncode is None:
+                self._cancel_stale(ms)
+                self._check_buffer(ms)
+                return "BUFFERING"
+
+            slot = self._meta[key]
+            if slot.p is None or slot.p.returncode is None:
                 value = "NOT_READY"
                 qgsu.showUserAndLogMessage(
                     "",
                     "Meta reader -> get: "
-                    + t
+                    + str(t)
                     + " cache: "
-                    + new_t
+                    + str(key)
                     + " values not ready yet.",
                     onlyLog=True,
                 )
-            elif self._meta[new_t].stdout:
-                value = self._meta[new_t].stdout
+            elif slot.stdout:
+                value = slot.stdout
             else:
                 qgsu.showUserAndLogMessage(
                     "",
                     "Meta reader -> get: "
-                    + t
+                    + str(t)
                     + " cache: "
-                    + new_t
+                    + str(key)
                     + " values ready but empty.",
                     onlyLog=True,
                 )
 
-            self._check_buffer(new_t)
+            self._check_buffer(key)
             # bSize = self.getSize(t)
             # qgsu.showUserAndLogMessage("Buffer size:" + str(bSize), "Buffer size:" + str(bSize), onlyLog=False)
         except Exception as e:
             qgsu.showUserAndLogMessage(
                 "",
-                "No value found for: " + t + " rounded: " + new_t + " e:" + str(e),
+                "No value found for: " + str(t) + " slot: " + str(key) + " e:"
+                + str(e),
                 onlyLog=True,
             )
 
-        # qgsu.showUserAndLogMessage("QgsFmvUtils", "meta_reader -> get: " + t + " return code: "+ str(self._meta[new_t].p.returncode), onlyLog=True)
-        # qgsu.showUserAndLogMessage("QgsFmvUtils", "meta_reader -> get: " + t + " cache: "+ new_t +" len: " + str(len(value)), onlyLog=True)
-
         return value
 
     def dispose(self):
-        pass
+        """ Release all buffer slots and kill their running processes """
+        self._index_thread.cancel()
+        for slot in self._meta.values():
+            slot.dispose()
+        self._meta.clear()
+        del self._keys[:]
+        if self.index is not None:
+            self.index.close()
+
+
+class MetadataPrefetcher:
+    """Run buffer slots with a bounded number of worker threads.
+
+    Pending slots are taken nearest to the playhead first. Workers are
+    started on demand and end when there is nothing left to read, so an
+    idle reader holds no threads.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = max(int(workers), 1)
+        self.playhead = 0
+        self._heap = []
+        self._count = 0
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, slot):
+        """ Queue a slot to be read """
+        with self._lock:
+            self._count += 1
+            heappush(self._heap, (abs(slot.key - self.playhead), self._count, slot))
+            if len(self._threads) < self.workers:
+                t = threading.Thread(target=self._work)
+                t.daemon = True
+                self._threads.append(t)
+                t.start()
+
+    def seek(self, ms):
+        """ Move the playhead, reorder pending slots and drop disposed ones """
+        with self._lock:
+            if ms == self.playhead:
+                return
+            self.playhead = ms
+            self._heap = [
+                (abs(slot.key - ms), count, slot)
+                for _, count, slot in self._heap
+                if not slot.disposed
+            ]
+            heapify(self._heap)
+
+    def pending(self):
+        """ Number of slots waiting for a worker """
+        with self._lock:
+            return len(self._heap)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if not self._heap:
+                    self._threads.remove(threading.current_thread())
+                    return
+                _, _, slot = heappop(self._heap)
+            try:
+                slot.run()
+            except Exception as e:
+                qgsu.showUserAndLogMessage(
+                    "",
+                    "Metadata slot " + str(slot.key) + " failed: " + str(e),
+                    onlyLog=True,
+                )
 
 
-class callBackMetadataThread(threading.Thread):
-    """ CallBack metadata in other thread  """
+class MetadataSlot:
+    """ Metadata of a buffer slot, read by a MetadataPrefetcher worker  """
 
-    def __init__(self, cmds=[]):
+    def __init__(self, key, cmds=[]):
+        self.key = key
         self.cmds = cmds
         self.p = None
-        threading.Thread.__init__(self)
+        self.stdout = None
+        self.disposed = False
+        self._lock = threading.Lock()
 
     def setCmds(self, cmds):
         self.cmds = cmds
 
     def run(self):
-        # qgsu.showUserAndLogMessage("", "callBackMetadataThread run: commands:" + str(self.cmds), onlyLog=True)
-        self.p = _spawn(self.cmds)
+        # qgsu.showUserAndLogMessage("", "MetadataSlot run: commands:" + str(self.cmds), onlyLog=True)
+        with self._lock:
+            if self.disposed:
+                return
+            self.p = _spawn(self.cmds)
         # print (self.cmds)
         self.stdout, _ = self.p.communicate()
         # print (self.stdout)
         # print (_)
+
+    def dispose(self):
+        """ Kill the process if it is still running and release its output """
+        with self._lock:
+            self.disposed = True
+            if self.p is not None and self.p.poll() is None:
+                try:
+                    self.p.kill()
+                except OSError:
+                    # can't kill a dead proc
+                    pass
+        self.stdout = None
@@ -0,0 +1,240 @@
+"""
+MPEG-TS demultiplexing of the KLV metadata.
+
+TsDemuxer reads the PAT and PMT of a transport stream to find its video and
+KLV streams, reassembles the KLV PES packets and keeps the time stamps
+(PTS, 90 kHz) of both, so metadata can be matched to the video frames.
+The other data streams are listed too, so streams can be numbered the way
+ffprobe does.
+"""
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+TS_PACKET_SIZE = 188
+TS_SYNC = 0x47
+PAT_PID = 0x0000
+# PTS are 33 bit counters of a 90 kHz clock
+PTS_WRAP = 1 << 33
+PTS_PER_MS = 90.0
+
+# H.262, MPEG-4 part 2, H.264 and H.265 stream types
+VIDEO_STREAM_TYPES = (0x01, 0x02, 0x10, 0x1B, 0x24)
+# Metadata carried in PES packets
+KLV_STREAM_TYPE = 0x15
+PRIVATE_STREAM_TYPE = 0x06
+SCTE35_STREAM_TYPE = 0x86
+KLV_FORMAT = b"KLVA"
+ID3_FORMAT = b"ID3 "
+# Synchronous KLV (KLV_STREAM_TYPE) starts with a metadata AU cell header
+AU_CELL_HEADER_SIZE = 5
+# Audio and subtitles carried as private data: descriptor tags (teletext,
+# DVB subtitles, AC-3, E-AC-3, DTS, AAC) and registered formats
+PRIVATE_MEDIA_TAGS = (0x56, 0x59, 0x6A, 0x7A, 0x7B, 0x7C)
+PRIVATE_MEDIA_FORMATS = (b"AC-3", b"EAC3", b"DTS1", b"DTS2", b"DTS3", b"Opus")
+REGISTRATION_TAG = 0x05
+
+
+def parsePts(data, pos):
+    """ 33 bit time stamp of a PES header at pos """
+    return (
+        ((data[pos] >> 1) & 0x07) << 30
+        | data[pos + 1] << 22
+        | (data[pos + 2] >> 1) << 15
+        | data[pos + 3] << 7
+        | data[pos + 4] >> 1
+    )
+
+
+def parsePesHeader(data):
+    """(PES packet length, PTS or None, payload offset) of the PES header
+    at the start of data, None if it does not start a PES packet.
+    """
+    if len(data) < 9 or data[0] != 0 or data[1] != 0 or data[2] != 1:
+        return None
+    length = data[4] << 8 | data[5]
+    pts = None
+    if data[7] & 0x80 and len(data) >= 14:
+        pts = parsePts(data, 9)
+    return length, pts, 9 + data[8]
+
+
+def ptsToMs(pts, origin):
+    """ Milliseconds from origin to pts, across a counter wrap """
+    delta = (pts - origin) % PTS_WRAP
+    if delta >= PTS_WRAP // 2:
+        delta -= PTS_WRAP
+    return delta / PTS_PER_MS
+
+
+def _section(payload, unitStart):
+    """ PSI section of a packet payload, None if it does not start one """
+    if not unitStart or not payload:
+        return None
+    pos = 1 + payload[0]
+    if pos + 3 > len(payload):
+        return None
+    length = (payload[pos + 1] & 0x0F) << 8 | payload[pos + 2]
+    return payload[pos : pos + 3 + length]
+
+
+def parsePat(section):
+    """ PMT PIDs of a PAT section """
+    pids = set()
+    # Program loop between the 8 byte header and the CRC
+    for pos in range(8, len(section) - 4, 4):
+        program = section[pos] << 8 | section[pos + 1]
+        if program != 0:
+            pids.add((section[pos + 2] & 0x1F) << 8 | section[pos + 3])
+    return pids
+
+
+def _descriptors(data):
+    """ (tag, body) of the descriptors of a PMT loop """
+    pos = 0
+    while pos + 2 <= len(data):
+        yield data[pos], data[pos + 2 : pos + 2 + data[pos + 1]]
+        pos += 2 + data[pos + 1]
+
+
+def _streamKind(streamType, descriptors):
+    """ "video", "klv", "data" (other data stream) or None """
+    if streamType in VIDEO_STREAM_TYPES:
+        return "video"
+    if streamType == KLV_STREAM_TYPE:
+        return "data" if ID3_FORMAT in descriptors else "klv"
+    if streamType == SCTE35_STREAM_TYPE:
+        return "data"
+    if streamType != PRIVATE_STREAM_TYPE:
+        return None
+    if KLV_FORMAT in descriptors:
+        return "klv"
+    for tag, body in _descriptors(descriptors):
+        if tag in PRIVATE_MEDIA_TAGS or (
+            tag == REGISTRATION_TAG and bytes(body[:4]) in PRIVATE_MEDIA_FORMATS
+        ):
+            return None
+    return "data"
+
+
+def parsePmt(section):
+    """{PID: (kind, stream type)} of the streams of a PMT section, in the
+    PMT order. kind is "video", "klv" or "data", see _streamKind.
+    """
+    streams = {}
+    if len(section) < 12:
+        return streams
+    pos = 12 + ((section[10] & 0x0F) << 8 | section[11])
+    end = len(section) - 4
+    while pos + 5 <= end:
+        streamType = section[pos]
+        pid = (section[pos + 1] & 0x1F) << 8 | section[pos + 2]
+        infoLength = (section[pos + 3] & 0x0F) << 8 | section[pos + 4]
+        descriptors = section[pos + 5 : pos + 5 + infoLength]
+        kind = _streamKind(streamType, descriptors)
+        if kind is not None:
+            streams[pid] = (kind, streamType)
+        pos += 5 + infoLength
+    return streams
+
+
+class TsDemuxer:
+    """Incremental demuxer of the video and KLV streams of an MPEG-TS.
+
+    The stream is fed in chunks of any size. feed returns the
+    (kind, pid, pts, payload) of the PES packets found: the KLV data of the
+    "klv" streams, and only the time stamp (payload None) of the "video"
+    ones. streams holds the parsePmt streams. PSI sections are expected to
+    fit in a single TS packet.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.pmtPids = set()
+        self.streams = {}
+        # KLV PES packets being reassembled, by PID
+        self._pes = {}
+        # Bytes skipped to find the TS packet sync
+        self.skipped = 0
+
+    def _completePes(self, pid, events):
+        data = self._pes.pop(pid, None)
+        if not data:
+            return
+        header = parsePesHeader(data)
+        if header is None:
+            return
+        length, pts, offset = header
+        end = 6 + length if length else len(data)
+        if self.streams[pid][1] == KLV_STREAM_TYPE:
+            offset += AU_CELL_HEADER_SIZE
+        events.append(("klv", pid, pts, bytes(data[offset:end])))
+
+    def _packet(self, buf, pos, events):
+        unitStart = buf[pos + 1] & 0x40
+        pid = (buf[pos + 1] & 0x1F) << 8 | buf[pos + 2]
+        control = (buf[pos + 3] >> 4) & 0x03
+        if not control & 0x01:
+            return
+        start = pos + 4
+        if control & 0x02:
+            start += 1 + buf[pos + 4]
+        end = pos + TS_PACKET_SIZE
+        if start >= end:
+            return
+
+        kind = self.streams.get(pid, (None,))[0]
+        if kind == "klv":
+            if unitStart:
+                self._completePes(pid, events)
+                self._pes[pid] = bytearray()
+            if pid not in self._pes:
+                return
+            data = self._pes[pid]
+            data += buf[start:end]
+            # Complete as soon as its announced length is read
+            if len(data) >= 6:
+                length = data[4] << 8 | data[5]
+                if length and len(data) >= 6 + length:
+                    self._completePes(pid, events)
+        elif kind == "video":
+            if unitStart:
+                header = parsePesHeader(buf[start:end])
+                if header is not None:
+                    events.append(("video", pid, header[1], None))
+        elif pid == PAT_PID:
+            section = _section(buf[start:end], unitStart)
+            if section is not None and section[0] == 0x00:
+                self.pmtPids = parsePat(section)
+        elif pid in self.pmtPids:
+            section = _section(buf[start:end], unitStart)
+            if section is not None and section[0] == 0x02:
+                self.streams.update(parsePmt(section))
+
+    def feed(self, data):
+        """ Add stream bytes, return the PES packets completed by them """
+        buf = self.buffer
+        buf += data
+        events = []
+        pos = 0
+        while pos + TS_PACKET_SIZE <= len(buf):
+            if buf[pos] != TS_SYNC:
+                sync = buf.find(TS_SYNC, pos + 1)
+                if sync < 0:
+                    sync = len(buf)
+                self.skipped += sync - pos
+                pos = sync
+                continue
+            self._packet(buf, pos, events)
+            pos += TS_PACKET_SIZE
+        del buf[:pos]
+        return events
+
+    def flush(self):
+        """ PES packets still being reassembled at the end of the stream """
+        events = []
+        for pid in list(self._pes):
+            self._completePes(pid, events)
+        return events
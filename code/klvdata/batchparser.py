@@ -0,0 +1,242 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from QGIS_FMV.klvdata.elementparser import (
+    DateTimeElementParser,
+    MappedElementParser,
+    StringElementParser,
+)
+from QGIS_FMV.klvdata.misb0601 import UASLocalMetadataSet
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+
+# SetParser attribute names that differ from the element class names
+_ALIASES = {"targetWidth": "TargetWidth"}
+
+
+def _ber_length(data, pos):
+    """ Return (length, position after the length) of a BER length at pos """
+    length = data[pos]
+    pos += 1
+    if length < 128:
+        return length, pos
+    size = length - 128
+    return int.from_bytes(data[pos : pos + size], byteorder="big"), pos + size
+
+
+def _ber_oid(data, pos):
+    """ Return (tag, position after the tag) of a BER-OID tag at pos """
+    tag = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        tag = (tag << 7) | (byte & 0x7F)
+        if byte < 128:
+            return tag, pos
+
+
+class BatchParser:
+    """Decode many MISB ST0601 packets at once into a numpy record array.
+
+    Conversion tables (domain, range and error value of every tag) are
+    taken once from the element parsers registered in UASLocalMetadataSet,
+    so the decoded values match the object API. Every record has one field
+    per tag: float64 (NaN if missing or out of range) for mapped values,
+    datetime64[us] (NaT if missing) for time stamps and object (None if
+    missing) for strings.
+    """
+
+    key = UASLocalMetadataSet.key
+
+    def __init__(self, parsers=None):
+        if parsers is None:
+            parsers = UASLocalMetadataSet.parsers
+        self._mapped = {}
+        self._times = {}
+        self._strings = {}
+        fields = []
+        for parser in sorted(parsers.values(), key=lambda p: p.TAG):
+            name = parser.__name__
+            if issubclass(parser, MappedElementParser):
+                if not isinstance(parser._domain, tuple):
+                    # Nested local sets
+                    continue
+                src_min, src_max = parser._domain
+                dst_min, dst_max = parser._range
+                self._mapped[parser.TAG] = (
+                    name,
+                    src_min < 0,
+                    src_min,
+                    src_max,
+                    dst_min,
+                    dst_max,
+                    parser._error,
+                )
+                fields.append((name, np.float64))
+            elif issubclass(parser, DateTimeElementParser):
+                self._times[parser.TAG] = name
+                fields.append((name, "M8[us]"))
+            elif issubclass(parser, StringElementParser):
+                self._strings[parser.TAG] = name
+                fields.append((name, object))
+        self.dtype = np.dtype(fields)
+
+    def split(self, data):
+        """Return the local set values found in a raw KLV stream,
+        skipping any bytes before a local set key.
+        """
+        packets = []
+        pos = 0
+        size = len(data)
+        while True:
+            pos = data.find(self.key, pos)
+            if pos < 0:
+                break
+            try:
+                length, start = _ber_length(data, pos + len(self.key))
+            except IndexError:
+                break
+            end = start + length
+            if end > size:
+                break
+            packets.append(data[start:end])
+            pos = end
+        return packets
+
+    def _new(self, size):
+        records = np.empty(size, dtype=self.dtype)
+        for name, _, _, _, _, _, _ in self._mapped.values():
+            records[name] = np.nan
+        for name in self._times.values():
+            records[name] = np.datetime64("NaT")
+        for name in self._strings.values():
+            records[name] = None
+        return records
+
+    def parse(self, packets, canceled=None):
+        """Decode a sequence of local set values (as returned by split)
+        into a record array, one record per packet.
+        Return None if canceled() becomes True while decoding.
+        """
+        # Walk the tags of every packet, grouping values by tag and length
+        groups = {}
+        for row, value in enumerate(packets):
+            if canceled is not None and canceled():
+                return None
+            pos = 0
+            size = len(value)
+            try:
+                while pos < size:
+                    tag, pos = _ber_oid(value, pos)
+                    length, pos = _ber_length(value, pos)
+                    end = pos + length
+                    if end > size:
+                        break
+                    group = groups.get((tag, length))
+                    if group is None:
+                        group = groups[(tag, length)] = ([], [])
+                    group[0].append(row)
+                    group[1].append(value[pos:end])
+                    pos = end
+            except IndexError:
+                # Truncated packet, keep the tags read so far
+                pass
+
+        records = self._new(len(packets))
+        for (tag, length), (rows, values) in groups.items():
+            if tag in self._mapped:
+                self._parseMapped(records, tag, length, rows, values)
+            elif tag in self._times:
+                raw = self._toIntegers(length, False, values)
+                records[self._times[tag]][rows] = raw.astype("M8[us]")
+            elif tag in self._strings:
+                name = self._strings[tag]
+                for row, value in zip(rows, values):
+                    try:
+                        records[name][row] = bytes(value).decode("UTF-8")
+                    except UnicodeDecodeError:
+                        pass
+        return records
+
+    @staticmethod
+    def _toIntegers(length, signed, values):
+        """ Convert equal length big endian values to an integer array """
+        if length in (1, 2, 4, 8):
+            dtype = ">%s%d" % ("i" if signed else "u", length)
+            return np.frombuffer(b"".join(values), dtype=dtype).astype(np.int64)
+        return np.array(
+            [int.from_bytes(v, byteorder="big", signed=signed) for v in values],
+            dtype=np.int64,
+        )
+
+    def _parseMapped(self, records, tag, length, rows, values):
+        name, signed, src_min, src_max, dst_min, dst_max, error = self._mapped[tag]
+        if length == 0 or length > 8:
+            return
+        raw = self._toIntegers(length, signed, values)
+        slope = (dst_max - dst_min) / (src_max - src_min)
+        mapped = slope * (raw - src_min) + dst_min
+        invalid = (raw < src_min) | (raw > src_max)
+        invalid |= (mapped < dst_min) | (mapped > dst_max)
+        if error is not None:
+            invalid |= raw == error
+        mapped[invalid] = np.nan
+        records[name][rows] = mapped
+
+    def parseStream(self, data):
+        """ Decode every local set of a raw KLV stream """
+        return self.parse(self.split(data))
+
+    def parseIndex(self, index, canceled=None):
+        """Decode every packet of a KlvIndex.
+        Return (pts, records), pts in milliseconds for every record, or None
+        if canceled() becomes True while decoding.
+        """
+        pts = []
+        packets = []
+        for i in range(len(index)):
+            if canceled is not None and canceled():
+                return None
+            for packet in self.split(index.packet(i)):
+                pts.append(index.pts[i])
+                packets.append(packet)
+        records = self.parse(packets, canceled)
+        if records is None:
+            return None
+        return np.asarray(pts, dtype=np.int64), records
+
+
+class RecordView:
+    """Read only view of a decoded record with the attribute names of
+    SetParser (SensorLatitude, CornerLatitudePoint1Full, ...).
+    Missing values are returned as None.
+    """
+
+    __slots__ = ("_records", "_row")
+
+    def __init__(self, records, row):
+        self._records = records
+        self._row = row
+
+    def __getattr__(self, name):
+        name = _ALIASES.get(name, name)
+        try:
+            value = self._records[name][self._row]
+        except (KeyError, ValueError):
+            raise AttributeError(name)
+        if isinstance(value, np.floating):
+            return None if np.isnan(value) else float(value)
+        if isinstance(value, np.datetime64):
+            if np.isnat(value):
+                return None
+            us = int(value.astype(np.int64))
+            return datetime.fromtimestamp(us / 1e6, tz=timezone.utc)
+        return value
+
+    def __repr__(self):
+        return "RecordView({})".format(self._row)
@@ -36,7 +36,21 @@ except ImportError:
 # Proposed alternate names, "BaseElement" of modules "bases".
 
 
-class Element:
+class SlotsMeta(type):
+    """Metaclass giving every class empty __slots__ unless it declares its own.
+
+    Element instances hold no __dict__, which matters when hours of decoded
+    packets are kept in memory. Subclasses (all the parser definitions) do
+    not need to declare __slots__, and can still keep constants such as key,
+    TAG or names as class attributes.
+    """
+
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        namespace.setdefault("__slots__", ())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class Element(metaclass=SlotsMeta):
     """Construct a key, length, value tuplet.
 
     Elements provide the basic mechanisms to constitute the basic encoding
@@ -55,6 +69,8 @@ class Element:
 
     __metaclass__ = ABCMeta
 
+    __slots__ = ("key", "value")
+
     def __init__(self, key, value):
         self.key = key
         self.value = value
@@ -89,6 +105,12 @@ class Element:
 
 
 class UnknownElement(Element):
+    def __init__(self, key, value):
+        # Keep the raw value, not a slice of the packet
+        if isinstance(value, memoryview):
+            value = bytes(value)
+        super().__init__(key, value)
+
     def __repr__(self):
         """Return as-code string used to re-create the object."""
         args = ", ".join(map(repr, (bytes(self.key), bytes(self.value))))
@@ -34,7 +34,7 @@ from QGIS_FMV.klvdata.common import (
     str_to_bytes,
     ieee754_bytes_to_fp,
 )
-from QGIS_FMV.klvdata.element import Element
+from QGIS_FMV.klvdata.element import Element, SlotsMeta
 
 try:
     from pydevd import *
@@ -58,7 +58,8 @@ class ElementParser(Element):
     __metaclass__ = ABCMeta
 
     def __init__(self, value):
-        super().__init__(self.key, value)
+        # key is a class attribute
+        self.value = value
 
     @property
     @classmethod
@@ -71,7 +72,7 @@ class ElementParser(Element):
         return "{}({})".format(self.name, bytes(self.value))
 
 
-class BaseValue:
+class BaseValue(metaclass=SlotsMeta):
     __metaclass__ = ABCMeta
 
     """Abstract base class (superclass) used to insure internal interfaces are maintained."""
@@ -95,6 +96,8 @@ class BytesElementParser(ElementParser):
 
 
 class BytesValue(BaseValue):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         try:
             self.value = bytes_to_int(value)
@@ -116,6 +119,8 @@ class DateTimeElementParser(ElementParser):
 
 
 class DateTimeValue(BaseValue):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = bytes_to_datetime(value)
 
@@ -134,6 +139,8 @@ class StringElementParser(ElementParser):
 
 
 class StringValue(BaseValue):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         try:
             self.value = bytes_to_str(value)
@@ -174,6 +181,8 @@ class MappedElementParser(ElementParser):
         pass
 
 class MappedValue(BaseValue):
+    __slots__ = ("value", "_domain", "_range", "_error")
+
     def __init__(self, value, _domain, _range, _error):
         self._domain = _domain
         self._range = _range
@@ -182,7 +191,8 @@ class MappedValue(BaseValue):
         try:
             self.value = bytes_to_float(value, self._domain, self._range, self._error)
         except TypeError:
-            self.value = value
+            # Keep the raw value, not a slice of the packet
+            self.value = bytes(value) if isinstance(value, memoryview) else value
 
     def __bytes__(self):
         return float_to_bytes(self.value, self._domain, self._range, self._error)
@@ -204,6 +214,8 @@ class IEEE754ElementParser(ElementParser):
 
 
 class IEEE754Value(BaseValue):
+    __slots__ = ("value",)
+
     def __init__(self, value):
         try:
             self.value = ieee754_bytes_to_fp(value)
@@ -38,11 +38,19 @@ KlvHeaderKey = b"\x00\x00\x06\x0e+4\x02\x0b\x01\x01\x0e\x01\x03\x01\x01"
 
 
 class KLVParser(object):
-    """Return key, value pairs parsed from an SMPTE ST 336 source."""
+    """Return key, value pairs parsed from an SMPTE ST 336 source.
+
+    A memoryview source is walked by offsets: values are returned as
+    memoryview slices of the source (zero-copy), keys as bytes.
+    """
 
     def __init__(self, source, key_length):
+        self.view = None
         if isinstance(source, IOBase):
             self.source = source
+        elif isinstance(source, memoryview):
+            self.view = source.cast("B") if source.format != "B" else source
+            self.pos = 0
         else:
             self.source = BytesIO(source)
 
@@ -52,6 +60,9 @@ class KLVParser(object):
         return self
 
     def __next__(self):
+        if self.view is not None:
+            return self.__next_view()
+
         key = self.__read(self.key_length)
         # TODO : HOTFIX for some videos, make better
         # in some videos the header not follow the correct pattern
@@ -79,6 +90,43 @@ class KLVParser(object):
 
         return key, value
 
+    def __next_view(self):
+        view = self.view
+        pos = self.pos
+        size = len(view)
+        if pos >= size:
+            raise StopIteration
+
+        key = bytes(view[pos : pos + self.key_length])
+        pos += self.key_length
+        # Same HOTFIX as the stream mode
+        if key.find(KlvHeaderKey) > 0:
+            key = UASLocalMetadataSet
+            length_size = 4
+        else:
+            length_size = 1
+        if pos + length_size > size:
+            raise StopIteration
+        byte_length = bytes_to_int(view[pos : pos + length_size])
+        pos += length_size
+
+        if byte_length < 128:
+            # BER Short Form
+            length = byte_length
+        else:
+            # BER Long Form
+            if pos >= size:
+                raise StopIteration
+            length = bytes_to_int(view[pos : pos + byte_length - 128])
+            pos += byte_length - 128
+
+        if length and pos >= size:
+            raise StopIteration
+        value = view[pos : pos + length]
+        self.pos = pos + length
+
+        return key, value
+
     def __read(self, size):
         if size == 0:
             return b""
@@ -33,49 +33,64 @@ try:
 except ImportError:
     None
 
+# Well-known ST0601 fields exposed as attributes, by TAG
+_FIELDS = {
+    4: "PlatformTailNumber",
+    5: "PlatformHeadingAngle",
+    11: "ImageSourceSensor",
+    13: "SensorLatitude",
+    14: "SensorLongitude",
+    15: "SensorTrueAltitude",
+    16: "SensorHorizontalFieldOfView",
+    17: "SensorVerticalFieldOfView",
+    18: "SensorRelativeAzimuthAngle",
+    19: "SensorRelativeElevationAngle",
+    21: "SlantRange",
+    22: "targetWidth",
+    23: "FrameCenterLatitude",
+    24: "FrameCenterLongitude",
+    25: "FrameCenterElevation",
+    26: "OffsetCornerLatitudePoint1",
+    27: "OffsetCornerLongitudePoint1",
+    28: "OffsetCornerLatitudePoint2",
+    29: "OffsetCornerLongitudePoint2",
+    30: "OffsetCornerLatitudePoint3",
+    31: "OffsetCornerLongitudePoint3",
+    32: "OffsetCornerLatitudePoint4",
+    33: "OffsetCornerLongitudePoint4",
+    82: "CornerLatitudePoint1Full",
+    83: "CornerLongitudePoint1Full",
+    84: "CornerLatitudePoint2Full",
+    85: "CornerLongitudePoint2Full",
+    86: "CornerLatitudePoint3Full",
+    87: "CornerLongitudePoint3Full",
+    88: "CornerLatitudePoint4Full",
+    89: "CornerLongitudePoint4Full",
+}
+# Position of the well-known fields in the compact record of a set
+_POSITIONS = {tag: i for i, tag in enumerate(_FIELDS)}
+
 
 class SetParser(Element):
-    """Parsable Element. Not intended to be used directly. Always as super class."""
+    """Parsable Element. Not intended to be used directly. Always as super class.
+
+    When lazy, only the tag offsets are indexed on init and every element
+    is decoded on first access (items, [] or the well-known attributes).
+    """
 
     __metaclass__ = ABCMeta
 
+    __slots__ = ("_raw", "_decoded", "_items", "_record")
+
+    lazy = True
+
     def __init__(self, value, key_length=1):
         """All parser needs is the value, no other information"""
-        super().__init__(self.key, value)
-        self.items = OrderedDict()
+        # key is a class attribute
+        self.value = value
         self.parse()
-
-        self._PlatformTailNumber = None
-        self._PlatformHeadingAngle = None
-        self._ImageSourceSensor = None
-        self._SensorLatitude = None
-        self._SensorLongitude = None
-        self._SensorTrueAltitude = None
-        self._SensorHorizontalFieldOfView = None
-        self._SensorVerticalFieldOfView = None
-        self._targetWidth = None
-        self._slantRange = None
-        self._SensorRelativeAzimuthAngle = None
-        self._SensorRelativeElevationAngle = None
-        self._OffsetCornerLatitudePoint1 = None
-        self._OffsetCornerLongitudePoint1 = None
-        self._OffsetCornerLatitudePoint2 = None
-        self._OffsetCornerLongitudePoint2 = None
-        self._OffsetCornerLatitudePoint3 = None
-        self._OffsetCornerLongitudePoint3 = None
-        self._OffsetCornerLatitudePoint4 = None
-        self._OffsetCornerLongitudePoint4 = None
-        self._FrameCenterLatitude = None
-        self._FrameCenterLongitude = None
-        self._FrameCenterElevation = None
-        self._CornerLatitudePoint1Full = None
-        self._CornerLongitudePoint1Full = None
-        self._CornerLatitudePoint2Full = None
-        self._CornerLongitudePoint2Full = None
-        self._CornerLatitudePoint3Full = None
-        self._CornerLongitudePoint3Full = None
-        self._CornerLatitudePoint4Full = None
-        self._CornerLongitudePoint4Full = None
+        if not self.lazy:
+            self.items
 
     def __getitem__(self, key):
         """Return element provided bytes key.
@@ -84,28 +99,93 @@ class SetParser(Element):
         attempt to add convenience of being able to index by the int equivalent.
         Instead, the user should pass keys with method bytes.
         """
-        return self.items[bytes(key)]
+        item = self._item(bytes(key))
+        if item is None:
+            raise KeyError(key)
+        return item
 
     def parse(self):
-        """Parse the parent into items. Called on init and modification of parent value.
+        """Index the parent tags. Called on init and modification of parent value.
+
+        Values are kept as slices of the parent and decoded on first access.
+        """
+        value = self.value
+        if isinstance(value, (bytes, bytearray)):
+            value = memoryview(value)
+        self._raw = OrderedDict()
+        self._decoded = {}
+        self._items = None
+        self._record = None
+        for key, value in KLVParser(value, self.key_length):
+            self._raw[key] = value
+
+    def _decode(self, key, value):
+        """Parse a single element.
 
         If a known parser is not available for key, parse as generic KLV element.
         """
-        for key, value in KLVParser(self.value, self.key_length):
-            try:
-                self.items[key] = self.parsers[key](value)
-            except (KeyError, TypeError, ValueError):
-                self.items[key] = self._unknown_element(key, value)
-            except Exception:
-                # None
-                qgsu.showUserAndLogMessage(
-                    "",
-                    "Value cannot be read for Tag: "
-                    + str(int.from_bytes(key, byteorder=sys.byteorder))
-                    + " value: "
-                    + str(value),
-                    onlyLog=True,
-                )
+        try:
+            return self.parsers[key](value)
+        except (KeyError, TypeError, ValueError):
+            return self._unknown_element(key, value)
+        except Exception:
+            # None
+            qgsu.showUserAndLogMessage(
+                "",
+                "Value cannot be read for Tag: "
+                + str(int.from_bytes(key, byteorder=sys.byteorder))
+                + " value: "
+                + str(value),
+                onlyLog=True,
+            )
+        return None
+
+    def _item(self, key):
+        """ Return the element of key, decoded on first access (None if missing) """
+        if self._items is not None:
+            return self._items.get(key)
+        if key in self._decoded:
+            return self._decoded[key]
+        value = self._raw.get(key)
+        if value is None:
+            return None
+        item = self._decoded[key] = self._decode(key, value)
+        return item
+
+    @property
+    def items(self):
+        """ Elements by key, in packet order """
+        if self._items is None:
+            items = OrderedDict()
+            for key in self._raw:
+                item = self._item(key)
+                if item is not None:
+                    items[key] = item
+            self._items = items
+            # Everything is decoded, the index is not needed anymore
+            self._raw = self._decoded = None
+        return self._items
+
+    def _field(self, tag):
+        """ Return a well-known field, decoding its element on first access """
+        record = self._record
+        value = None if record is None else record[_POSITIONS[tag]]
+        if value is None:
+            item = self._item(bytes((tag,)))
+            if item is not None and getattr(item.value, "value", None) is not None:
+                try:
+                    setattr(self, _FIELDS[tag], item.value.value)
+                except (TypeError, ValueError):
+                    # Malformed value, not a number
+                    return None
+                value = self._record[_POSITIONS[tag]]
+        return value
+
+    def _set(self, tag, value):
+        """ Store a well-known field """
+        if self._record is None:
+            self._record = [None] * len(_FIELDS)
+        self._record[_POSITIONS[tag]] = value
 
     @classmethod
     def add_parser(cls, obj):
@@ -154,68 +234,9 @@ class SetParser(Element):
                         continue
                     if not parentTAG:
                         metadata[item.TAG] = (item.LDSName, str(item.value.value))
-                        if item.TAG == 4:
-                            self.PlatformTailNumber = item.value.value
-                        elif item.TAG == 5:
-                            self.PlatformHeadingAngle = item.value.value
-                        elif item.TAG == 11:
-                            self.ImageSourceSensor = item.value.value
-                        elif item.TAG == 13:
-                            self.SensorLatitude = item.value.value
-                        elif item.TAG == 14:
-                            self.SensorLongitude = item.value.value
-                        elif item.TAG == 15:
-                            self.SensorTrueAltitude = item.value.value
-                        elif item.TAG == 16:
-                            self.SensorHorizontalFieldOfView = item.value.value
-                        elif item.TAG == 17:
-                            self.SensorVerticalFieldOfView = item.value.value
-                        elif item.TAG == 18:
-                            self.SensorRelativeAzimuthAngle = item.value.value
-                        elif item.TAG == 19:
-                            self.SensorRelativeElevationAngle = item.value.value
-                        elif item.TAG == 21:
-                            self.SlantRange = item.value.value
-                        elif item.TAG == 22:
-                            self.targetWidth = item.value.value
-                        elif item.TAG == 23:
-                            self.FrameCenterLatitude = item.value.value
-                        elif item.TAG == 24:
-                            self.FrameCenterLongitude = item.value.value
-                        elif item.TAG == 25:
-                            self.FrameCenterElevation = item.value.value
-                        elif item.TAG == 26:
-                            self.OffsetCornerLatitudePoint1 = item.value.value
-                        elif item.TAG == 27:
-                            self.OffsetCornerLongitudePoint1 = item.value.value
-                        elif item.TAG == 28:
-                            self.OffsetCornerLatitudePoint2 = item.value.value
-                        elif item.TAG == 29:
-                            self.OffsetCornerLongitudePoint2 = item.value.value
-                        elif item.TAG == 30:
-                            self.OffsetCornerLatitudePoint3 = item.value.value
-                        elif item.TAG == 31:
-                            self.OffsetCornerLongitudePoint3 = item.value.value
-                        elif item.TAG == 32:
-                            self.OffsetCornerLatitudePoint4 = item.value.value
-                        elif item.TAG == 33:
-                            self.OffsetCornerLongitudePoint4 = item.value.value
-                        elif item.TAG == 82:
-                            self.CornerLatitudePoint1Full = item.value.value
-                        elif item.TAG == 83:
-                            self.CornerLongitudePoint1Full = item.value.value
-                        elif item.TAG == 84:
-                            self.CornerLatitudePoint2Full = item.value.value
-                        elif item.TAG == 85:
-                            self.CornerLongitudePoint2Full = item.value.value
-                        elif item.TAG == 86:
-                            self.CornerLatitudePoint3Full = item.value.value
-                        elif item.TAG == 87:
-                            self.CornerLongitudePoint3Full = item.value.value
-                        elif item.TAG == 88:
-                            self.CornerLatitudePoint4Full = item.value.value
-                        elif item.TAG == 89:
-                            self.CornerLongitudePoint4Full = item.value.value
+                        name = _FIELDS.get(item.TAG)
+                        if name is not None:
+                            setattr(self, name, item.value.value)
                     else:
                         metadata[parentTAG][len(metadata[parentTAG]) - 1][item.TAG] = (
                             item.LDSName,
@@ -241,251 +262,251 @@ class SetParser(Element):
     # ------------ START Setters/Getters ------------
     @property
     def PlatformTailNumber(self):
-        return self._PlatformTailNumber
+        return self._field(4)
 
     @PlatformTailNumber.setter
     def PlatformTailNumber(self, value):
-        self._PlatformTailNumber = value
+        self._set(4, value)
 
     @property
     def PlatformHeadingAngle(self):
-        return self._PlatformHeadingAngle
+        return self._field(5)
 
     @PlatformHeadingAngle.setter
     def PlatformHeadingAngle(self, value):
-        self._PlatformHeadingAngle = float(value)
+        self._set(5, float(value))
 
     @property
     def ImageSourceSensor(self):
-        return self._ImageSourceSensor
+        return self._field(11)
 
     @ImageSourceSensor.setter
     def ImageSourceSensor(self, value):
-        self._ImageSourceSensor = value
+        self._set(11, value)
 
     @property
     def SensorLatitude(self):
-        return self._SensorLatitude
+        return self._field(13)
 
     @SensorLatitude.setter
     def SensorLatitude(self, value):
-        self._SensorLatitude = float(value)
+        self._set(13, float(value))
 
     @property
     def SensorLongitude(self):
-        return self._SensorLongitude
+        return self._field(14)
 
     @SensorLongitude.setter
     def SensorLongitude(self, value):
-        self._SensorLongitude = float(value)
+        self._set(14, float(value))
 
     @property
     def SensorTrueAltitude(self):
-        return self._SensorTrueAltitude
+        return self._field(15)
 
     @SensorTrueAltitude.setter
     def SensorTrueAltitude(self, value):
-        self._SensorTrueAltitude = float(value)
+        self._set(15, float(value))
 
     @property
     def SensorHorizontalFieldOfView(self):
-        return self._SensorHorizontalFieldOfView
+        return self._field(16)
 
     @SensorHorizontalFieldOfView.setter
     def SensorHorizontalFieldOfView(self, value):
-        self._SensorHorizontalFieldOfView = float(value)
+        self._set(16, float(value))
 
     @property
     def SensorVerticalFieldOfView(self):
-        return self._SensorVerticalFieldOfView
+        return self._field(17)
 
     @SensorVerticalFieldOfView.setter
     def SensorVerticalFieldOfView(self, value):
-        self._SensorVerticalFieldOfView = float(value)
+        self._set(17, float(value))
 
     @property
     def SensorRelativeAzimuthAngle(self):
-        return self._SensorRelativeAzimuthAngle
+        return self._field(18)
 
     @SensorRelativeAzimuthAngle.setter
     def SensorRelativeAzimuthAngle(self, value):
-        self._SensorRelativeAzimuthAngle = float(value)
+        self._set(18, float(value))
 
     @property
     def SensorRelativeElevationAngle(self):
-        return self._SensorRelativeElevationAngle
+        return self._field(19)
 
     @SensorRelativeElevationAngle.setter
     def SensorRelativeElevationAngle(self, value):
-        self._SensorRelativeElevationAngle = float(value)
+        self._set(19, float(value))
 
     @property
     def SlantRange(self):
-        return self._slantRange
+        return self._field(21)
 
     @SlantRange.setter
     def SlantRange(self, value):
-        self._slantRange = float(value)
+        self._set(21, float(value))
 
     @property
     def targetWidth(self):
-        return self._targetWidth
+        return self._field(22)
 
     @targetWidth.setter
     def targetWidth(self, value):
-        self._targetWidth = float(value)
+        self._set(22, float(value))
 
     @property
     def OffsetCornerLatitudePoint1(self):
-        return self._OffsetCornerLatitudePoint1
+        return self._field(26)
 
     @OffsetCornerLatitudePoint1.setter
     def OffsetCornerLatitudePoint1(self, value):
-        self._OffsetCornerLatitudePoint1 = float(value)
+        self._set(26, float(value))
 
     @property
     def OffsetCornerLongitudePoint1(self):
-        return self._OffsetCornerLongitudePoint1
+        return self._field(27)
 
     @OffsetCornerLongitudePoint1.setter
     def OffsetCornerLongitudePoint1(self, value):
-        self._OffsetCornerLongitudePoint1 = float(value)
+        self._set(27, float(value))
 
     @property
     def OffsetCornerLatitudePoint2(self):
-        return self._OffsetCornerLatitudePoint2
+        return self._field(28)
 
     @OffsetCornerLatitudePoint2.setter
     def OffsetCornerLatitudePoint2(self, value):
-        self._OffsetCornerLatitudePoint2 = float(value)
+        self._set(28, float(value))
 
     @property
     def OffsetCornerLongitudePoint2(self):
-        return self._OffsetCornerLongitudePoint2
+        return self._field(29)
 
     @OffsetCornerLongitudePoint2.setter
     def OffsetCornerLongitudePoint2(self, value):
-        self._OffsetCornerLongitudePoint2 = float(value)
+        self._set(29, float(value))
 
     @property
     def OffsetCornerLatitudePoint3(self):
-        return self._OffsetCornerLatitudePoint3
+        return self._field(30)
 
     @OffsetCornerLatitudePoint3.setter
     def OffsetCornerLatitudePoint3(self, value):
-        self._OffsetCornerLatitudePoint3 = float(value)
+        self._set(30, float(value))
 
     @property
     def OffsetCornerLongitudePoint3(self):
-        return self._OffsetCornerLongitudePoint3
+        return self._field(31)
 
     @OffsetCornerLongitudePoint3.setter
     def OffsetCornerLongitudePoint3(self, value):
-        self._OffsetCornerLongitudePoint3 = float(value)
+        self._set(31, float(value))
 
     @property
     def OffsetCornerLatitudePoint4(self):
-        return self._OffsetCornerLatitudePoint4
+        return self._field(32)
 
     @OffsetCornerLatitudePoint4.setter
     def OffsetCornerLatitudePoint4(self, value):
-        self._OffsetCornerLatitudePoint4 = float(value)
+        self._set(32, float(value))
 
     @property
     def OffsetCornerLongitudePoint4(self):
-        return self._OffsetCornerLongitudePoint4
+        return self._field(33)
 
     @OffsetCornerLongitudePoint4.setter
     def OffsetCornerLongitudePoint4(self, value):
-        self._OffsetCornerLongitudePoint4 = float(value)
+        self._set(33, float(value))
 
     @property
     def FrameCenterLatitude(self):
-        return self._FrameCenterLatitude
+        return self._field(23)
 
     @FrameCenterLatitude.setter
     def FrameCenterLatitude(self, value):
-        self._FrameCenterLatitude = float(value)
+        self._set(23, float(value))
 
     @property
     def FrameCenterLongitude(self):
-        return self._FrameCenterLongitude
+        return self._field(24)
 
     @FrameCenterLongitude.setter
     def FrameCenterLongitude(self, value):
-        self._FrameCenterLongitude = float(value)
+        self._set(24, float(value))
 
     @property
     def FrameCenterElevation(self):
-        return self._FrameCenterElevation
+        return self._field(25)
 
     @FrameCenterElevation.setter
     def FrameCenterElevation(self, value):
-        self._FrameCenterElevation = float(value)
+        self._set(25, float(value))
 
     @property
     def CornerLatitudePoint1Full(self):
-        return self._CornerLatitudePoint1Full
+        return self._field(82)
 
     @CornerLatitudePoint1Full.setter
     def CornerLatitudePoint1Full(self, value):
-        self._CornerLatitudePoint1Full = float(value)
+        self._set(82, float(value))
 
     @property
     def CornerLongitudePoint1Full(self):
-        return self._CornerLongitudePoint1Full
+        return self._field(83)
 
     @CornerLongitudePoint1Full.setter
     def CornerLongitudePoint1Full(self, value):
-        self._CornerLongitudePoint1Full = float(value)
+        self._set(83, float(value))
 
     @property
     def CornerLatitudePoint2Full(self):
-        return self._CornerLatitudePoint2Full
+        return self._field(84)
 
     @CornerLatitudePoint2Full.setter
     def CornerLatitudePoint2Full(self, value):
-        self._CornerLatitudePoint2Full = float(value)
+        self._set(84, float(value))
 
     @property
     def CornerLongitudePoint2Full(self):
-        return self._CornerLongitudePoint2Full
+        return self._field(85)
 
     @CornerLongitudePoint2Full.setter
     def CornerLongitudePoint2Full(self, value):
-        self._CornerLongitudePoint2Full = float(value)
+        self._set(85, float(value))
 
     @property
     def CornerLatitudePoint3Full(self):
-        return self._CornerLatitudePoint3Full
+        return self._field(86)
 
     @CornerLatitudePoint3Full.setter
     def CornerLatitudePoint3Full(self, value):
-        self._CornerLatitudePoint3Full = float(value)
+        self._set(86, float(value))
 
     @property
     def CornerLongitudePoint3Full(self):
-        return self._CornerLongitudePoint3Full
+        return self._field(87)
 
     @CornerLongitudePoint3Full.setter
     def CornerLongitudePoint3Full(self, value):
-        self._CornerLongitudePoint3Full = float(value)
+        self._set(87, float(value))
 
     @property
     def CornerLatitudePoint4Full(self):
-        return self._CornerLatitudePoint4Full
+        return self._field(88)
 
     @CornerLatitudePoint4Full.setter
     def CornerLatitudePoint4Full(self, value):
-        self._CornerLatitudePoint4Full = float(value)
+        self._set(88, float(value))
 
     @property
     def CornerLongitudePoint4Full(self):
-        return self._CornerLongitudePoint4Full
+        return self._field(89)
 
     @CornerLongitudePoint4Full.setter
     def CornerLongitudePoint4Full(self, value):
-        self._CornerLongitudePoint4Full = float(value)
+        self._set(89, float(value))
 
     # ------------ END Setters/Getters ------------
 
@@ -34,9 +34,12 @@ class StreamParser:
 
     def __init__(self, source):
         self.source = source
+        if isinstance(source, (bytes, bytearray)):
+            # Parse by offsets, element values are slices of source
+            source = memoryview(source)
 
         # All keys in parser are expected to be 16 bytes long.
-        self.iter_stream = KLVParser(self.source, key_length=16)
+        self.iter_stream = KLVParser(source, key_length=16)
 
     def __iter__(self):
         return self
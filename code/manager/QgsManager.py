@@ -16,7 +16,6 @@ import qgis.utils
 from PyQt5.QtGui import QColor
 
 from QGIS_FMV.player.QgsFmvDrawToolBar import DrawToolBar as draw
-from QGIS_FMV.converter.ffmpeg import FFMpeg
 from QGIS_FMV.gui.ui_FmvManager import Ui_ManagerWindow
 from QGIS_FMV.manager.QgsMultiplexor import Multiplexor
 from QGIS_FMV.manager.QgsFmvOpenStream import OpenStream
@@ -30,12 +29,16 @@ from QGIS_FMV.utils.QgsFmvUtils import (
     getVideoFolder,
     getVideoManagerList,
     getNameSpace,
-    getKlvStreamIndex,
-    getVideoLocationInfo,
+    getVideoCacheInfo,
+    SetVideoCacheInfo,
 )
+from QGIS_FMV.utils.QgsFmvGeocode import ReverseGeocoder
+from QGIS_FMV.utils.QgsFmvIngest import BatchIngestTask, VideoLoadTask
 from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
 from qgis.core import (
+    QgsApplication,
     QgsPointXY,
+    QgsRectangle,
     QgsProviderRegistry,
     QgsProviderConnectionException,
     QgsDataSourceUri,
@@ -48,7 +51,7 @@ from qgis.core import (
 )
 from PyQt5.QtMultimedia import QMediaPlaylist, QMediaContent
 from QGIS_FMV.klvdata.QgsFmvKlvReader import StreamMetaReader, BufferedMetaReader
-from QGIS_FMV.QgsFmvConstants import isWindows, parser
+from QGIS_FMV.QgsFmvConstants import ingest_workers, isWindows, parser
 
 try:
     from pydevd import *
@@ -68,11 +71,18 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
         self.iface = iface
         self._PlayerDlg = None
         self.meta_reader = []
+        self.klv_index = []
         self.initialPt = []
         self.pass_time = 250
         self.buf_interval = 2000
         self.update_interval = 2000
         self.loading = False
+        self.ingestTask = None
+        # Rows being loaded in the background by row id
+        self.loadTasks = {}
+        # Place names of the rows are looked up without blocking
+        self.geocoder = ReverseGeocoder(self)
+        self.geocoder.placeFound.connect(self.placeFound)
         self.playlist = QMediaPlaylist()
         self.VManager.viewport().installEventFilter(self)
 
@@ -182,6 +192,11 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
 
             self.VManager.removeRow(idx)
 
+            # Stop loading it
+            task = self.loadTasks.pop(row_id, None)
+            if task is not None:
+                task.cancel()
+
             self.videoPlayable.pop(idx)
             self.videoIsStreaming.pop(idx)
             self.initialPt.pop(idx)
@@ -195,6 +210,7 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
                 self.meta_reader[idx].dispose()
 
             self.meta_reader.pop(idx)
+            self.klv_index.pop(idx)
 
             # remove from playlist
             self.playlist.removeMedia(idx)
@@ -325,22 +341,12 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
             )
 
     def AddFileRowToManager(
-        self, name, filename, load_id=None, islocal=False, klv_folder=None
+        self, name, filename, load_id=None, islocal=False, klv_folder=None, load=True
     ):
-        """ Add file Video to new Row """
-        # We limit the number of videos due to the buffer
+        """Add file Video to new Row.
+        With load False the video is not probed, the row is left not applicable.
+        """
         self.loading = True
-        if self.VManager.rowCount() > 5:
-            qgsu.showUserAndLogMessage(
-                QCoreApplication.translate(
-                    "ManagerDock",
-                    "You must delete some video from the list before adding a new one",
-                ),
-                level=QGis.Warning,
-            )
-            self.loading = False
-            return
-
         self.islocal = islocal
         self.klv_folder = klv_folder
         w = QWidget()
@@ -389,6 +395,11 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
         if not self.videoIsStreaming[-1]:
             # Disable row if not exist video file
             if not os.path.exists(filename):
+                self.meta_reader.append(None)
+                self.klv_index.append(None)
+                self.initialPt.append(None)
+                # Keep the playlist in step with the rows
+                self.playlist.addMedia(QMediaContent(QUrl.fromLocalFile(filename)))
                 self.ToggleActiveRow(rowPosition, value="Missing source file")
                 for j in range(self.VManager.columnCount()):
                     try:
@@ -406,91 +417,172 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
                 self.loading = False
                 return
 
-            pbar.setValue(30)
-            info = FFMpeg().probe(filename)
-            if info is None:
-                qgsu.showUserAndLogMessage(
-                    QCoreApplication.translate(
-                        "ManagerDock", "Failed loading FFMPEG ! "
-                    )
-                )
+            # The metadata buffered reader is created when the video is played
+            self.meta_reader.append(None)
+            self.klv_index.append(None)
+            self.initialPt.append(None)
+            self.playlist.addMedia(QMediaContent(QUrl.fromLocalFile(filename)))
+
+            if not load:
+                pbar.setValue(100)
+                self.ToggleActiveRow(rowPosition, value="Video not applicable")
+                self.loading = False
+                return
+
+            # Probe and locate the video in the background
+            task = VideoLoadTask(str(row_id), filename, islocal, klv_folder)
+            task.stageChanged.connect(self.loadVideoStage)
+            task.taskCompleted.connect(lambda: self.loadVideoFinished(task))
+            task.taskTerminated.connect(lambda: self.loadVideoFinished(task))
+            self.loadTasks[str(row_id)] = task
+            QgsApplication.taskManager().addTask(task)
+            self.loading = False
+            return
+
+        self.meta_reader.append(StreamMetaReader(filename))
+        self.klv_index.append(None)
+        qgsu.showUserAndLogMessage("", "StreamMetaReader initialized.", onlyLog=True)
+        self.initialPt.append(None)
+        self.videoPlayable[rowPosition] = True
+
+        # show video from splitter (port +1)
+        oldPort = filename.split(":")[2]
+        newPort = str(int(oldPort) + 10)
+        proto = filename.split(":")[0]
+        url = QUrl(proto + "://127.0.0.1:" + newPort)
+        self.playlist.addMedia(QMediaContent(url))
+
+        pbar.setValue(100)
+        self.ToggleActiveRow(rowPosition, value="Ready")
+        # Add video to settings list
+        AddVideoToSettings(str(row_id), filename)
 
-            klvIdx = getKlvStreamIndex(filename, islocal)
+        self.loading = False
 
-            # init non-blocking metadata buffered reader
-            self.meta_reader.append(
-                BufferedMetaReader(
-                    filename,
-                    klv_index=klvIdx,
-                    pass_time=self.pass_time,
-                    interval=self.buf_interval,
+    def findRow(self, row_id):
+        """ Current row of a row id, None if it was removed """
+        for row in range(self.VManager.rowCount()):
+            if self.VManager.item(row, 0).text() == row_id:
+                return row
+        return None
+
+    def loadVideoStage(self, row_id, progress):
+        """ Update the progress bar of a row being loaded """
+        row = self.findRow(row_id)
+        if row is not None:
+            self.VManager.cellWidget(row, 5).findChild(QProgressBar).setValue(progress)
+
+    def loadVideoFinished(self, task):
+        """ Fill the row of a video loaded in the background """
+        self.loadTasks.pop(task.row_id, None)
+        row = self.findRow(task.row_id)
+        if row is None:
+            return
+        pbar = self.VManager.cellWidget(row, 5).findChild(QProgressBar)
+
+        self.klv_index[row] = task.klv_index
+        self.initialPt[row] = task.location
+        if task.error is not None:
+            qgsu.showUserAndLogMessage(
+                QCoreApplication.translate(
+                    "ManagerDock", "This video doesn't have Metadata ! "
                 )
             )
+            pbar.setValue(100)
+            self.ToggleActiveRow(row, value="Video not applicable")
+            return
 
-            pbar.setValue(60)
-            try:
-                # init point we can center the video on
-                self.initialPt.append(
-                    getVideoLocationInfo(filename, islocal, klv_folder)
-                )
-                if not self.initialPt[rowPosition]:
-                    self.VManager.setItem(
-                        rowPosition,
-                        4,
-                        QTableWidgetItem(
-                            QCoreApplication.translate(
-                                "ManagerDock", "Start location not available."
-                            )
-                        ),
+        if not task.location:
+            self.VManager.setItem(
+                row,
+                4,
+                QTableWidgetItem(
+                    QCoreApplication.translate(
+                        "ManagerDock", "Start location not available."
                     )
-                    self.ToggleActiveRow(rowPosition, value="Video not applicable")
-                    pbar.setValue(100)
+                ),
+            )
+            self.ToggleActiveRow(row, value="Video not applicable")
+            pbar.setValue(100)
+            return
 
-                else:
-                    self.VManager.setItem(
-                        rowPosition, 4, QTableWidgetItem(self.initialPt[rowPosition][2])
-                    )
-                    pbar.setValue(90)
-                    self.videoPlayable[rowPosition] = True
-            except Exception:
+        self.VManager.setItem(row, 4, QTableWidgetItem(task.location[2]))
+        if task.location[2] == "-" and None not in task.location[:2]:
+            self.geocoder.lookup(
+                (task.row_id, task.videoPath, task.islocal),
+                task.location[0],
+                task.location[1],
+            )
+        self.videoPlayable[row] = True
+        pbar.setValue(100)
+        if task.islocal:
+            self.ToggleActiveRow(row, value="Ready Local")
+        else:
+            self.ToggleActiveRow(row, value="Ready")
+        # Add video to settings list
+        AddVideoToSettings(task.row_id, task.videoPath)
+
+    def placeFound(self, key, name):
+        """ Show the place name of a row """
+        row_id, filename, islocal = key
+        row = self.findRow(row_id)
+        if row is None or not self.initialPt[row]:
+            return
+        self.initialPt[row][2] = name
+        self.VManager.setItem(row, 4, QTableWidgetItem(name))
+        if not islocal:
+            SetVideoCacheInfo(filename, location=self.initialPt[row])
+
+    def AddFilesToManager(self, filenames):
+        """Add many video files.
+        They are probed and indexed concurrently in a background task and
+        every row is added as soon as its video is ready.
+        """
+        videos = []
+        for filename in filenames:
+            if self.isFileInPlaylist(filename) or filename in videos:
                 qgsu.showUserAndLogMessage(
                     QCoreApplication.translate(
-                        "ManagerDock", "This video doesn't have Metadata ! "
+                        "ManagerDock", "File is already loaded in playlist: " + filename
                     )
                 )
-                pbar.setValue(100)
-                self.ToggleActiveRow(rowPosition, value="Video not applicable")
+            else:
+                videos.append(filename)
 
-        else:
-            self.meta_reader.append(StreamMetaReader(filename))
+        if len(videos) == 1 or "://" in "".join(videos):
+            for filename in videos:
+                self.AddFileRowToManager(os.path.basename(filename), filename)
+            return
+        if not videos:
+            return
+
+        task = BatchIngestTask(videos, ingest_workers)
+        task.videoReady.connect(self.ingestVideoReady)
+        task.taskCompleted.connect(self.ingestFinished)
+        task.taskTerminated.connect(self.ingestFinished)
+        # Keep a reference while the task runs
+        self.ingestTask = task
+        QgsApplication.taskManager().addTask(task)
+
+    def ingestVideoReady(self, filename, summary):
+        """Add the row of a video ingested in the background.
+        A video that failed is still listed, as not applicable.
+        """
+        if summary is None:
             qgsu.showUserAndLogMessage(
-                "", "StreamMetaReader initialized.", onlyLog=True
+                QCoreApplication.translate(
+                    "ManagerDock", "Failed loading video: " + filename
+                ),
+                level=QGis.Warning,
+            )
+        if not self.isFileInPlaylist(filename):
+            self.AddFileRowToManager(
+                os.path.basename(filename), filename, load=summary is not None
             )
-            self.initialPt.append(None)
-            self.videoPlayable[rowPosition] = True
-
-        url = ""
-        if self.videoIsStreaming[-1]:
-            # show video from splitter (port +1)
-            oldPort = filename.split(":")[2]
-            newPort = str(int(oldPort) + 10)
-            proto = filename.split(":")[0]
-            url = QUrl(proto + "://127.0.0.1:" + newPort)
-        else:
-            url = QUrl.fromLocalFile(filename)
-
-        self.playlist.addMedia(QMediaContent(url))
-
-        if self.videoPlayable[rowPosition]:
-            pbar.setValue(100)
-            if islocal:
-                self.ToggleActiveRow(rowPosition, value="Ready Local")
-            else:
-                self.ToggleActiveRow(rowPosition, value="Ready")
-            # Add video to settings list
-            AddVideoToSettings(str(row_id), filename)
 
-        self.loading = False
+    def ingestFinished(self):
+        """ Batch ingest task finished """
+        self.ingestTask = None
 
     def openVideoFileDialog(self):
         """ Open video file dialog """
@@ -499,20 +591,15 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
 
         Exts = ast.literal_eval(parser.get("FILES", "Exts"))
 
-        filename, _ = askForFiles(
-            self, QCoreApplication.translate("ManagerDock", "Open video"), exts=Exts
+        filenames, _ = askForFiles(
+            self,
+            QCoreApplication.translate("ManagerDock", "Open video"),
+            allowMultiple=True,
+            exts=Exts,
         )
 
-        if filename:
-            if not self.isFileInPlaylist(filename):
-                _, name = os.path.split(filename)
-                self.AddFileRowToManager(name, filename)
-            else:
-                qgsu.showUserAndLogMessage(
-                    QCoreApplication.translate(
-                        "ManagerDock", "File is already loaded in playlist: " + filename
-                    )
-                )
+        if filenames:
+            self.AddFilesToManager(filenames)
 
         return
 
@@ -570,6 +657,17 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
         else:
             self._PlayerDlg.playFile(path)
 
+    def getMetaReader(self, row):
+        """ Metadata reader of a row, created the first time it is played """
+        if self.meta_reader[row] is None and not self.videoIsStreaming[row]:
+            self.meta_reader[row] = BufferedMetaReader(
+                self.VManager.item(row, 3).text(),
+                klv_index=self.klv_index[row],
+                pass_time=self.pass_time,
+                interval=self.buf_interval,
+            )
+        return self.meta_reader[row]
+
     def SetupPlayer(self, row):
         """Play video from manager dock.
         Manager row double clicked
@@ -580,23 +678,37 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
 
         # qgsu.CustomMessage("QGIS FMV", path, self._PlayerDlg.fileName, icon="Information")
         # if path != self._PlayerDlg.fileName:
-        self._PlayerDlg.setMetaReader(self.meta_reader[row])
+        self._PlayerDlg.setMetaReader(self.getMetaReader(row))
         self.ToggleActiveFromTitle()
         self._PlayerDlg.show()
         self._PlayerDlg.activateWindow()
 
         # zoom to map zone
         curAuthId = self.iface.mapCanvas().mapSettings().destinationCrs().authid()
+        xform = None
+        if curAuthId != "EPSG:4326":
+            trgCode = int(curAuthId.split(":")[1])
+            xform = QgsCoordinateTransform(
+                QgsCoordinateReferenceSystem(4326),
+                QgsCoordinateReferenceSystem(trgCode),
+                QgsProject().instance(),
+            )
+
+        # Whole video footprint, computed when the video was ingested
+        footprint = None
+        if not self.videoIsStreaming[row]:
+            path = self.VManager.item(row, 3).text()
+            footprint = getVideoCacheInfo(path).get("footprint")
+        if footprint:
+            extent = QgsRectangle(*footprint)
+            if xform is not None:
+                extent = xform.transformBoundingBox(extent)
+            self.iface.mapCanvas().setExtent(extent)
+            return
 
         if self.initialPt[row][1] is not None and self.initialPt[row][0] is not None:
             map_pos = QgsPointXY(self.initialPt[row][1], self.initialPt[row][0])
-            if curAuthId != "EPSG:4326":
-                trgCode = int(curAuthId.split(":")[1])
-                xform = QgsCoordinateTransform(
-                    QgsCoordinateReferenceSystem(4326),
-                    QgsCoordinateReferenceSystem(trgCode),
-                    QgsProject().instance(),
-                )
+            if xform is not None:
                 map_pos = xform.transform(map_pos)
 
             self.iface.mapCanvas().setCenter(map_pos)
@@ -610,7 +722,7 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
             path,
             interval,
             parent=self,
-            meta_reader=self.meta_reader[row],
+            meta_reader=self.getMetaReader(row),
             pass_time=self.pass_time,
             islocal=islocal,
             klv_folder=klv_folder,
@@ -647,6 +759,10 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
 
     def closeEvent(self, _):
         """ Close Manager Event """
+        for task in list(self.loadTasks.values()) + [self.ingestTask]:
+            if task is not None:
+                task.cancel()
+        self.geocoder.abort()
         FmvDock = qgis.utils.plugins[getNameSpace()]
         FmvDock._FMVManager = None
         try:
@@ -683,17 +799,16 @@ class FmvManager(QDockWidget, Ui_ManagerWindow):
             e.accept()
 
     def dropEvent(self, e):
+        filenames = []
         for url in e.mimeData().urls():
             # local files
             if "file:///" in url.toString():
                 if isWindows:
-                    if not self.isFileInPlaylist(url.toString()[8:]):
-                        self.AddFileRowToManager(url.fileName(), url.toString()[8:])
+                    filenames.append(url.toString()[8:])
                 else:
                     # In linux need /home/.. the firts slash
-                    if not self.isFileInPlaylist(url.toString()[7:]):
-                        self.AddFileRowToManager(url.fileName(), url.toString()[7:])
+                    filenames.append(url.toString()[7:])
             # network drives
             else:
-                if not self.isFileInPlaylist(url.toString()[5:]):
-                    self.AddFileRowToManager(url.fileName(), url.toString()[5:])
+                filenames.append(url.toString()[5:])
+        self.AddFilesToManager(filenames)
@@ -32,12 +32,14 @@ from QGIS_FMV.utils.QgsFmvLayers import (
     CreateGroupByName,
     RemoveGroupByName,
 )
+from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeriesTask
 from QGIS_FMV.utils.QgsFmvUtils import (
     ResetData,
     getVideoFolder,
     BurnDrawingsImage,
     _spawn,
     UpdateLayers,
+    UpdateFootprintSample,
     askForFiles,
     askForFolder,
     setCenterMode,
@@ -92,11 +94,17 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
         self.createingMosaic = False
         self.currentInfo = 0.0
         self.data = None
+        self.packet = None
         self.staticDraw = False
         self.playbackRateSlow = 0.7
         self.closing = False
         self.btn_stop.setEnabled(False)
         self.PrecisionTimeStamp = ""
+        # Interpolated footprints, see footprintSeries
+        self.footprints = None
+        self.footprintTask = None
+        # The current footprint was drawn from footprints
+        self.footprintInterpolated = False
 
         # Setup Canvas and MapTool
         self.map_canvas = self.iface.mapCanvas()
@@ -173,6 +181,51 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
 
     def setMetaReader(self, meta_reader):
         self.meta_reader = meta_reader
+        self.cancelFootprintSeries()
+
+    def footprintSeries(self):
+        """Interpolated footprints of the video, built in the background once
+        the KLV index is ready. None until then.
+        """
+        if (
+            self.footprints is None
+            and self.footprintTask is None
+            and self.meta_reader is not None
+            and self.meta_reader.hasIndex()
+        ):
+            task = FootprintSeriesTask(
+                self.meta_reader.index, os.path.basename(self.fileName)
+            )
+            task.taskCompleted.connect(lambda: self.footprintSeriesReady(task))
+            self.footprintTask = task
+            QgsApplication.taskManager().addTask(task)
+        return self.footprints
+
+    def footprintSeriesReady(self, task):
+        if task is self.footprintTask:
+            self.footprints = task.series
+
+    def cancelFootprintSeries(self):
+        if self.footprintTask is not None:
+            self.footprintTask.cancel()
+        self.footprintTask = None
+        self.footprints = None
+
+    def updateFootprint(self, currentInfo):
+        """Draw the footprint interpolated at the exact video position, so
+        the decoded packets do not draw it again.
+        @type currentInfo: float
+        @param currentInfo: Current time value in seconds
+        @return: True if the footprint was drawn
+        """
+        series = self.footprintSeries()
+        if series is None:
+            return False
+        sample = series.at(currentInfo * 1000.0)
+        if sample is None:
+            return False
+        UpdateFootprintSample(sample, group=self.fileName)
+        return True
 
     def jump_to_position(self):
         """Activates the Point MapTool"""
@@ -288,7 +341,8 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
     def get_metadata_from_buffer(self, currentTime=None):
         """Metadata CallBack
         @type currentTime: String
-        @param currentTime: Current video timestamp
+        @param currentTime: Current video timestamp (media position in
+        milliseconds while streaming)
         """
         try:
             # There is no way to spawn a thread and call after join() without blocking the video UI thread.
@@ -364,26 +418,33 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
                     onlyLog=True,
                 )
                 continue
-            data = packet.MetadataList()
-            self.data = data
+            # The packet decodes its tags on first access, the full metadata
+            # list is only built when it is shown (or asked for)
+            self.packet = packet
+            self.data = None
             if (
                 self.metadataDlg.isVisible()
             ):  # Only add metadata to table if this QDockWidget is visible (speed plugin)
-                self.addMetadata(data)
+                self.addMetadata(self.GetPacketData())
             # try:
             # Exit when the first correct packet has been drawn successfully.
             res = UpdateLayers(
-                packet, parent=self, mosaic=self.createingMosaic, group=self.fileName
+                packet,
+                parent=self,
+                mosaic=self.createingMosaic,
+                group=self.fileName,
+                footprint=not self.footprintInterpolated,
             )
             if res:
                 # qgsu.showUserAndLogMessage("", "Updating layer for Precision Time Stamp:"+ str(self.data[2]))
                 # for key, value in self.data.items():
                 #    qgsu.showUserAndLogMessage("", "key:"+ str(key) + " value:" +  str(value))
-                for key in sorted(data.keys()):
-                    # qgsu.showUserAndLogMessage("", "key:"+ str(key) + " value:" +  str(data[key][0]))
-                    if str(data[key][0]) == "Precision Time Stamp":
-                        self.PrecisionTimeStamp = str(data[key][1].split(".")[0])
-                QApplication.processEvents()
+                try:
+                    timestamp = str(packet[b"\x02"].value.value)
+                    self.PrecisionTimeStamp = timestamp.split(".")[0]
+                except (KeyError, AttributeError):
+                    pass
+                # The map is repainted by the refresh coalescer
                 break
             # skip this packet
             # except Exception as e:
@@ -461,6 +522,8 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
 
     def GetPacketData(self):
         """ Return Current Packet data """
+        if self.data is None and self.packet is not None:
+            self.data = self.packet.MetadataList()
         return self.data
 
     def addMetadata(self, packet):
@@ -1129,12 +1192,26 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
             tStr = currentTime + " / " + totalTime
             currentTimeInfo = qgsu._seconds_to_time_frac(currentInfo)
 
+            # The interpolated footprint is drawn before the packet layers
+            self.footprintInterpolated = (
+                not self.isStreaming
+                and not self.islocal
+                and self.updateFootprint(currentInfo)
+            )
+
             if self.isStreaming:
-                # get last metadata available
-                self.get_metadata_from_buffer()
+                # metadata of the frame shown, or the last available
+                self.get_metadata_from_buffer(self.player.position())
 
             elif self.islocal:
                 self.readLocal(currentInfo)
+            elif (
+                isPrecise
+                and self.meta_reader is not None
+                and self.meta_reader.hasIndex()
+            ):
+                # The KLV index gives the precise packet without spawning
+                self.get_metadata_from_buffer(currentTimeInfo)
             elif isPrecise:
                 nextTime = currentInfo + self.pass_time / 1000
                 nextTimeInfo = qgsu._seconds_to_time_frac(nextTime)
@@ -1752,7 +1829,7 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
         else:
             self.metadataDlg.show()
 
-        self.addMetadata(self.data)
+        self.addMetadata(self.GetPacketData())
         return
 
     def OpenOptions(self):
@@ -1825,6 +1902,7 @@ class QgsFmvPlayer(QMainWindow, Ui_PlayerWindow):
             self.meta_reader.dispose()
         except Exception:
             None
+        self.cancelFootprintSeries()
 
         # Stop Video
         self.stop()
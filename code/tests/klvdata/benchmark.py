@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""Performance benchmarks of the klvdata package.
+
+Not collected by the unit tests, run it from this folder:
+
+    python benchmark.py --hours 2 --output results.json
+
+Every benchmark reports packets (or values) per second, the results are
+printed (or saved) as JSON to track regressions across releases.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from struct import pack
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SAMPLES = (
+    "DynamicConstantMISMMSPacketData.bin",
+    "DynamicOnlyMISMMSPacketData.bin",
+)
+
+
+def read_sample(name):
+    with open(os.path.join(DATA_FOLDER, name), "rb") as f:
+        return f.read()
+
+
+def synthetic_stream(hours, rate, sample):
+    """Return a KLV stream of hours x rate packets built from a sample
+    packet, every packet with its own Precision Time Stamp.
+    """
+    from QGIS_FMV.klvdata.common import ber_encode
+    from QGIS_FMV.klvdata.klvparser import KLVParser
+
+    key = sample[:16]
+    # Sample tags but the time stamp, which is written first
+    items = [
+        bytes(k) + ber_encode(len(v)) + bytes(v)
+        for k, v in KLVParser(next(KLVParser(sample, 16))[1], 1)
+        if k != b"\x02"
+    ]
+    body = b"".join(items)
+
+    start = int(datetime(2020, 1, 1).timestamp() * 1e6)
+    step = int(1e6 / rate)
+    packets = []
+    for i in range(int(hours * 3600 * rate)):
+        value = b"\x02\x08" + pack(">Q", start + i * step) + body
+        packets.append(key + ber_encode(len(value)) + value)
+    return b"".join(packets)
+
+
+def measure(function, count, repeat):
+    """ Return the best time of repeat calls of function, as a result dict """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {
+        "count": count,
+        "seconds": best,
+        "per_second": count / best if best else None,
+    }
+
+
+def run(hours=1.0, rate=10.0, repeat=3, loops=2000):
+    from QGIS_FMV.klvdata.batchparser import BatchParser
+    from QGIS_FMV.klvdata.common import bytes_to_float, float_to_bytes
+    from QGIS_FMV.klvdata.klvparser import KLVParser
+    from QGIS_FMV.klvdata.misb0601 import SensorLatitude, UASLocalMetadataSet
+    from QGIS_FMV.klvdata.streamparser import StreamParser
+
+    results = {}
+
+    for name in SAMPLES:
+        sample = read_sample(name)
+        value = bytes(next(KLVParser(sample, 16))[1])
+        stream = sample * loops
+        prefix = os.path.splitext(name)[0] + "."
+
+        results[prefix + "StreamParser"] = measure(
+            lambda: [p for p in StreamParser(stream)], loops, repeat
+        )
+        results[prefix + "SetParser.parse"] = measure(
+            lambda: [UASLocalMetadataSet(value).items for _ in range(loops)],
+            loops,
+            repeat,
+        )
+        results[prefix + "SetParser.lazy_field"] = measure(
+            lambda: [UASLocalMetadataSet(value).SensorLatitude for _ in range(loops)],
+            loops,
+            repeat,
+        )
+        results[prefix + "MetadataList"] = measure(
+            lambda: [UASLocalMetadataSet(value).MetadataList() for _ in range(loops)],
+            loops,
+            repeat,
+        )
+        results[prefix + "encode_roundtrip"] = measure(
+            lambda: [
+                b"".join(bytes(item) for item in p.items.values())
+                for p in StreamParser(stream)
+            ],
+            loops,
+            repeat,
+        )
+        results[prefix + "BatchParser"] = measure(
+            lambda: BatchParser().parseStream(stream), loops, repeat
+        )
+
+    domain, range_, error = (
+        SensorLatitude._domain,
+        SensorLatitude._range,
+        SensorLatitude._error,
+    )
+    raw = bytes(SensorLatitude(b"\x55\x27\x2e\x8a").value)
+    values = loops * 10
+    results["bytes_to_float"] = measure(
+        lambda: [bytes_to_float(raw, domain, range_, error) for _ in range(values)],
+        values,
+        repeat,
+    )
+    results["float_to_bytes"] = measure(
+        lambda: [float_to_bytes(59.9, domain, range_, error) for _ in range(values)],
+        values,
+        repeat,
+    )
+
+    stream = synthetic_stream(hours, rate, read_sample(SAMPLES[0]))
+    count = int(hours * 3600 * rate)
+    results["synthetic.StreamParser"] = measure(
+        lambda: [p for p in StreamParser(stream)], count, 1
+    )
+    results["synthetic.StreamParser.MetadataList"] = measure(
+        lambda: [p.MetadataList() for p in StreamParser(stream)], count, 1
+    )
+    results["synthetic.BatchParser"] = measure(
+        lambda: BatchParser().parseStream(stream), count, 1
+    )
+
+    return {
+        "date": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "synthetic": {"hours": hours, "rate": rate, "bytes": len(stream)},
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--hours", type=float, default=1.0, help="synthetic stream duration"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=10.0, help="synthetic packets per second"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument(
+        "--loops", type=int, default=2000, help="sample packets per run"
+    )
+    parser.add_argument("--output", help="JSON file, printed if not set")
+    args = parser.parse_args(argv)
+
+    report = run(args.hours, args.rate, args.repeat, args.loops)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
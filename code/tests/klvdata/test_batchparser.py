@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import math
+import unittest
+
+
+class BatchParser(unittest.TestCase):
+    def setUp(self):
+        with open("./data/DynamicConstantMISMMSPacketData.bin", "rb") as f:
+            self.packet = f.read()
+
+    def test_matches_setparser(self):
+        from QGIS_FMV.klvdata.batchparser import BatchParser
+        from QGIS_FMV.klvdata.streamparser import StreamParser
+
+        parser = BatchParser()
+        records = parser.parseStream(self.packet)
+        self.assertEqual(len(records), 1)
+
+        expected = next(iter(StreamParser(self.packet)))
+        for item in expected.items.values():
+            name = type(item).__name__
+            if name not in records.dtype.names:
+                continue
+            with self.subTest(name=name):
+                value = records[name][0]
+                if isinstance(item.value.value, float):
+                    self.assertTrue(math.isclose(value, item.value.value))
+                elif name in ("PrecisionTimeStamp", "EventStartTime"):
+                    self.assertEqual(
+                        value.astype("M8[us]").item(),
+                        item.value.value.replace(tzinfo=None),
+                    )
+                else:
+                    self.assertEqual(value, item.value.value)
+
+    def test_stream(self):
+        from QGIS_FMV.klvdata.batchparser import BatchParser
+
+        parser = BatchParser()
+        # Garbage before the key and a truncated packet at the end
+        data = b"\x00\x01" + self.packet * 3 + self.packet[:40]
+        records = parser.parseStream(data)
+        self.assertEqual(len(records), 3)
+        latitudes = list(records["SensorLatitude"])
+        self.assertEqual(latitudes, [latitudes[0]] * 3)
+
+    def test_error_value(self):
+        from QGIS_FMV.klvdata.batchparser import BatchParser
+
+        parser = BatchParser()
+        # Sensor Latitude error value and a missing tag
+        records = parser.parse([b"\x0d\x04\x80\x00\x00\x00"])
+        self.assertTrue(math.isnan(records["SensorLatitude"][0]))
+        self.assertTrue(math.isnan(records["SensorLongitude"][0]))
+
+    def test_view(self):
+        from QGIS_FMV.klvdata.batchparser import BatchParser, RecordView
+        from QGIS_FMV.klvdata.streamparser import StreamParser
+
+        records = BatchParser().parseStream(self.packet)
+        view = RecordView(records, 0)
+        expected = next(iter(StreamParser(self.packet)))
+        expected.MetadataList()
+
+        self.assertAlmostEqual(view.SensorLatitude, expected.SensorLatitude)
+        self.assertAlmostEqual(view.SlantRange, expected.SlantRange)
+        self.assertEqual(view.PlatformTailNumber, expected.PlatformTailNumber)
+        self.assertIsNone(view.CornerLatitudePoint1Full)
+        with self.assertRaises(AttributeError):
+            view.NotATag
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -84,5 +84,44 @@ class ElementTLV(unittest.TestCase):
         )
 
 
+class ElementSlots(unittest.TestCase):
+    def setUp(self):
+        with open("./data/DynamicConstantMISMMSPacketData.bin", "rb") as f:
+            self.packet = f.read()
+
+    def test_no_instance_dict(self):
+        from QGIS_FMV.klvdata.streamparser import StreamParser
+
+        packet = next(iter(StreamParser(self.packet)))
+        packet.MetadataList()
+        self.assertFalse(hasattr(packet, "__dict__"))
+        for item in packet.items.values():
+            with self.subTest(name=item.name):
+                self.assertFalse(hasattr(item, "__dict__"))
+                self.assertFalse(hasattr(item.value, "__dict__"))
+
+    def test_memory(self):
+        import tracemalloc
+
+        from QGIS_FMV.klvdata.streamparser import StreamParser
+
+        count = 200
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            packets = []
+            for _ in range(count):
+                packet = next(iter(StreamParser(bytes(self.packet))))
+                packet.MetadataList()
+                packets.append(packet)
+            size = (tracemalloc.get_traced_memory()[0] - start) / count
+        finally:
+            tracemalloc.stop()
+
+        # About 10 KB per decoded packet with compact elements, it was
+        # over 22 KB with instance dictionaries.
+        self.assertLess(size, 16000)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Corners (UL, UR, LR, LL) of the sample packets, as computed by
+# CornerEstimationWithoutOffsets before the footprint math was split out
+SAMPLE_CORNERS = [
+    [-8.50862236118855, 27.473825959038095],
+    [-8.504426814276966, 27.479059402387065],
+    [-12.469763924063354, 30.78146608659904],
+    [-12.473808870000244, 30.776463731638046],
+]
+
+
+def setUpModule():
+    # The geodesic distances and the GeoPackage writer need QGIS
+    from QGIS_FMV.utils.QgsFmvExport import _initWorker
+
+    _initWorker()
+
+
+def read_packet(name):
+    from QGIS_FMV.klvdata.streamparser import StreamParser
+
+    with open(os.path.join(DATA_FOLDER, name), "rb") as f:
+        return next(iter(StreamParser(f.read())))
+
+
+def packet(**values):
+    """ Packet with only the corner values """
+    names = ["CornerLatitudePoint1Full", "OffsetCornerLatitudePoint1"]
+    return SimpleNamespace(**dict({name: None for name in names}, **values))
+
+
+class ComputePacketCorners(unittest.TestCase):
+    def assertCorners(self, corners, expected):
+        self.assertEqual(len(corners), 4)
+        for corner, value in zip(corners, expected):
+            self.assertAlmostEqual(corner[0], value[0], places=9)
+            self.assertAlmostEqual(corner[1], value[1], places=9)
+
+    def test_sample(self):
+        from QGIS_FMV.utils.QgsFmvUtils import ComputePacketCorners
+
+        for name in (
+            "DynamicConstantMISMMSPacketData.bin",
+            "DynamicOnlyMISMMSPacketData.bin",
+        ):
+            corners = ComputePacketCorners(read_packet(name))
+            self.assertCorners(corners, SAMPLE_CORNERS)
+
+    def test_slant_range(self):
+        from QGIS_FMV.utils.QgsFmvUtils import ComputeCornersWithoutOffsets
+
+        # No target width, computed from the slant range
+        corners = ComputeCornersWithoutOffsets(
+            37.38, -5.99, 1500.0, 37.39, -5.98, 20.0, 6.0, 8.0, 45.0, 10.0, 0, 2500.0
+        )
+        self.assertCorners(
+            corners,
+            [
+                [37.39246187702804, -5.979494931846261],
+                [37.38953502214933, -5.976915577533077],
+                [37.38798435727565, -5.980589179922276],
+                [37.390249465172815, -5.982585457550272],
+            ],
+        )
+        # No ground distance without the sensor altitude
+        self.assertIsNone(
+            ComputeCornersWithoutOffsets(
+                37.38, -5.99, None, 37.39, -5.98, 20.0, 6.0, 8.0, 45.0, 10.0, 0, 0
+            )
+        )
+
+    def test_offsets(self):
+        from QGIS_FMV.utils.QgsFmvUtils import ComputePacketCorners
+
+        offsets = {}
+        for i, (lat, lon) in enumerate(
+            [(0.01, -0.01), (0.01, 0.01), (-0.01, 0.01), (-0.01, -0.01)], 1
+        ):
+            offsets["OffsetCornerLatitudePoint%d" % i] = lat
+            offsets["OffsetCornerLongitudePoint%d" % i] = lon
+        corners = ComputePacketCorners(
+            packet(FrameCenterLatitude=37.0, FrameCenterLongitude=-5.0, **offsets)
+        )
+        self.assertCorners(
+            corners, [[37.01, -5.01], [37.01, -4.99], [36.99, -4.99], [36.99, -5.01]]
+        )
+
+    def test_full(self):
+        from QGIS_FMV.utils.QgsFmvUtils import ComputePacketCorners
+
+        full = {}
+        expected = [[37.1, -5.1], [37.1, -4.9], [36.9, -4.9], [36.9, -5.1]]
+        for i, (lat, lon) in enumerate(expected, 1):
+            full["CornerLatitudePoint%dFull" % i] = lat
+            full["CornerLongitudePoint%dFull" % i] = lon
+        self.assertCorners(ComputePacketCorners(packet(**full)), expected)
+
+        # A missing corner
+        full["CornerLongitudePoint3Full"] = None
+        self.assertIsNone(ComputePacketCorners(packet(**full)))
+
+
+class ExtractTelemetry(unittest.TestCase):
+    STREAM = os.path.join(DATA_FOLDER, "KlvSampleStream.ts")
+
+    def setUp(self):
+        # The KLV index is cached in the home folder
+        self.home = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(
+            os.environ, {"HOME": self.home.name, "USERPROFILE": self.home.name}
+        )
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.home.cleanup()
+
+    def test_stream(self):
+        from QGIS_FMV.utils.QgsFmvExport import ExtractTelemetry
+
+        rows = ExtractTelemetry(self.STREAM, klv_index=0)
+        self.assertEqual(len(rows), 100)
+        self.assertEqual([row["time_ms"] for row in rows[:3]], [0, 100, 200])
+
+        expected = read_packet("DynamicConstantMISMMSPacketData.bin")
+        row = rows[0]
+        self.assertEqual(
+            row["sensor"],
+            (
+                expected.SensorLongitude,
+                expected.SensorLatitude,
+                expected.SensorTrueAltitude,
+            ),
+        )
+        self.assertEqual(row["heading"], expected.PlatformHeadingAngle)
+        self.assertEqual(row["imageSensor"], "EO Nose")
+        self.assertEqual(
+            row["frameCenter"][:2],
+            (expected.FrameCenterLongitude, expected.FrameCenterLatitude),
+        )
+        for corner, value in zip(row["corners"], SAMPLE_CORNERS):
+            self.assertAlmostEqual(corner[0], value[0], places=9)
+            self.assertAlmostEqual(corner[1], value[1], places=9)
+
+    def test_interval(self):
+        from QGIS_FMV.utils.QgsFmvExport import ExtractTelemetry
+
+        rows = ExtractTelemetry(self.STREAM, klv_index=0, interval=250)
+        self.assertEqual([row["time_ms"] for row in rows[:4]], [0, 300, 600, 900])
+        self.assertEqual(len(rows), 34)
+
+
+class IndexTelemetry(unittest.TestCase):
+    def test_first_set(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import KlvIndex
+        from QGIS_FMV.utils.QgsFmvExport import IndexTelemetry
+
+        with open(
+            os.path.join(DATA_FOLDER, "DynamicConstantMISMMSPacketData.bin"), "rb"
+        ) as f:
+            data = f.read()
+        # Two local sets in the first packet, a packet without any
+        index = KlvIndex.fromPackets([(0, data * 2), (40, b"\x00" * 8), (80, data)])
+        rows = IndexTelemetry(index)
+        self.assertEqual([row["time_ms"] for row in rows], [0, 80])
+        self.assertEqual(rows[0]["timestamp"], "2009-01-12 22:08:22+00:00")
+        self.assertEqual(rows[0]["imageSensor"], "EO Nose")
+        self.assertEqual(len(rows[0]["corners"]), 4)
+
+
+class WriteGeoPackage(unittest.TestCase):
+    def test_layers(self):
+        from qgis.core import QgsVectorLayer
+
+        from QGIS_FMV.QgsFmvConstants import (
+            Beams_lyr,
+            Footprint_lyr,
+            FrameCenter_lyr,
+            Platform_lyr,
+            Trajectory_lyr,
+        )
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import KlvIndex
+        from QGIS_FMV.utils.QgsFmvExport import IndexTelemetry, WriteGeoPackage
+
+        packets = []
+        for i, name in enumerate(
+            ["DynamicConstantMISMMSPacketData.bin", "DynamicOnlyMISMMSPacketData.bin"]
+        ):
+            with open(os.path.join(DATA_FOLDER, name), "rb") as f:
+                packets.append((1000 * i, f.read()))
+        rows = IndexTelemetry(KlvIndex.fromPackets(packets))
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "video.gpkg")
+            counts = WriteGeoPackage(path, rows, "video.ts")
+            self.assertEqual(
+                counts,
+                {
+                    Platform_lyr: 2,
+                    FrameCenter_lyr: 2,
+                    Footprint_lyr: 2,
+                    Beams_lyr: 8,
+                    Trajectory_lyr: 1,
+                },
+            )
+            for name, count in counts.items():
+                layer = QgsVectorLayer(path + "|layername=" + name, name, "ogr")
+                self.assertTrue(layer.isValid(), name)
+                self.assertEqual(layer.featureCount(), count, name)
+                del layer
+
+
+if __name__ == "__main__":
+    unittest.main()
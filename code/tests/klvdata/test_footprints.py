@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+import numpy as np
+
+
+def _row(ms, lat, lon, heading=0.0, sensor="EO"):
+    """ Telemetry row of a square footprint centered on lat, lon """
+    d = 0.01
+    return {
+        "time_ms": ms,
+        "sensor": (lon, lat - 0.05, 1000.0),
+        "heading": heading,
+        "imageSensor": sensor,
+        "frameCenter": (lon, lat, 10.0),
+        "corners": [
+            [lat + d, lon - d],
+            [lat + d, lon + d],
+            [lat - d, lon + d],
+            [lat - d, lon - d],
+        ],
+    }
+
+
+class UnitHomographies(unittest.TestCase):
+    def test_projective(self):
+        from QGIS_FMV.utils.QgsFmvFootprints import UNIT_POINTS, unitHomographies
+
+        H = np.array([[0.02, 0.003, 37.38], [-0.001, 0.025, -5.99], [0.1, -0.2, 1.0]])
+        src = np.hstack([UNIT_POINTS, np.ones((5, 1))]) @ H.T
+        points = src[:, :2] / src[:, 2:]
+
+        h = unitHomographies(points[None])[0]
+        np.testing.assert_allclose(h, H, rtol=1e-6, atol=1e-9)
+
+
+class FootprintSeries(unittest.TestCase):
+    def test_interpolate(self):
+        from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeries
+
+        series = FootprintSeries([_row(0, 37.0, -5.0), _row(1000, 37.1, -5.2)])
+        self.assertEqual(len(series), 2)
+
+        sample = series.at(250)
+        np.testing.assert_allclose(sample.frameCenter, [37.025, -5.05, 10.0])
+        np.testing.assert_allclose(sample.corners[0], [37.035, -5.06])
+        self.assertAlmostEqual(sample.SensorLatitude, 36.975)
+        self.assertEqual(sample.ImageSourceSensor, "EO")
+
+        # Exactly on a packet
+        np.testing.assert_allclose(series.at(1000).frameCenter, [37.1, -5.2, 10.0])
+        np.testing.assert_allclose(series.at(0).homography, series.homography[0])
+
+    def test_transform(self):
+        from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeries
+
+        series = FootprintSeries([_row(0, 37.0, -5.0), _row(1000, 37.1, -5.2)])
+        sample = series.at(500)
+        H = sample.transform(1280, 720)
+        for pixel, corner in zip(
+            [(0, 0), (1280, 0), (1280, 720), (0, 720)], sample.corners
+        ):
+            p = H @ [pixel[0], pixel[1], 1.0]
+            np.testing.assert_allclose(p[:2] / p[2], corner, atol=1e-9)
+
+    def test_gap(self):
+        from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeries
+
+        series = FootprintSeries(
+            [_row(1000, 37.0, -5.0), _row(10000, 38.0, -5.0)], max_gap=2000
+        )
+        # Before the first packet
+        self.assertIsNone(series.at(500))
+        # The previous footprint is kept for max_gap milliseconds
+        np.testing.assert_allclose(series.at(2500).frameCenter, [37.0, -5.0, 10.0])
+        self.assertIsNone(series.at(5000))
+        np.testing.assert_allclose(series.at(11000).frameCenter, [38.0, -5.0, 10.0])
+        self.assertIsNone(series.at(13000))
+
+    def test_shortest_arc(self):
+        from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeries
+
+        series = FootprintSeries(
+            [_row(0, 0.0, 179.9, heading=350.0), _row(1000, 0.0, -179.9, heading=10.0)]
+        )
+        sample = series.at(250)
+        # Across the antimeridian, not around the world
+        self.assertAlmostEqual(sample.frameCenter[1], 179.95)
+        self.assertAlmostEqual(sample.heading, 355.0)
+
+    def test_without_footprint(self):
+        from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeries
+
+        row = _row(0, 37.0, -5.0)
+        row["corners"] = None
+        series = FootprintSeries([row])
+        self.assertEqual(len(series), 0)
+        self.assertIsNone(series.at(0))
+
+    def test_canceled(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import KlvIndex
+        from QGIS_FMV.utils.QgsFmvFootprints import FootprintSeries
+
+        path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            "data",
+            "DynamicConstantMISMMSPacketData.bin",
+        )
+        with open(path, "rb") as f:
+            data = f.read()
+        index = KlvIndex.fromPackets([(40 * i, data) for i in range(10)])
+        self.assertEqual(
+            len(FootprintSeries.fromIndex(index, canceled=lambda: False)), 10
+        )
+
+        # Canceled while decoding the fourth packet
+        calls = []
+
+        def canceled():
+            calls.append(None)
+            return len(calls) > 3
+
+        self.assertIsNone(FootprintSeries.fromIndex(index, canceled=canceled))
+        self.assertEqual(len(calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+
+class GeocodeCache(unittest.TestCase):
+    def setUp(self):
+        from QGIS_FMV.utils.QgsFmvGeocode import GeocodeCache
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = GeocodeCache(os.path.join(self.folder.name, "geocode.sqlite"), 2)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_cell(self):
+        self.assertIsNone(self.cache.get(37.3891, -5.9845))
+        self.cache.set(37.3891, -5.9845, "Sevilla")
+        # Same grid cell
+        self.assertEqual(self.cache.get(37.3912, -5.9811), "Sevilla")
+        # Next grid cell
+        self.assertIsNone(self.cache.get(37.3791, -5.9845))
+
+    def test_persistent(self):
+        from QGIS_FMV.utils.QgsFmvGeocode import GeocodeCache
+
+        self.cache.set(37.3891, -5.9845, "Sevilla")
+        cache = GeocodeCache(self.cache.path, 2)
+        self.assertEqual(cache.get(37.3891, -5.9845), "Sevilla")
+
+    def test_place_name(self):
+        from QGIS_FMV.utils.QgsFmvGeocode import placeName
+
+        self.assertEqual(
+            placeName({"address": {"village": "Tomares", "state": "Andalucia"}}),
+            "Tomares, Andalucia",
+        )
+        self.assertEqual(
+            placeName({"address": {"city": "Sevilla"}, "display_name": "Sevilla"}),
+            "Sevilla",
+        )
+
+
+class FetchPlaceName(unittest.TestCase):
+    URL = "https://geocode.test/reverse?format=json&lat={}&lon={}"
+
+    def setUp(self):
+        from QGIS_FMV.utils import QgsFmvGeocode
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.module = QgsFmvGeocode
+        self.previous = QgsFmvGeocode._cache
+        QgsFmvGeocode._cache = QgsFmvGeocode.GeocodeCache(
+            os.path.join(self.folder.name, "geocode.sqlite"), 2
+        )
+
+        # Stand-in of the reverse geocoding service
+        self.reply = mock.Mock()
+        self.reply.error.return_value = QgsFmvGeocode.QNetworkReply.NoError
+        self.reply.content.return_value.data.return_value = json.dumps(
+            {"address": {"town": "Sevilla", "state": "Andalucia"}}
+        ).encode("utf-8")
+        self.manager = mock.Mock()
+        self.manager.blockingGet.return_value = self.reply
+        self.request = mock.Mock()
+        self.patches = [
+            mock.patch.object(QgsFmvGeocode, "QUrl", side_effect=lambda url: url),
+            mock.patch.object(QgsFmvGeocode, "QNetworkRequest", self.request),
+            mock.patch.object(
+                QgsFmvGeocode.QgsNetworkAccessManager,
+                "instance",
+                return_value=self.manager,
+            ),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.module._cache = self.previous
+        self.folder.cleanup()
+
+    def test_cached(self):
+        fetch = self.module.fetchPlaceName
+
+        self.assertEqual(fetch(37.3891, -5.9845, self.URL, 5), "Sevilla, Andalucia")
+        self.assertEqual(fetch(37.3893, -5.9847, self.URL, 5), "Sevilla, Andalucia")
+        # The second location is in the same grid cell
+        self.assertEqual(self.manager.blockingGet.call_count, 1)
+        self.request.assert_called_once_with(self.URL.format("37.3891", "-5.9845"))
+        # Through the QGIS network manager, with the lookup timeout
+        self.manager.blockingGet.assert_called_once_with(self.request.return_value)
+        self.request.return_value.setTransferTimeout.assert_called_once_with(5000)
+
+    def test_error(self):
+        self.reply.error.return_value = "OperationCanceledError"
+        self.assertIsNone(self.module.fetchPlaceName(37.3891, -5.9845, self.URL, 0.2))
+        self.request.return_value.setTransferTimeout.assert_called_once_with(200)
+        # Failures are not cached
+        self.reply.error.return_value = self.module.QNetworkReply.NoError
+        self.assertEqual(
+            self.module.fetchPlaceName(37.3891, -5.9845, self.URL, 5),
+            "Sevilla, Andalucia",
+        )
+
+    def test_offline(self):
+        self.assertIsNone(self.module.fetchPlaceName(37.3891, -5.9845, "", 5))
+        self.manager.blockingGet.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+STREAM = os.path.join(DATA_FOLDER, "KlvSampleStream.ts")
+
+
+def setUpModule():
+    # The tasks, the geodesic distances and the place names need QGIS
+    from QGIS_FMV.utils.QgsFmvExport import _initWorker
+
+    _initWorker()
+
+
+class CacheTestCase(unittest.TestCase):
+    """ Video and geocode caches in a temporary home folder """
+
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        self.patches = [
+            mock.patch.dict(
+                os.environ, {"HOME": self.home.name, "USERPROFILE": self.home.name}
+            ),
+            mock.patch("QGIS_FMV.utils.QgsFmvGeocode._cache", None),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.home.cleanup()
+
+
+class IngestVideo(CacheTestCase):
+    def test_stream(self):
+        from QGIS_FMV.utils.QgsFmvIngest import IngestVideo
+        from QGIS_FMV.utils.QgsFmvUtils import getVideoCacheInfo
+
+        summary = IngestVideo(STREAM)
+        self.assertEqual(summary["klv_index"], 0)
+        self.assertAlmostEqual(summary["duration"], 10.0)
+        # Frame center of the first packet
+        self.assertAlmostEqual(summary["location"][0], -10.542388633146132)
+        self.assertAlmostEqual(summary["location"][1], 29.15789012292302)
+        for value, expected in zip(
+            summary["footprint"],
+            [
+                27.473825959038095,
+                -12.473808870000244,
+                30.78146608659904,
+                -8.504426814276966,
+            ],
+        ):
+            self.assertAlmostEqual(value, expected, places=9)
+
+        cache = getVideoCacheInfo(STREAM)
+        self.assertEqual(cache["footprint"], summary["footprint"])
+
+        # Nothing is probed or decoded once it is cached
+        with mock.patch(
+            "QGIS_FMV.utils.QgsFmvIngest.ExtractTelemetry", side_effect=AssertionError
+        ), mock.patch(
+            "QGIS_FMV.utils.QgsFmvIngest.FFMpeg", side_effect=AssertionError
+        ):
+            self.assertEqual(IngestVideo(STREAM), summary)
+
+    def test_missing(self):
+        from QGIS_FMV.utils.QgsFmvIngest import IngestVideo
+
+        with self.assertRaises(IOError):
+            IngestVideo(os.path.join(self.home.name, "missing.ts"))
+
+
+class VideoLoadTask(CacheTestCase):
+    def run_task(self, videoPath):
+        from QGIS_FMV.utils.QgsFmvIngest import VideoLoadTask
+
+        task = VideoLoadTask("1", videoPath)
+        stages = []
+        task.stageChanged.connect(lambda row_id, progress: stages.append(progress))
+        return task, task.run(), stages
+
+    def test_load(self):
+        from QGIS_FMV.utils.QgsFmvUtils import getVideoCacheInfo
+
+        task, result, stages = self.run_task(STREAM)
+        self.assertTrue(result)
+        self.assertIsNone(task.error)
+        self.assertEqual(stages, [30, 60, 90])
+        self.assertEqual(task.klv_index, 0)
+        self.assertAlmostEqual(task.location[0], -10.542388633146132)
+        self.assertAlmostEqual(task.location[1], 29.15789012292302)
+
+        cache = getVideoCacheInfo(STREAM)
+        self.assertEqual(cache["klv_index"], 0)
+        self.assertEqual(cache["location"], task.location)
+
+    def test_cached(self):
+        from QGIS_FMV.utils.QgsFmvUtils import SetVideoCacheInfo
+
+        SetVideoCacheInfo(STREAM, klv_index=1, location=[37.0, -5.0, "Sevilla"])
+        with mock.patch(
+            "QGIS_FMV.utils.QgsFmvIngest.FFMpeg", side_effect=AssertionError
+        ):
+            task, result, stages = self.run_task(STREAM)
+        self.assertTrue(result)
+        self.assertEqual(task.klv_index, 1)
+        self.assertEqual(task.location, [37.0, -5.0, "Sevilla"])
+
+    def test_error(self):
+        from QGIS_FMV.utils.QgsFmvUtils import SetVideoCacheInfo
+
+        SetVideoCacheInfo(STREAM, klv_index=0)
+        with mock.patch(
+            "QGIS_FMV.utils.QgsFmvIngest.getVideoLocationInfo",
+            side_effect=RuntimeError("no location"),
+        ):
+            task, result, stages = self.run_task(STREAM)
+        self.assertFalse(result)
+        self.assertEqual(task.error, "no location")
+        # Stopped after the KLV stream stage
+        self.assertEqual(stages, [30, 60])
+
+
+if __name__ == "__main__":
+    unittest.main()
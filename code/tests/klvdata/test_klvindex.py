@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import unittest
+
+
+FFPROBE_OUTPUT = b"""[PACKET]
+stream_index=2
+pts_time=1.400000
+dts_time=1.400000
+data=
+00000000: 060e 2b34 020b 0101 0e01 0301 0100 0000  ..+4............
+00000010: 0302 0a0b                                ....
+[/PACKET]
+[PACKET]
+stream_index=2
+pts_time=N/A
+dts_time=2.400000
+data=
+00000000: 0102 03                                  ...
+[/PACKET]
+[FORMAT]
+start_time=1.400000
+[/FORMAT]
+"""
+
+
+class FfprobePacketParser(unittest.TestCase):
+    def test_parse(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import FfprobePacketParser
+
+        parser = FfprobePacketParser()
+        packets = list(parser.parse(FFPROBE_OUTPUT.splitlines(True)))
+
+        self.assertEqual(len(packets), 2)
+        self.assertEqual(packets[0][0], 2)
+        self.assertEqual(packets[0][1], 1.4)
+        self.assertEqual(
+            packets[0][2],
+            b"\x06\x0e+4\x02\x0b\x01\x01\x0e\x01\x03\x01\x01\x00\x00\x00"
+            b"\x03\x02\x0a\x0b",
+        )
+        # Fallback to dts when pts is not available
+        self.assertEqual(packets[1][1], 2.4)
+        self.assertEqual(packets[1][2], b"\x01\x02\x03")
+        self.assertEqual(parser.start_time, 1.4)
+
+
+FFPROBE_STREAMS = b"""[PACKET]
+stream_index=1
+data=
+00000000: 0001 0203                                ....
+[/PACKET]
+[PACKET]
+stream_index=3
+data=
+00000000: 060e 2b34 020b 0101 0e01 0301 0100 0000  ..+4............
+00000010: 0302 0a0b                                ....
+[/PACKET]
+[STREAM]
+index=1
+codec_name=bin_data
+codec_type=data
+codec_tag_string=[0][0][0][0]
+[/STREAM]
+[STREAM]
+index=3
+codec_name=klv
+codec_type=data
+codec_tag_string=KLVA
+[/STREAM]
+"""
+
+
+class SelectKlvStream(unittest.TestCase):
+    def test_streams(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import FfprobePacketParser
+
+        parser = FfprobePacketParser()
+        packets = list(parser.parse(FFPROBE_STREAMS.splitlines(True)))
+
+        self.assertEqual(len(packets), 2)
+        self.assertEqual(len(parser.streams), 2)
+        self.assertEqual(parser.streams[1]["index"], "3")
+        self.assertEqual(parser.streams[1]["codec_tag_string"], "KLVA")
+
+    def test_select_by_content(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import (
+            FfprobePacketParser,
+            selectKlvStream,
+        )
+
+        parser = FfprobePacketParser()
+        packets = [(i, d) for i, _, d in parser.parse(FFPROBE_STREAMS.splitlines(True))]
+        number, data = selectKlvStream(parser.streams, packets)
+
+        # Second data stream, not the second stream index
+        self.assertEqual(number, 1)
+        self.assertTrue(data.startswith(b"\x06\x0e+4\x02\x0b"))
+
+    def test_select_by_tag(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import selectKlvStream
+
+        streams = [
+            {"index": "0", "codec_type": "video"},
+            {"index": "1", "codec_type": "data", "codec_name": "bin_data"},
+            {"index": "2", "codec_type": "data", "codec_tag_string": "KLVA"},
+        ]
+        # No packet in the first second
+        self.assertEqual(selectKlvStream(streams, []), (1, b""))
+        self.assertIsNone(selectKlvStream(streams[:2], [(1, b"\x00\x01")]))
+
+
+class KlvIndex(unittest.TestCase):
+    def setUp(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import KlvIndex
+
+        self.index = KlvIndex.fromPackets(
+            [(1000, b"b"), (0, b"a"), (2000, b"c"), (2100, b"d")]
+        )
+
+    def test_order(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.packet(0), b"a")
+        self.assertEqual(self.index.packet(3), b"d")
+
+    def test_get(self):
+        self.assertEqual(self.index.get(0), b"a")
+        self.assertEqual(self.index.get(999), b"a")
+        self.assertEqual(self.index.get(1000), b"b")
+        self.assertEqual(self.index.get(1500, 600), b"bc")
+        self.assertEqual(self.index.get(2000, 250), b"cd")
+        # Before the first packet and after the last one
+        self.assertEqual(self.index.get(-500), b"a")
+        self.assertEqual(self.index.get(99000, 250), b"d")
+
+    def test_save_load(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import KlvIndex
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "index.npz")
+            self.index.save(path)
+            index = KlvIndex.load(path)
+
+        self.assertEqual(list(index.pts), list(self.index.pts))
+        self.assertEqual(index.data, self.index.data)
+        self.assertEqual(index.get(1500, 1000), b"bcd")
+
+
+class KlvIndexThread(unittest.TestCase):
+    def test_cancel(self):
+        import subprocess
+        import sys
+        import time
+        from unittest import mock
+
+        from QGIS_FMV.klvdata import QgsFmvKlvIndex
+
+        def spawn(cmds, t="ffmpeg"):
+            # ffprobe still reading a long video
+            return subprocess.Popen(
+                [sys.executable, "-c", "import time; time.sleep(60)"],
+                stdout=subprocess.PIPE,
+            )
+
+        with tempfile.TemporaryDirectory() as home, mock.patch.dict(
+            os.environ, {"HOME": home, "USERPROFILE": home}
+        ), mock.patch.object(QgsFmvKlvIndex, "_spawn", spawn):
+            video = os.path.join(home, "video.mp4")
+            with open(video, "wb") as f:
+                f.write(b"\x00" * 5000)
+
+            thread = QgsFmvKlvIndex.KlvIndexThread(video)
+            thread.start()
+            for _ in range(500):
+                if thread.process is not None:
+                    break
+                time.sleep(0.01)
+            thread.cancel()
+            thread.join(5)
+
+            self.assertFalse(thread.is_alive())
+            self.assertIsNotNone(thread.process.poll())
+            self.assertIsNone(thread.index)
+            self.assertFalse(os.path.exists(QgsFmvKlvIndex.getKlvIndexPath(video)))
+            thread.process.stdout.close()
+
+    def test_failed(self):
+        import subprocess
+        import sys
+        from unittest import mock
+
+        from QGIS_FMV.klvdata import QgsFmvKlvIndex
+
+        def spawn(cmds, t="ffmpeg"):
+            # ffprobe failing without output
+            return subprocess.Popen(
+                [sys.executable, "-c", "import sys; sys.exit(1)"],
+                stdout=subprocess.PIPE,
+            )
+
+        with tempfile.TemporaryDirectory() as home, mock.patch.dict(
+            os.environ, {"HOME": home, "USERPROFILE": home}
+        ), mock.patch.object(QgsFmvKlvIndex, "_spawn", spawn):
+            video = os.path.join(home, "video.mp4")
+            with open(video, "wb") as f:
+                f.write(b"\x00" * 5000)
+            path = QgsFmvKlvIndex.getKlvIndexPath(video)
+
+            self.assertIsNone(QgsFmvKlvIndex.loadOrBuildKlvIndex(video))
+            self.assertFalse(os.path.exists(path))
+
+            thread = QgsFmvKlvIndex.KlvIndexThread(video)
+            thread.start()
+            thread.join(5)
+            self.assertIsNone(thread.index)
+
+            # An empty index cached by an older version is built again
+            QgsFmvKlvIndex.KlvIndex.fromPackets([]).save(path)
+            self.assertIsNone(QgsFmvKlvIndex.loadKlvIndex(video))
+
+
+def ts_packets(pid, payload):
+    """ TS packets of a PES or PSI payload, the last one stuffed """
+    packets = b""
+    for i in range(0, len(payload), 184):
+        chunk = payload[i : i + 184]
+        header = bytes([0x47, (0x40 if i == 0 else 0) | pid >> 8, pid & 0xFF])
+        if len(chunk) == 184:
+            packets += header + b"\x10" + chunk
+        else:
+            stuffing = 183 - len(chunk)
+            adaptation = bytes([stuffing])
+            if stuffing:
+                adaptation += b"\x00" + b"\xff" * (stuffing - 1)
+            packets += header + b"\x30" + adaptation + chunk
+    return packets
+
+
+def pes(streamId, pts, data):
+    """ PES packet with a PTS """
+    header = bytes(
+        [
+            0x80,
+            0x80,
+            0x05,
+            0x21 | (pts >> 29) & 0x0E,
+            (pts >> 22) & 0xFF,
+            0x01 | (pts >> 14) & 0xFE,
+            (pts >> 7) & 0xFF,
+            0x01 | (pts << 1) & 0xFE,
+        ]
+    )
+    length = len(header) + len(data)
+    return (
+        b"\x00\x00\x01" + bytes([streamId]) + length.to_bytes(2, "big") + header + data
+    )
+
+
+def crc(section):
+    """ PSI section followed by its CRC-32 """
+    value = 0xFFFFFFFF
+    for byte in section:
+        value ^= byte << 24
+        for _ in range(8):
+            value = (value << 1) ^ (0x04C11DB7 if value & 0x80000000 else 0)
+            value &= 0xFFFFFFFF
+    return section + value.to_bytes(4, "big")
+
+
+def program(streams):
+    """ PAT and PMT TS packets of a program of streams [(type, pid, descriptors)] """
+    pat = b"\x00\xb0\x0d\x00\x01\xc1\x00\x00\x00\x01\xf0\x00"
+    loop = b"".join(
+        bytes([streamType, 0xE0 | pid >> 8, pid & 0xFF, 0xF0, len(info)]) + info
+        for streamType, pid, info in streams
+    )
+    length = 9 + len(loop) + 4
+    pmt = (
+        bytes([0x02, 0xB0, length, 0x00, 0x01, 0xC1, 0x00, 0x00, 0xE1, 0x00, 0xF0, 0])
+        + loop
+    )
+    return ts_packets(0, b"\x00" + crc(pat)) + ts_packets(0x1000, b"\x00" + crc(pmt))
+
+
+def read_samples():
+    folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    samples = []
+    for name in (
+        "DynamicConstantMISMMSPacketData.bin",
+        "DynamicOnlyMISMMSPacketData.bin",
+    ):
+        with open(os.path.join(folder, name), "rb") as f:
+            samples.append(f.read())
+    return samples
+
+
+class TsKlvIndex(unittest.TestCase):
+    STREAM = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "data", "KlvSampleStream.ts"
+    )
+
+    def setUp(self):
+        from QGIS_FMV.klvdata.QgsFmvMpegTs import TsDemuxer
+
+        with open(self.STREAM, "rb") as f:
+            self.stream = f.read()
+        self.klv = [e[3] for e in TsDemuxer().feed(self.stream) if e[0] == "klv"]
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.folder.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_scan(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import scanTsFile
+
+        index = scanTsFile(self.STREAM)
+        self.assertEqual(len(index), 100)
+        # 10 Hz from the first video frame
+        self.assertEqual(list(index.pts[:3]), [0, 100, 200])
+        self.assertEqual([index.packet(i) for i in range(len(index))], self.klv)
+        self.assertEqual(index.get(1050, 200), b"".join(self.klv[10:13]))
+        index.close()
+        # Mapped again when needed
+        self.assertEqual(index.get(99000), self.klv[-1])
+        index.close()
+
+    def test_m2ts(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import scanTsFile
+
+        # 4 byte time code before every TS packet
+        data = b"".join(
+            b"\x00\x00\x00\x00" + self.stream[i : i + 188]
+            for i in range(0, len(self.stream), 188)
+        )
+        index = scanTsFile(self.write("video.m2ts", data))
+        self.assertEqual([index.packet(i) for i in range(len(index))], self.klv)
+        index.close()
+
+    def test_not_ts(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import scanTsFile
+
+        self.assertIsNone(scanTsFile(self.write("video.mp4", b"\x00" * 5000)))
+        # No second KLV stream
+        self.assertIsNone(scanTsFile(self.STREAM, klv_index=1))
+
+    def test_synchronous(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import scanTsFile
+        from QGIS_FMV.klvdata.QgsFmvMpegTs import TsDemuxer
+
+        # Metadata stream with a metadata AU cell header in every PES
+        metadata = b"\x26\x0d\xff\xffKLVA\xffKLVA\x00\x0f"
+        stream = program([(0x1B, 0x100, b""), (0x15, 0x101, metadata)])
+        klv = [read_samples()[i % 2] for i in range(10)]
+        for i, packet in enumerate(klv):
+            stream += ts_packets(0x100, pes(0xE0, 126000 + 9000 * i, b"\x00" * 10))
+            cell = bytes([0, i, 0xDF]) + len(packet).to_bytes(2, "big")
+            stream += ts_packets(0x101, pes(0xFC, 126000 + 9000 * i, cell + packet))
+
+        index = scanTsFile(self.write("video.ts", stream))
+        self.assertEqual(list(index.pts), [100 * i for i in range(10)])
+        self.assertEqual([index.packet(i) for i in range(len(index))], klv)
+        index.close()
+        demuxer = TsDemuxer()
+        events = demuxer.feed(stream) + demuxer.flush()
+        self.assertEqual([e[3] for e in events if e[0] == "klv"], klv)
+
+    def test_data_streams(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import scanTsFile
+
+        stream = program(
+            [
+                (0x1B, 0x100, b""),
+                # Private data, then AC-3 audio ffprobe does not count
+                (0x06, 0x102, b""),
+                (0x06, 0x103, b"\x05\x04AC-3"),
+                (0x06, 0x101, b"\x05\x04KLVA"),
+            ]
+        )
+        klv = read_samples()
+        for i, packet in enumerate(klv):
+            stream += ts_packets(0x102, pes(0xBD, 126000 + 9000 * i, b"\x01\x02"))
+            stream += ts_packets(0x101, pes(0xBD, 126000 + 9000 * i, packet))
+
+        # ffprobe d:1 is the KLV stream, d:0 is not KLV
+        video = self.write("video.ts", stream)
+        index = scanTsFile(video, klv_index=1)
+        self.assertEqual([index.packet(i) for i in range(len(index))], klv)
+        index.close()
+        self.assertIsNone(scanTsFile(video, klv_index=0))
+        self.assertIsNone(scanTsFile(video, klv_index=2))
+
+    def test_b_frames(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import scanTsFile
+
+        stream = program([(0x1B, 0x100, b""), (0x06, 0x101, b"\x05\x04KLVA")])
+        # I P B B: the first frame shown is the third one
+        for pts in (133200, 144000, 126000, 129600):
+            stream += ts_packets(0x100, pes(0xE0, pts, b"\x00" * 10))
+        klv = read_samples()
+        for i, packet in enumerate(klv):
+            stream += ts_packets(0x101, pes(0xBD, 129600 + 9000 * i, packet))
+
+        index = scanTsFile(self.write("video.ts", stream))
+        self.assertEqual(list(index.pts), [40, 140])
+        index.close()
+
+    def test_save_load(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvIndex import TsKlvIndex, scanTsFile
+
+        video = self.write("video.ts", self.stream)
+        path = os.path.join(self.folder.name, "index.npz")
+        scanTsFile(video).save(path)
+
+        index = TsKlvIndex.load(path, video)
+        self.assertEqual(list(index.pts), [100 * i for i in range(100)])
+        self.assertEqual(index.packet(42), self.klv[42])
+        index.close()
+
+        # The video changed since it was indexed, with the same size
+        stat = os.stat(video)
+        with open(video, "r+b") as f:
+            f.seek(188 * 10)
+            f.write(self.stream[188 * 20 : 188 * 21])
+        os.utime(video, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(os.path.getsize(video), stat.st_size)
+        self.assertIsNone(TsKlvIndex.load(path, video))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Copy a file to stdout in small writes, as a live process would
+CAT = (
+    "import sys\n"
+    "with open(sys.argv[1], 'rb') as f:\n"
+    "    for chunk in iter(lambda: f.read(int(sys.argv[2])), b''):\n"
+    "        sys.stdout.buffer.write(chunk)\n"
+    "        sys.stdout.buffer.flush()\n"
+)
+
+
+def read_sample(name):
+    with open(os.path.join(DATA_FOLDER, name), "rb") as f:
+        return f.read()
+
+
+def recorded_stream(count):
+    """ count sample packets, with bytes that are not KLV between some """
+    samples = [
+        read_sample("DynamicConstantMISMMSPacketData.bin"),
+        read_sample("DynamicOnlyMISMMSPacketData.bin"),
+    ]
+    packets = [samples[i % 2] for i in range(count)]
+    stream = bytearray()
+    for i, packet in enumerate(packets):
+        if i % 7 == 3:
+            stream += b"\x00\xdc" * (i % 5)
+        stream += packet
+    return packets, bytes(stream)
+
+
+class KlvFramer(unittest.TestCase):
+    def test_any_chunk_size(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import KlvFramer
+
+        expected, stream = recorded_stream(40)
+        for size in (1, 3, 16, 17, 113, 4096):
+            framer = KlvFramer()
+            packets = []
+            for i in range(0, len(stream), size):
+                packets.extend(framer.feed(stream[i : i + size]))
+            self.assertEqual(packets, expected, size)
+
+    def test_resync(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import KlvFramer
+
+        packet = read_sample("DynamicOnlyMISMMSPacketData.bin")
+        # A key with an invalid BER length is skipped
+        broken = packet[:16] + b"\x85" + packet[17:40]
+        framer = KlvFramer()
+        self.assertEqual(framer.feed(b"garbage" + broken + packet), [packet])
+        self.assertEqual(framer.skipped, len(b"garbage" + broken))
+
+    def test_partial_key(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import KlvFramer
+
+        packet = read_sample("DynamicOnlyMISMMSPacketData.bin")
+        framer = KlvFramer()
+        self.assertEqual(framer.feed(b"\x00" * 100 + packet[:10]), [])
+        self.assertEqual(framer.feed(packet[10:]), [packet])
+
+
+class PacketRing(unittest.TestCase):
+    def test_bounded(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import PacketRing
+
+        ring = PacketRing(3)
+        for packet in range(5):
+            ring.put(packet)
+        self.assertEqual(ring.qsize(), 3)
+        self.assertEqual(ring.get(), 2)
+        self.assertEqual(ring.latest(), 4)
+        self.assertIsNone(ring.get())
+        self.assertEqual(
+            ring.stats(), {"received": 5, "dropped": 2, "skipped": 1, "queued": 0}
+        )
+
+    def test_wait(self):
+        import threading
+
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import PacketRing
+
+        ring = PacketRing(3)
+        self.assertIsNone(ring.latest(timeout=0.01))
+        threading.Timer(0.05, ring.put, ["packet"]).start()
+        self.assertEqual(ring.latest(timeout=5), "packet")
+
+
+class NonBlockingStreamReader(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def spawn(self, count, write_size):
+        """ Process writing a recorded stream to its stdout """
+        expected, stream = recorded_stream(count)
+        path = os.path.join(self.folder.name, "stream.klv")
+        with open(path, "wb") as f:
+            f.write(stream)
+        return expected, self.cat(path, write_size)
+
+    def cat(self, path, write_size):
+        return subprocess.Popen(
+            [sys.executable, "-c", CAT, path, str(write_size)],
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, count, write_size):
+        """ Pipe a recorded stream through a process, return its packets """
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import NonBlockingStreamReader
+
+        expected, process = self.spawn(count, write_size)
+        try:
+            start = time.time()
+            reader = NonBlockingStreamReader(process, size=count)
+            packets = []
+            while len(packets) < count:
+                packet = reader.readline(timeout=5)
+                if packet is None:
+                    break
+                packets.append(packet)
+            elapsed = time.time() - start
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+        return expected, packets, elapsed
+
+    def test_no_loss(self):
+        expected, packets, _ = self.read(500, 37)
+        self.assertEqual(packets, expected)
+
+    def test_throughput(self):
+        count = 50000
+        expected, packets, elapsed = self.read(count, 65536)
+        self.assertEqual(len(packets), count)
+        self.assertEqual(packets[-1], expected[-1])
+        # Far more than any live stream sends
+        self.assertGreater(count / elapsed, 5000)
+
+    def test_latest(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import NonBlockingStreamReader
+
+        count = 20000
+        expected, process = self.spawn(count, 4096)
+        try:
+            reader = NonBlockingStreamReader(process, size=10)
+            read = 0
+            last = None
+            while reader.stats()["received"] < count:
+                packet = reader.latest(timeout=5)
+                self.assertIsNotNone(packet)
+                self.assertLessEqual(reader._q.qsize(), 10)
+                read += 1
+                last = packet
+                time.sleep(0.001)
+            reader._t.join(5)
+            packet = reader.latest()
+            if packet is not None:
+                read += 1
+                last = packet
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+
+        stats = reader.stats()
+        # The newest packet is always shown, every other one is counted
+        self.assertEqual(last, expected[-1])
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["received"], read + stats["dropped"] + stats["skipped"])
+        self.assertGreater(stats["skipped_bytes"], 0)
+
+    def test_mpegts_position(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import NonBlockingStreamReader
+        from QGIS_FMV.klvdata.QgsFmvMpegTs import TsDemuxer
+
+        path = os.path.join(DATA_FOLDER, "KlvSampleStream.ts")
+        with open(path, "rb") as f:
+            klv = [e[3] for e in TsDemuxer().feed(f.read()) if e[0] == "klv"]
+
+        process = self.cat(path, 1000)
+        try:
+            reader = NonBlockingStreamReader(process, size=len(klv), mpegts=True)
+            reader._t.join(5)
+        finally:
+            process.kill()
+            process.wait()
+            process.stdout.close()
+
+        self.assertEqual(reader.stats()["received"], len(klv))
+        # The player starts on the newest packet, see LiveKlvStream
+        self.assertEqual(reader.at(0), klv[-1])
+        self.assertEqual(reader.at(60000), klv[-1])
+
+
+class LiveKlvStream(unittest.TestCase):
+    def index(self, live, packet):
+        """ Position of a packet on the timeline, the samples repeat """
+        for i, p in enumerate(live.timeline._packets):
+            if p is packet:
+                return i
+        return None
+
+    def test_connect_delay(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import LiveKlvStream
+
+        stream = read_sample("KlvSampleStream.ts")
+        live = LiveKlvStream(size=100, mpegts=True)
+        self.assertIsNone(live.at(0))
+
+        # The player shows its first frame 4 seconds into the stream
+        pos = 0
+        while live.stats()["received"] < 40:
+            live.feed(stream[pos : pos + 188])
+            pos += 188
+        first = live.stats()["received"] - 1
+        self.assertEqual(self.index(live, live.at(0)), first)
+
+        # KLV at 10 Hz from there
+        live.feed(stream[pos:])
+        self.assertEqual(live.stats()["received"], 100)
+        self.assertEqual(self.index(live, live.at(1000)), first + 10)
+        self.assertEqual(self.index(live, live.at(2050)), first + 20)
+
+        # The player restarted, it is anchored again
+        self.assertEqual(self.index(live, live.at(100)), 99)
+        self.assertEqual(self.index(live, live.at(60000)), 99)
+
+    def test_arrival(self):
+        from unittest import mock
+
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import LiveKlvStream
+
+        packets, _ = recorded_stream(30)
+        clock = mock.Mock(return_value=100.0)
+        with mock.patch("QGIS_FMV.klvdata.QgsFmvKlvReader.time.monotonic", clock):
+            live = LiveKlvStream(size=30)
+            # Raw KLV at 10 Hz, timed when it is read
+            for i, packet in enumerate(packets):
+                clock.return_value = 100.0 + i / 10.0
+                live.feed(packet)
+
+        # The player starts 2 seconds into its stream, on the newest packet
+        self.assertEqual(self.index(live, live.at(2000)), 29)
+        self.assertAlmostEqual(live.anchor, 900.0)
+        # Earlier positions are a restart
+        self.assertEqual(self.index(live, live.at(0)), 29)
+        live.anchor -= 1450
+        self.assertEqual(self.index(live, live.at(0)), 14)
+
+
+class UdpTsSplitter(unittest.TestCase):
+    def replay(self, datagram):
+        """ Send the recorded TS to a splitter, as a live UDP source would """
+        import socket
+
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import UdpTsSplitter
+        from QGIS_FMV.klvdata.QgsFmvMpegTs import TsDemuxer
+
+        with open(os.path.join(DATA_FOLDER, "KlvSampleStream.ts"), "rb") as f:
+            stream = f.read()
+        klv = [e[3] for e in TsDemuxer().feed(stream) if e[0] == "klv"]
+
+        player = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        player.bind(("127.0.0.1", 0))
+        player.settimeout(5)
+        splitter = UdpTsSplitter("127.0.0.1", 0, player.getsockname()[1], size=len(klv))
+        splitter.start()
+
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sent = []
+        # 7 TS packets per datagram
+        for seq, i in enumerate(range(0, len(stream), 7 * 188)):
+            sent.append(datagram(seq, stream[i : i + 7 * 188]))
+            sender.sendto(sent[-1], ("127.0.0.1", splitter.port))
+            time.sleep(0.0005)
+        try:
+            forwarded = [player.recv(65536) for _ in sent]
+        finally:
+            splitter.stop()
+            splitter.join(5)
+            sender.close()
+            player.close()
+        return splitter, klv, sent, forwarded
+
+    def test_udp(self):
+        splitter, klv, sent, forwarded = self.replay(lambda seq, data: data)
+        # The video is passed through untouched
+        self.assertEqual(forwarded, sent)
+        self.assertEqual(splitter.forwarded, len(sent))
+        self.assertEqual(splitter.nbsr.stats()["received"], len(klv))
+        self.assertEqual(splitter.nbsr.at(1050), klv[-1])
+        self.assertEqual(splitter.nbsr.latest(), klv[-1])
+
+    def test_rtp(self):
+        from struct import pack
+
+        def rtp(seq, data):
+            return pack(">BBHII", 0x80, 33, seq, seq * 3600, 1) + data
+
+        splitter, klv, sent, forwarded = self.replay(rtp)
+        self.assertEqual(forwarded, sent)
+        self.assertEqual(splitter.nbsr.stats()["received"], len(klv))
+        self.assertEqual(splitter.nbsr.at(0), klv[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
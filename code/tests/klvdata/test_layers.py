@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import unittest
+from unittest import mock
+
+
+class VideoLayers(unittest.TestCase):
+    def test_dispose(self):
+        from QGIS_FMV.utils import QgsFmvLayers
+
+        project = mock.Mock()
+        with mock.patch.object(QgsFmvLayers, "_layerreg", project):
+            QgsFmvLayers.DisposeVideoLayers()
+            # Nothing is connected until the registry is used
+            project.layersAdded.connect.assert_not_called()
+
+            registry = QgsFmvLayers.VideoLayers()
+            self.assertIs(QgsFmvLayers.VideoLayers(), registry)
+            project.layersAdded.connect.assert_called_once_with(registry._layersAdded)
+            project.layersWillBeRemoved.connect.assert_called_once_with(
+                registry._layersWillBeRemoved
+            )
+
+            QgsFmvLayers.DisposeVideoLayers()
+            project.layersAdded.disconnect.assert_called_once_with(
+                registry._layersAdded
+            )
+            project.layersWillBeRemoved.disconnect.assert_called_once_with(
+                registry._layersWillBeRemoved
+            )
+            # A new registry is connected on next use
+            self.assertIsNot(QgsFmvLayers.VideoLayers(), registry)
+            QgsFmvLayers.DisposeVideoLayers()
+
+
+def layer(layerId):
+    """ Vector layer stand-in, its provider returns the added features """
+    value = mock.Mock()
+    value.id.return_value = layerId
+    provider = value.dataProvider.return_value
+    provider.addFeatures.side_effect = lambda features: (True, list(features))
+    return value
+
+
+class WriteLayerValues(unittest.TestCase):
+    def setUp(self):
+        from QGIS_FMV.utils import QgsFmvLayers
+
+        self.module = QgsFmvLayers
+        self.iface = mock.Mock()
+        self.patches = [
+            mock.patch.object(QgsFmvLayers, "iface", self.iface),
+            mock.patch.object(QgsFmvLayers, "QTimer"),
+            mock.patch.object(QgsFmvLayers, "QElapsedTimer"),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        self.module._frameLayers = None
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def test_write(self):
+        platform = layer("platform")
+        features = ["feature"]
+        added = self.module.WriteLayerValues(
+            platform,
+            features,
+            attributes={1: {0: "value"}},
+            geometries={1: "geometry"},
+        )
+        self.assertEqual(added, features)
+
+        provider = platform.dataProvider.return_value
+        provider.addFeatures.assert_called_once_with(features)
+        provider.changeAttributeValues.assert_called_once_with({1: {0: "value"}})
+        provider.changeGeometryValues.assert_called_once_with({1: "geometry"})
+        # No edit session
+        platform.startEditing.assert_not_called()
+        platform.commitChanges.assert_not_called()
+        # Repainted right away outside a frame update
+        platform.triggerRepaint.assert_called_once_with()
+        self.iface.layerTreeView.return_value.refreshLayerSymbology.assert_not_called()
+
+    def test_frame_update(self):
+        platform = layer("platform")
+        footprint = layer("footprint")
+        coalescer = self.module.RefreshCoalescer(10)
+        with mock.patch.object(self.module, "refreshCoalescer", coalescer):
+            self.module.BeginFrameUpdate()
+            self.module.WriteLayerValues(platform, ["feature"])
+            self.module.WriteLayerValues(platform, geometries={1: "geometry"})
+            self.module.WriteLayerValues(footprint, ["feature"], symbology=True)
+            self.module.WriteLayerValues(footprint, attributes={1: {0: "value"}})
+
+            # Written through the provider, repainted at the end of the frame
+            platform.dataProvider.return_value.changeGeometryValues.assert_called_once()
+            platform.triggerRepaint.assert_not_called()
+            footprint.triggerRepaint.assert_not_called()
+            self.module.EndFrameUpdate()
+            self.assertIsNone(self.module._frameLayers)
+            self.assertEqual(coalescer._pending, {"platform": False, "footprint": True})
+
+            project = mock.Mock()
+            project.mapLayer.side_effect = {
+                "platform": platform,
+                "footprint": footprint,
+            }.get
+            with mock.patch.object(self.module, "_layerreg", project):
+                coalescer.flush()
+
+        platform.triggerRepaint.assert_called_once_with()
+        footprint.triggerRepaint.assert_called_once_with()
+        refresh = self.iface.layerTreeView.return_value.refreshLayerSymbology
+        refresh.assert_called_once_with("footprint")
+
+    def test_empty_frame(self):
+        coalescer = mock.Mock()
+        with mock.patch.object(self.module, "refreshCoalescer", coalescer):
+            self.module.BeginFrameUpdate()
+            self.module.EndFrameUpdate()
+        coalescer.request.assert_not_called()
+
+
+class RefreshCoalescer(unittest.TestCase):
+    def setUp(self):
+        from QGIS_FMV.utils import QgsFmvLayers
+
+        self.module = QgsFmvLayers
+        self.timer = mock.Mock()
+        self.timer.isActive.return_value = False
+        # Not started before the first refresh
+        self.elapsed = mock.Mock()
+        self.elapsed.isValid.return_value = False
+        self.patches = [
+            mock.patch.object(QgsFmvLayers, "QTimer", return_value=self.timer),
+            mock.patch.object(QgsFmvLayers, "QElapsedTimer", return_value=self.elapsed),
+            mock.patch.object(QgsFmvLayers, "RefreshLayer"),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.refresh = QgsFmvLayers.RefreshLayer
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def test_coalesce(self):
+        platform = layer("platform")
+        footprint = layer("footprint")
+        coalescer = self.module.RefreshCoalescer(10)
+
+        coalescer.request(platform)
+        self.timer.timeout.connect.assert_called_once_with(coalescer.flush)
+        self.timer.start.assert_called_once()
+        # Waiting for the timer
+        self.timer.isActive.return_value = True
+        coalescer.request(footprint)
+        coalescer.request(platform, symbology=True)
+        coalescer.request(footprint)
+        coalescer.request(platform)
+        self.assertEqual(self.timer.start.call_count, 1)
+
+        project = mock.Mock()
+        project.mapLayer.side_effect = {
+            "platform": platform,
+            "footprint": footprint,
+        }.get
+        with mock.patch.object(self.module, "_layerreg", project):
+            coalescer.flush()
+            self.assertEqual(
+                self.refresh.call_args_list,
+                [mock.call(platform, True), mock.call(footprint, False)],
+            )
+            # Nothing left for the next refresh
+            self.refresh.reset_mock()
+            coalescer.flush()
+            self.refresh.assert_not_called()
+
+    def test_interval(self):
+        coalescer = self.module.RefreshCoalescer(10)
+        coalescer.request(layer("platform"))
+        self.timer.start.assert_called_once_with(0)
+
+        # Right after a refresh, wait for the rest of the interval
+        with mock.patch.object(self.module, "_layerreg"):
+            coalescer.flush()
+        self.elapsed.start.assert_called_once_with()
+        self.elapsed.isValid.return_value = True
+        self.elapsed.elapsed.return_value = 30
+        coalescer.request(layer("platform"))
+        self.timer.start.assert_called_with(70)
+
+    def test_removed(self):
+        platform = layer("platform")
+        coalescer = self.module.RefreshCoalescer(10)
+        coalescer.request(platform)
+        coalescer.request(layer("footprint"), symbology=True)
+
+        # The footprint layer is removed before the refresh
+        project = mock.Mock()
+        project.mapLayer.side_effect = {"platform": platform}.get
+        with mock.patch.object(self.module, "_layerreg", project):
+            coalescer.flush()
+        self.refresh.assert_called_once_with(platform, False)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -73,6 +73,50 @@ class ParserSingleShort(unittest.TestCase):
 
         # print(ST0601(value))
 
+    def test_st0601_lazy(self):
+        with open("./data/DynamicConstantMISMMSPacketData.bin", "rb") as f:
+            value = f.read()[18:]
+
+        from QGIS_FMV.klvdata.misb0601 import UASLocalMetadataSet
+
+        lazy = UASLocalMetadataSet(value)
+        # Nothing is decoded until it is read
+        self.assertEqual(lazy._decoded, {})
+        latitude = lazy.SensorLatitude
+        self.assertEqual(list(lazy._decoded), [b"\x0d"])
+
+        eager = UASLocalMetadataSet(value)
+        eager.MetadataList()
+        self.assertEqual(latitude, eager.SensorLatitude)
+        self.assertEqual(lazy.SlantRange, eager.SlantRange)
+        self.assertEqual(lazy.PlatformTailNumber, eager.PlatformTailNumber)
+        self.assertEqual(lazy.CornerLatitudePoint1Full, eager.CornerLatitudePoint1Full)
+        self.assertEqual(list(lazy.items), list(eager.items))
+        self.assertEqual(lazy[b"\x0d"].value.value, latitude)
+
+    def test_st0601_malformed(self):
+        from unittest import mock
+
+        with open("./data/DynamicConstantMISMMSPacketData.bin", "rb") as f:
+            value = f.read()[18:]
+
+        from QGIS_FMV.klvdata.misb0601 import UASLocalMetadataSet
+
+        # Mapped values that cannot be converted keep their raw bytes
+        with mock.patch(
+            "QGIS_FMV.klvdata.elementparser.bytes_to_float", side_effect=TypeError
+        ):
+            packet = UASLocalMetadataSet(value)
+            self.assertIsNone(packet.SensorLatitude)
+            self.assertIsNone(packet.SlantRange)
+        self.assertEqual(type(packet[b"\x0d"].value.value), bytes)
+        self.assertEqual(packet.ImageSourceSensor, "EO Nose")
+        self.assertIn(13, packet.MetadataList())
+
+        # Unknown tag 99, kept as bytes
+        packet = UASLocalMetadataSet(value + b"\x63\x02\x01\x02")
+        self.assertEqual(type(packet[b"\x63"].value), bytes)
+
     def test_st0601_2(self):
         # This test vector is hand generated, containing the MISB ST0601 16 byte key and the
         # MISB ST0102 nested security metadata local set from MISB ST0902.5
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# 10 seconds of 25 fps video (PES headers only) and 10 Hz KLV, from 1.4 s
+STREAM = os.path.join(DATA_FOLDER, "KlvSampleStream.ts")
+
+
+def read_stream():
+    with open(STREAM, "rb") as f:
+        return f.read()
+
+
+def demux(data, size):
+    from QGIS_FMV.klvdata.QgsFmvMpegTs import TsDemuxer
+
+    demuxer = TsDemuxer()
+    events = []
+    for i in range(0, len(data), size):
+        events.extend(demuxer.feed(data[i : i + size]))
+    events.extend(demuxer.flush())
+    return demuxer, events
+
+
+class Pts(unittest.TestCase):
+    def test_parse(self):
+        from QGIS_FMV.klvdata.QgsFmvMpegTs import parsePts
+
+        # PTS 0x1ABCDEF01 as written in a PES header
+        pts = 0x1ABCDEF01
+        data = bytes(
+            [
+                0x21 | ((pts >> 30) & 0x07) << 1,
+                (pts >> 22) & 0xFF,
+                ((pts >> 15) & 0x7F) << 1 | 1,
+                (pts >> 7) & 0xFF,
+                (pts & 0x7F) << 1 | 1,
+            ]
+        )
+        self.assertEqual(parsePts(data, 0), pts)
+
+    def test_wrap(self):
+        from QGIS_FMV.klvdata.QgsFmvMpegTs import PTS_WRAP, ptsToMs
+
+        self.assertEqual(ptsToMs(126000 + 9000, 126000), 100)
+        self.assertEqual(ptsToMs(4500, PTS_WRAP - 4500), 100)
+        self.assertEqual(ptsToMs(0, 9000), -100)
+
+
+class TsDemuxer(unittest.TestCase):
+    def test_streams(self):
+        demuxer, events = demux(read_stream(), 188 * 40)
+        self.assertEqual(
+            demuxer.streams, {0x100: ("video", 0x1B), 0x101: ("klv", 0x06)}
+        )
+
+        klv = [e for e in events if e[0] == "klv"]
+        video = [e for e in events if e[0] == "video"]
+        self.assertEqual(len(klv), 100)
+        self.assertEqual(len(video), 250)
+        self.assertEqual([e[2] for e in klv[:3]], [126000, 135000, 144000])
+        self.assertEqual(video[1][2], 129600)
+        self.assertTrue(all(e[3][:4] == b"\x06\x0e+4" for e in klv))
+
+    def test_any_chunk_size(self):
+        data = read_stream()
+        _, expected = demux(data, len(data))
+        for size in (1, 187, 189, 4096):
+            self.assertEqual(demux(data, size)[1], expected, size)
+
+    def test_resync(self):
+        data = read_stream()
+        _, expected = demux(data, len(data))
+        # Bytes lost in the middle of the stream
+        demuxer, events = demux(data[:1000] + data[1000 + 188 * 3 - 50 :], 4096)
+        self.assertGreater(demuxer.skipped, 0)
+        self.assertGreater(len(events), len(expected) - 5)
+
+    def test_parse_klv(self):
+        from QGIS_FMV.klvdata.streamparser import StreamParser
+
+        _, events = demux(read_stream(), 4096)
+        packet = next(StreamParser(events[1][3]))
+        self.assertAlmostEqual(packet.SensorLatitude, 60.176822966978335)
+
+
+if __name__ == "__main__":
+    unittest.main()
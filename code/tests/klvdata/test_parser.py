@@ -76,5 +76,48 @@ class ParserSingleLong(ParserTestCase):
         self.assertEqual(value, self.value)
 
 
+class ParserMemoryView(ParserTestCase):
+    def setUp(self):
+        with open("./data/DynamicConstantMISMMSPacketData.bin", "rb") as f:
+            self.packet = f.read()
+
+        from QGIS_FMV.klvdata.klvparser import KLVParser
+
+        self.view = memoryview(self.packet)
+        self.parser = KLVParser(self.view, key_length=16)
+
+    def test_same_as_stream(self):
+        from QGIS_FMV.klvdata.klvparser import KLVParser
+
+        key, value = next(self.parser)
+        expected_key, expected_value = next(KLVParser(self.packet, key_length=16))
+        self.assertIsInstance(key, bytes)
+        self.assertEqual(key, expected_key)
+        self.assertEqual(bytes(value), expected_value)
+
+    def test_zero_copy(self):
+        key, value = next(self.parser)
+        self.assertIsInstance(value, memoryview)
+        self.assertIs(value.obj, self.packet)
+
+    def test_nested(self):
+        from QGIS_FMV.klvdata.klvparser import KLVParser
+
+        _, value = next(self.parser)
+        items = list(KLVParser(value, key_length=1))
+        expected = list(KLVParser(self.packet[18:], key_length=1))
+        self.assertEqual(len(items), len(expected))
+        for (key, value), (expected_key, expected_value) in zip(items, expected):
+            self.assertEqual(key, expected_key)
+            self.assertEqual(bytes(value), expected_value)
+            self.assertIs(value.obj, self.packet)
+
+    def test_truncated(self):
+        from QGIS_FMV.klvdata.klvparser import KLVParser
+
+        parser = KLVParser(self.view[:16], key_length=16)
+        self.assertEqual(list(parser), [])
+
+
 if __name__ == "__main__":
     unittest.main()
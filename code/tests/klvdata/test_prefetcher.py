@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import threading
+import unittest
+
+
+class FakeSlot:
+    def __init__(self, key, order, wait=None):
+        self.key = key
+        self.disposed = False
+        self._order = order
+        self._wait = wait
+        self.started = threading.Event()
+
+    def run(self):
+        self.started.set()
+        if self._wait is not None:
+            self._wait.wait(5)
+        self._order.append(self.key)
+
+    def dispose(self):
+        self.disposed = True
+
+
+class MetadataPrefetcher(unittest.TestCase):
+    def _drain(self, prefetcher):
+        for t in list(prefetcher._threads):
+            t.join(5)
+
+    def test_nearest_first(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import MetadataPrefetcher
+
+        order = []
+        release = threading.Event()
+        prefetcher = MetadataPrefetcher(workers=1)
+        # The only worker is busy with the first slot while the rest is queued
+        first = FakeSlot(0, order, release)
+        prefetcher.submit(first)
+        first.started.wait(5)
+        for key in (1000, 2000, 3000, 4000):
+            prefetcher.submit(FakeSlot(key, order))
+        prefetcher.seek(3200)
+        release.set()
+        self._drain(prefetcher)
+
+        self.assertEqual(order, [0, 3000, 4000, 2000, 1000])
+        self.assertEqual(prefetcher._threads, [])
+
+    def test_seek_drops_disposed(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import MetadataPrefetcher
+
+        order = []
+        release = threading.Event()
+        prefetcher = MetadataPrefetcher(workers=1)
+        first = FakeSlot(0, order, release)
+        prefetcher.submit(first)
+        first.started.wait(5)
+        stale = FakeSlot(1000, order)
+        prefetcher.submit(stale)
+        prefetcher.submit(FakeSlot(9000, order))
+        stale.dispose()
+        prefetcher.seek(9000)
+        self.assertEqual(prefetcher.pending(), 1)
+        release.set()
+        self._drain(prefetcher)
+
+        self.assertEqual(order, [0, 9000])
+
+    def test_bounded_workers(self):
+        from QGIS_FMV.klvdata.QgsFmvKlvReader import MetadataPrefetcher
+
+        order = []
+        release = threading.Event()
+        prefetcher = MetadataPrefetcher(workers=2)
+        for key in range(0, 5000, 1000):
+            prefetcher.submit(FakeSlot(key, order, release))
+        self.assertEqual(len(prefetcher._threads), 2)
+        release.set()
+        self._drain(prefetcher)
+
+        self.assertEqual(sorted(order), [0, 1000, 2000, 3000, 4000])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import unittest
+
+
+class SimplifyLine(unittest.TestCase):
+    def test_straight(self):
+        from QGIS_FMV.utils.QgsFmvTrajectory import simplifyLine
+
+        points = [(float(i), 0.0) for i in range(10)]
+        self.assertEqual(simplifyLine(points, 0.01), [(0.0, 0.0), (9.0, 0.0)])
+
+    def test_corner(self):
+        from QGIS_FMV.utils.QgsFmvTrajectory import simplifyLine
+
+        points = [(0, 0), (1, 0.001), (2, 0), (2, 1), (2.001, 2), (2, 3)]
+        self.assertEqual(simplifyLine(points, 0.01), [(0, 0), (2, 0), (2, 3)])
+        # Every vertex is kept without tolerance
+        self.assertEqual(simplifyLine(points, 0), points)
+
+
+class TrajectoryBuffer(unittest.TestCase):
+    def test_chunks(self):
+        from QGIS_FMV.utils.QgsFmvTrajectory import TrajectoryBuffer
+
+        trajectory = TrajectoryBuffer(chunk_size=3)
+        self.assertTrue(trajectory.append(0, 0))
+        self.assertEqual(trajectory.vertices(), [(0, 0), (0, 0)])
+        trajectory.append(1, 0)
+        self.assertFalse(trajectory.isFull())
+        trajectory.append(2, 1)
+        self.assertTrue(trajectory.isFull())
+
+        trajectory.fid = 1
+        trajectory.geometry = object()
+        self.assertEqual(trajectory.closed(), [(0, 0), (1, 0), (2, 1)])
+        # The next chunk starts where the last one ended
+        self.assertIsNone(trajectory.fid)
+        self.assertIsNone(trajectory.geometry)
+        trajectory.append(3, 1)
+        self.assertEqual(trajectory.vertices(), [(2, 1), (3, 1)])
+
+    def test_min_interval(self):
+        from QGIS_FMV.utils.QgsFmvTrajectory import TrajectoryBuffer
+
+        trajectory = TrajectoryBuffer(min_interval=1000)
+        self.assertTrue(trajectory.append(0, 0, 10.0))
+        self.assertFalse(trajectory.append(1, 0, 10.5))
+        self.assertTrue(trajectory.append(2, 0, 11.0))
+        # Packets without time stamp are not decimated
+        self.assertTrue(trajectory.append(3, 0))
+        self.assertEqual(len(trajectory.points), 3)
+
+    def test_repeated(self):
+        from QGIS_FMV.utils.QgsFmvTrajectory import TrajectoryBuffer
+
+        trajectory = TrajectoryBuffer()
+        trajectory.append(1, 1)
+        self.assertFalse(trajectory.append(1, 1))
+        self.assertEqual(trajectory.points, [(1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
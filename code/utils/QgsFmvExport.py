@@ -0,0 +1,362 @@
+"""
+Headless export of the video telemetry to GeoPackage.
+
+Decodes the whole KLV stream of every video in a single pass and bulk
+writes the platform positions, trajectory, footprints, frame centers and
+beams to one GeoPackage per video. Videos are processed in parallel.
+
+Run it with the QGIS Python environment:
+
+    python -m QGIS_FMV.utils.QgsFmvExport -o out_folder [-j 4] video.ts folder
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import sin
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsFields,
+    QgsGeometry,
+    QgsLineString,
+    QgsPoint,
+    QgsPolygon,
+    QgsVectorFileWriter,
+    QgsWkbTypes,
+)
+
+from QGIS_FMV.QgsFmvConstants import (
+    Beams_lyr,
+    Footprint_lyr,
+    FrameCenter_lyr,
+    Platform_lyr,
+    Trajectory_lyr,
+    encoding,
+)
+from QGIS_FMV.klvdata.batchparser import BatchParser, RecordView
+from QGIS_FMV.utils.QgsFmvFields import _toQgsField
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+VIDEO_EXTENSIONS = (".ts", ".mpg", ".mpeg", ".mp4", ".m2ts", ".mts", ".h264")
+
+PLATFORM_FIELDS = [
+    ("time_ms", int),
+    ("timestamp", str),
+    ("lon", float),
+    ("lat", float),
+    ("alt", float),
+    ("heading", float),
+    ("tail", str),
+]
+TRAJECTORY_FIELDS = [("video", str), ("start_ms", int), ("end_ms", int)]
+FOOTPRINT_FIELDS = [
+    ("time_ms", int),
+    ("timestamp", str),
+    ("sensor", str),
+    ("lon_ul", float),
+    ("lat_ul", float),
+    ("lon_ur", float),
+    ("lat_ur", float),
+    ("lon_lr", float),
+    ("lat_lr", float),
+    ("lon_ll", float),
+    ("lat_ll", float),
+]
+FRAMECENTER_FIELDS = [("time_ms", int), ("lon", float), ("lat", float), ("alt", float)]
+BEAMS_FIELDS = [("time_ms", int), ("corner", str)]
+
+CORNERS = ("UL", "UR", "LR", "LL")
+
+
+def _packetRow(ms, packet):
+    """ Plain values of a RecordView, None if it has no platform position """
+    # Local import, the utils work on the current project when loaded
+    from QGIS_FMV.utils.QgsFmvUtils import ComputePacketCorners
+
+    lat = packet.SensorLatitude
+    lon = packet.SensorLongitude
+    if lat is None or lon is None:
+        return None
+    alt = packet.SensorTrueAltitude
+
+    timestamp = packet.PrecisionTimeStamp
+    timestamp = "" if timestamp is None else str(timestamp)
+
+    frameCenter = None
+    corners = None
+    fcLat = packet.FrameCenterLatitude
+    fcLon = packet.FrameCenterLongitude
+    if fcLat is not None and fcLon is not None:
+        # Same frame center altitude fallback as UpdateLayers
+        fcAlt = packet.FrameCenterElevation
+        if fcAlt is None:
+            elevationAngle = packet.SensorRelativeElevationAngle
+            slantRange = packet.SlantRange
+            if None not in (elevationAngle, slantRange, alt):
+                fcAlt = alt - sin(elevationAngle) * slantRange
+            else:
+                fcAlt = 0.0
+        frameCenter = (fcLon, fcLat, fcAlt)
+        try:
+            corners = ComputePacketCorners(packet)
+        except Exception:
+            corners = None
+
+    return {
+        "time_ms": ms,
+        "timestamp": timestamp,
+        "sensor": (lon, lat, alt),
+        "heading": packet.PlatformHeadingAngle,
+        "tail": packet.PlatformTailNumber,
+        "imageSensor": packet.ImageSourceSensor,
+        "frameCenter": frameCenter,
+        "corners": corners,
+    }
+
+
+def ExtractTelemetry(videoPath, klv_index=None, interval=0):
+    """Decode the KLV stream of a video in a single pass.
+    Return a list of plain value rows (see _packetRow), at most one every
+    interval milliseconds.
+    """
+    # Local import, see _packetRow
+    from QGIS_FMV.klvdata.QgsFmvKlvIndex import loadOrBuildKlvIndex
+    from QGIS_FMV.utils.QgsFmvUtils import getKlvStreamIndex, getVideoCacheInfo
+
+    if klv_index is None:
+        klv_index = getVideoCacheInfo(videoPath).get("klv_index")
+    if klv_index is None:
+        klv_index = getKlvStreamIndex(videoPath)
+    index = loadOrBuildKlvIndex(videoPath, klv_index)
+    if index is None:
+        return []
+    return IndexTelemetry(index, interval)
+
+
+def IndexTelemetry(index, interval=0, canceled=None):
+    """Plain value rows of the packets of a KLV index, see ExtractTelemetry.
+    The whole index is decoded at once into columnar arrays by BatchParser.
+    Return None if canceled() becomes True while decoding.
+    """
+    decoded = BatchParser().parseIndex(index, canceled)
+    if decoded is None:
+        return None
+    pts, records = decoded
+    rows = []
+    last = None
+    previous = None
+    for row, ms in enumerate(pts.tolist()):
+        if canceled is not None and canceled():
+            return None
+        # Only the first local set of an index packet
+        if ms == previous:
+            continue
+        previous = ms
+        if interval and last is not None and ms - last < interval:
+            continue
+        values = _packetRow(ms, RecordView(records, row))
+        if values is not None:
+            rows.append(values)
+            last = ms
+    return rows
+
+
+def _layerWriter(path, name, fields, geometryType, append):
+    """ Create a GeoPackage layer writer """
+    qgsfields = QgsFields()
+    for field in fields:
+        qgsfields.append(_toQgsField(field))
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+    options.layerName = name
+    options.fileEncoding = encoding
+    if append:
+        options.actionOnExistingFile = QgsVectorFileWriter.CreateOrOverwriteLayer
+    writer = QgsVectorFileWriter.create(
+        path,
+        qgsfields,
+        geometryType,
+        QgsCoordinateReferenceSystem("EPSG:4326"),
+        QgsCoordinateTransformContext(),
+        options,
+    )
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise IOError(writer.errorMessage())
+    return writer
+
+
+def _feature(geometry, attributes):
+    feature = QgsFeature()
+    feature.setGeometry(QgsGeometry(geometry))
+    feature.setAttributes(attributes)
+    return feature
+
+
+def WriteGeoPackage(path, rows, name=""):
+    """ Bulk write the telemetry rows to the layers of a GeoPackage """
+    if os.path.exists(path):
+        os.remove(path)
+
+    platform = []
+    footprints = []
+    frameCenters = []
+    beams = []
+    for row in rows:
+        ms = row["time_ms"]
+        lon, lat, alt = row["sensor"]
+        sensor = QgsPoint(lon, lat, alt) if alt is not None else QgsPoint(lon, lat)
+        platform.append(
+            _feature(
+                sensor.clone(),
+                [ms, row["timestamp"], lon, lat, alt, row["heading"], row["tail"]],
+            )
+        )
+
+        if row["frameCenter"] is not None:
+            fcLon, fcLat, fcAlt = row["frameCenter"]
+            frameCenters.append(
+                _feature(QgsPoint(fcLon, fcLat, fcAlt), [ms, fcLon, fcLat, fcAlt])
+            )
+
+        corners = row["corners"]
+        if corners is None:
+            continue
+        ring = [QgsPoint(c[1], c[0]) for c in corners]
+        ring.append(ring[0].clone())
+        footprints.append(
+            _feature(
+                QgsPolygon(QgsLineString(ring)),
+                [ms, row["timestamp"], row["imageSensor"]]
+                + [v for c in corners for v in (c[1], c[0])],
+            )
+        )
+        for corner, point in zip(CORNERS, corners):
+            beams.append(
+                _feature(
+                    QgsLineString([sensor.clone(), QgsPoint(point[1], point[0])]),
+                    [ms, corner],
+                )
+            )
+
+    layers = [
+        (Platform_lyr, PLATFORM_FIELDS, QgsWkbTypes.PointZ, platform),
+        (FrameCenter_lyr, FRAMECENTER_FIELDS, QgsWkbTypes.PointZ, frameCenters),
+        (Footprint_lyr, FOOTPRINT_FIELDS, QgsWkbTypes.Polygon, footprints),
+        (Beams_lyr, BEAMS_FIELDS, QgsWkbTypes.LineStringZ, beams),
+    ]
+    if len(platform) > 1:
+        track = QgsLineString([f.geometry().constGet().clone() for f in platform])
+        trajectory = [
+            _feature(track, [name, rows[0]["time_ms"], rows[-1]["time_ms"]])
+        ]
+        layers.append(
+            (Trajectory_lyr, TRAJECTORY_FIELDS, QgsWkbTypes.LineStringZ, trajectory)
+        )
+
+    for i, (layerName, fields, geometryType, features) in enumerate(layers):
+        writer = _layerWriter(path, layerName, fields, geometryType, i > 0)
+        writer.addFeatures(features)
+        del writer
+
+    return {layerName: len(features) for layerName, _, _, features in layers}
+
+
+def ExportVideo(videoPath, output, interval=0, klv_index=None):
+    """ Export the telemetry of a video, return (gpkg path, features by layer) """
+    root, _ = os.path.splitext(os.path.basename(videoPath))
+    path = os.path.join(output, root + ".gpkg")
+    rows = ExtractTelemetry(videoPath, klv_index, interval)
+    return path, WriteGeoPackage(path, rows, os.path.basename(videoPath))
+
+
+_qgs = None
+
+
+def _initWorker():
+    """ Start QGIS once in every worker process """
+    global _qgs
+    if QgsApplication.instance() is None:
+        _qgs = QgsApplication([], False)
+        _qgs.initQgis()
+
+
+def ExportVideos(videos, output, workers=None, interval=0):
+    """Export many videos in parallel, one process per video.
+    Yield (video, gpkg path, features by layer, error) as they finish.
+    """
+    os.makedirs(output, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker) as pool:
+        futures = {
+            pool.submit(ExportVideo, video, output, interval): video
+            for video in videos
+        }
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                path, counts = future.result()
+                yield video, path, counts, None
+            except Exception as e:
+                yield video, None, None, e
+
+
+def _listVideos(paths):
+    """ Expand folders to the video files they hold """
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    videos.append(os.path.join(path, name))
+        else:
+            videos.append(path)
+    return videos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export MISB video telemetry to GeoPackage"
+    )
+    parser.add_argument("videos", nargs="+", help="video files or folders")
+    parser.add_argument("-o", "--output", required=True, help="output folder")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="parallel processes"
+    )
+    parser.add_argument(
+        "--interval",
+        type=int,
+        default=0,
+        help="minimum milliseconds between exported packets (0 = all)",
+    )
+    args = parser.parse_args(argv)
+
+    videos = _listVideos(args.videos)
+    failed = 0
+    for video, path, counts, error in ExportVideos(
+        videos, args.output, args.workers, args.interval
+    ):
+        if error is not None:
+            failed += 1
+            print("FAILED %s: %s" % (video, error))
+        else:
+            print(
+                "%s -> %s (%s)"
+                % (
+                    video,
+                    path,
+                    ", ".join("%s: %d" % item for item in counts.items()),
+                )
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""
+Attribute field definitions of the video layers.
+
+Kept apart from QgsFmvLayers, which works on the current QGIS project, so
+the headless export can use them without touching any project.
+"""
+from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsField
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+TYPE_MAP = {
+    str: QVariant.String,
+    float: QVariant.Double,
+    int: QVariant.Int,
+    bool: QVariant.Bool,
+}
+
+
+def _toQgsField(f):
+    """ Create QgsFiel """
+    if isinstance(f, QgsField):
+        return f
+    return QgsField(f[0], TYPE_MAP.get(f[1], QVariant.String))
@@ -0,0 +1,252 @@
+"""
+Footprint time series of a video.
+
+The corners, frame center, sensor position and pixel to map homography of
+every KLV packet are computed once from the KLV index. The footprint at any
+playback position is then interpolated between the two packets around it,
+so the footprint layers and the click-to-map transform follow the video
+smoothly without decoding any packet while playing.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from qgis.core import QgsTask
+
+from QGIS_FMV.QgsFmvConstants import footprint_max_gap
+from QGIS_FMV.utils.QgsFmvExport import IndexTelemetry
+from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+# UL, UR, LR, LL and center of the image, in image width / height units
+UNIT_POINTS = np.array(
+    [[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0], [0.5, 0.5]], dtype=np.float64
+)
+
+
+def unitHomographies(points):
+    """Homographies (n, 3, 3) from UNIT_POINTS to n sets of 5 [lat, lon]
+    points (UL, UR, LR, LL, center), least squares as findHomography does.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+
+    # Solve in normalized coordinates, the footprints are tiny in degrees
+    origin = points.mean(axis=1)
+    scale = np.abs(points - origin[:, None, :]).max(axis=(1, 2))
+    scale[scale == 0] = 1.0
+    normalized = (points - origin[:, None, :]) / scale[:, None, None]
+
+    x, y = UNIT_POINTS.T
+    u = normalized[..., 0]
+    v = normalized[..., 1]
+    A = np.zeros((n, 10, 9))
+    A[:, 0::2, 0] = -x
+    A[:, 0::2, 1] = -y
+    A[:, 0::2, 2] = -1.0
+    A[:, 0::2, 6] = u * x
+    A[:, 0::2, 7] = u * y
+    A[:, 0::2, 8] = u
+    A[:, 1::2, 3] = -x
+    A[:, 1::2, 4] = -y
+    A[:, 1::2, 5] = -1.0
+    A[:, 1::2, 6] = v * x
+    A[:, 1::2, 7] = v * y
+    A[:, 1::2, 8] = v
+    _, _, vt = np.linalg.svd(A)
+    h = vt[:, -1].reshape(n, 3, 3)
+
+    denormalize = np.zeros((n, 3, 3))
+    denormalize[:, 0, 0] = scale
+    denormalize[:, 1, 1] = scale
+    denormalize[:, 0, 2] = origin[:, 0]
+    denormalize[:, 1, 2] = origin[:, 1]
+    denormalize[:, 2, 2] = 1.0
+    h = denormalize @ h
+    return h / h[:, 2:3, 2:3]
+
+
+def _wrap(angle, half_turn=180.0):
+    """ Angle in [-half_turn, half_turn) """
+    return (angle + half_turn) % (2 * half_turn) - half_turn
+
+
+def _lerpLatLon(a, b, t):
+    """ Interpolate [..., lat, lon] values, across the antimeridian if shorter """
+    delta = b - a
+    delta[..., 1] = _wrap(delta[..., 1])
+    value = a + delta * t
+    value[..., 1] = _wrap(value[..., 1])
+    return value
+
+
+def _lerpAngle(a, b, t):
+    """ Interpolate an angle in degrees along the shortest arc """
+    return (a + _wrap(b - a) * t) % 360.0
+
+
+def _value(v):
+    return None if np.isnan(v) else float(v)
+
+
+class FootprintSample(
+    namedtuple(
+        "FootprintSample",
+        [
+            "ms",
+            "corners",
+            "frameCenter",
+            "sensor",
+            "heading",
+            "imageSensor",
+            "homography",
+        ],
+    )
+):
+    """Footprint at a playback position.
+    corners are the [lat, lon] of UL, UR, LR and LL, frameCenter and sensor
+    are [lat, lon, alt]. It has the packet attributes read by the footprint
+    and beams update functions.
+    """
+
+    __slots__ = ()
+
+    @property
+    def SensorLatitude(self):
+        return _value(self.sensor[0])
+
+    @property
+    def SensorLongitude(self):
+        return _value(self.sensor[1])
+
+    @property
+    def SensorTrueAltitude(self):
+        return _value(self.sensor[2])
+
+    @property
+    def ImageSourceSensor(self):
+        return self.imageSensor
+
+    def transform(self, width, height):
+        """ Homography from the pixels of a width x height image to [lat, lon] """
+        return self.homography @ np.diag([1.0 / width, 1.0 / height, 1.0])
+
+
+class FootprintSeries:
+    """Per packet footprints of a video, interpolated at any position.
+
+    Packets more than max_gap milliseconds apart are not interpolated: the
+    footprint of the previous packet is kept for max_gap milliseconds, then
+    there is no footprint until the next packet.
+    """
+
+    def __init__(self, rows, max_gap=footprint_max_gap):
+        rows = [
+            row
+            for row in rows
+            if row["corners"] is not None and row["frameCenter"] is not None
+        ]
+        self.max_gap = max_gap
+        self.pts = np.array([row["time_ms"] for row in rows], dtype=np.float64)
+        self.corners = np.array(
+            [row["corners"] for row in rows], dtype=np.float64
+        ).reshape(-1, 4, 2)
+        # [lon, lat, alt] rows to [lat, lon, alt] as the corners
+        self.frameCenter = np.array(
+            [row["frameCenter"] for row in rows], dtype=np.float64
+        ).reshape(-1, 3)[:, [1, 0, 2]]
+        self.sensor = np.array(
+            [row["sensor"] for row in rows], dtype=np.float64
+        ).reshape(-1, 3)[:, [1, 0, 2]]
+        self.heading = np.array([row["heading"] for row in rows], dtype=np.float64)
+        self.imageSensor = [row["imageSensor"] for row in rows]
+        self.homography = self._homographies(self.corners, self.frameCenter)
+
+    @classmethod
+    def fromIndex(cls, index, max_gap=footprint_max_gap, canceled=None):
+        """Decode every packet of a KlvIndex once.
+        Return None if canceled() becomes True while decoding.
+        """
+        rows = IndexTelemetry(index, canceled=canceled)
+        if rows is None:
+            return None
+        return cls(rows, max_gap)
+
+    @staticmethod
+    def _homographies(corners, frameCenter):
+        if not len(corners):
+            return np.zeros((0, 3, 3))
+        return unitHomographies(
+            np.concatenate([corners, frameCenter[:, None, :2]], axis=1)
+        )
+
+    def __len__(self):
+        return len(self.pts)
+
+    def _sample(self, i, ms):
+        return FootprintSample(
+            ms,
+            self.corners[i],
+            self.frameCenter[i],
+            self.sensor[i],
+            _value(self.heading[i]),
+            self.imageSensor[i],
+            self.homography[i],
+        )
+
+    def _interpolate(self, i, t, ms):
+        j = i + 1
+        corners = _lerpLatLon(self.corners[i], self.corners[j], t)
+        frameCenter = _lerpLatLon(self.frameCenter[i], self.frameCenter[j], t)
+        sensor = _lerpLatLon(self.sensor[i], self.sensor[j], t)
+        return FootprintSample(
+            ms,
+            corners,
+            frameCenter,
+            sensor,
+            _value(_lerpAngle(self.heading[i], self.heading[j], t)),
+            self.imageSensor[i],
+            self._homographies(corners[None], frameCenter[None])[0],
+        )
+
+    def at(self, ms):
+        """ FootprintSample at a position in milliseconds, None if there is none """
+        if not len(self.pts):
+            return None
+        i = int(np.searchsorted(self.pts, ms, side="right")) - 1
+        if i < 0:
+            return None
+        if i == len(self.pts) - 1 or self.pts[i + 1] - self.pts[i] > self.max_gap:
+            if ms - self.pts[i] > self.max_gap:
+                return None
+            return self._sample(i, ms)
+        t = (ms - self.pts[i]) / (self.pts[i + 1] - self.pts[i])
+        if t == 0:
+            return self._sample(i, ms)
+        return self._interpolate(i, t, ms)
+
+
+class FootprintSeriesTask(QgsTask):
+    """ Build the FootprintSeries of a KlvIndex in the background """
+
+    def __init__(self, index, name=""):
+        super().__init__("Footprint Series Task " + name, QgsTask.CanCancel)
+        self.index = index
+        self.series = None
+
+    def run(self):
+        try:
+            series = FootprintSeries.fromIndex(self.index, canceled=self.isCanceled)
+        except Exception as e:
+            qgsu.showUserAndLogMessage(
+                "", "Footprint series failed: " + str(e), onlyLog=True
+            )
+            return False
+        if series is None or self.isCanceled():
+            return False
+        self.series = series
+        return True
@@ -0,0 +1,177 @@
+"""
+Reverse geocoding of the video locations.
+
+Place names are cached in a SQLite database by grid cell (latitude and
+longitude rounded to geocode_precision decimals), so videos over the same
+area never query the service again. ReverseGeocoder looks up names without
+blocking the GUI thread; fetchPlaceName is the blocking version for
+background threads and processes.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from qgis.PyQt.QtCore import QObject, QTimer, QUrl, pyqtSignal
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+from qgis.core import QgsNetworkAccessManager
+
+from QGIS_FMV.QgsFmvConstants import (
+    Reverse_geocoding_url,
+    geocode_precision,
+    geocode_timeout,
+)
+from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+
+class GeocodeCache:
+    """ Place names by grid cell, stored in a SQLite database """
+
+    def __init__(self, path, precision=geocode_precision):
+        self.path = path
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS places ("
+            "lat INTEGER, lon INTEGER, name TEXT, PRIMARY KEY (lat, lon))"
+        )
+
+    def _execute(self, sql, parameters=()):
+        """ Run a statement in its own transaction, return the first row """
+        with self._lock:
+            conn = sqlite3.connect(self.path, timeout=10)
+            try:
+                with conn:
+                    return conn.execute(sql, parameters).fetchone()
+            finally:
+                conn.close()
+
+    def cell(self, lat, lon):
+        """ Grid cell of a location """
+        scale = 10 ** self.precision
+        return int(round(lat * scale)), int(round(lon * scale))
+
+    def get(self, lat, lon):
+        """ Cached place name of a location, None if unknown """
+        row = self._execute(
+            "SELECT name FROM places WHERE lat = ? AND lon = ?", self.cell(lat, lon)
+        )
+        return row[0] if row else None
+
+    def set(self, lat, lon, name):
+        """ Cache the place name of a location """
+        self._execute(
+            "INSERT OR REPLACE INTO places (lat, lon, name) VALUES (?, ?, ?)",
+            self.cell(lat, lon) + (name,),
+        )
+
+
+_cache = None
+
+
+def geocodeCache():
+    """ Shared geocode cache of the plugin """
+    global _cache
+    if _cache is None:
+        folder = os.path.join(os.path.expanduser("~"), "QGIS_FMV", ".cache")
+        os.makedirs(folder, exist_ok=True)
+        _cache = GeocodeCache(os.path.join(folder, "geocode.sqlite"))
+    return _cache
+
+
+def placeName(data):
+    """ Place name of a reverse geocoding service answer """
+    address = data.get("address", {})
+    if "village" in address and "state" in address:
+        return address["village"] + ", " + address["state"]
+    if "town" in address and "state" in address:
+        return address["town"] + ", " + address["state"]
+    return data["display_name"]
+
+
+def fetchPlaceName(lat, lon, url=Reverse_geocoding_url, timeout=geocode_timeout):
+    """Blocking place name lookup, through the cache.
+    Uses the QGIS network settings (proxy, authentication, user agent).
+    Return None if the service is not set or did not answer.
+    """
+    cache = geocodeCache()
+    name = cache.get(lat, lon)
+    if name is not None or not url:
+        return name
+    request = QNetworkRequest(QUrl(url.format(str(lat), str(lon))))
+    request.setTransferTimeout(int(timeout * 1000))
+    try:
+        reply = QgsNetworkAccessManager.instance().blockingGet(request)
+        if reply.error() != QNetworkReply.NoError:
+            raise IOError(reply.errorString())
+        name = placeName(json.loads(reply.content().data()))
+    except Exception as e:
+        qgsu.showUserAndLogMessage(
+            "", "Reverse geocoding failed: " + str(e), onlyLog=True
+        )
+        return None
+    cache.set(lat, lon, name)
+    return name
+
+
+class ReverseGeocoder(QObject):
+    """Non-blocking place name lookups.
+    placeFound is emitted with (key, name) when a name is found, key is any
+    value given to lookup to identify the request.
+    """
+
+    placeFound = pyqtSignal(object, str)
+
+    def __init__(
+        self, parent=None, url=Reverse_geocoding_url, timeout=geocode_timeout
+    ):
+        super().__init__(parent)
+        self.url = url
+        self.timeout = timeout
+        self._replies = {}
+
+    def lookup(self, key, lat, lon):
+        """ Look up a place name, from the cache or the service """
+        name = geocodeCache().get(lat, lon)
+        if name is not None:
+            self.placeFound.emit(key, name)
+            return
+        if not self.url:
+            return
+
+        request = QNetworkRequest(QUrl(self.url.format(str(lat), str(lon))))
+        reply = QgsNetworkAccessManager.instance().get(request)
+        self._replies[reply] = (key, lat, lon)
+        reply.finished.connect(lambda: self._finished(reply))
+        # A slow service must not keep requests forever
+        QTimer.singleShot(int(self.timeout * 1000), lambda: self._timeout(reply))
+
+    def _timeout(self, reply):
+        if reply in self._replies:
+            reply.abort()
+
+    def _finished(self, reply):
+        key, lat, lon = self._replies.pop(reply)
+        try:
+            if reply.error() != QNetworkReply.NoError:
+                raise IOError(reply.errorString())
+            name = placeName(json.loads(reply.readAll().data()))
+        except Exception as e:
+            qgsu.showUserAndLogMessage(
+                "", "Reverse geocoding failed: " + str(e), onlyLog=True
+            )
+            return
+        finally:
+            reply.deleteLater()
+        geocodeCache().set(lat, lon, name)
+        self.placeFound.emit(key, name)
+
+    def abort(self):
+        """ Cancel pending lookups """
+        for reply in list(self._replies):
+            reply.abort()
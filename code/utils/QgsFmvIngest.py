@@ -0,0 +1,228 @@
+"""
+Background loading of the videos of the manager.
+
+VideoLoadTask loads a single manager row. For batch ingest every video is
+probed, its KLV stream is indexed and a summary (start location and
+footprint extent) is computed in a pool of processes. The summary is saved
+to the video cache, so adding the video to the manager afterwards does not
+decode anything.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import (
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+
+from qgis.PyQt.QtCore import pyqtSignal
+from qgis.core import QgsTask
+
+from QGIS_FMV.converter.ffmpeg import FFMpeg
+from QGIS_FMV.utils.QgsFmvExport import ExtractTelemetry, _initWorker
+from QGIS_FMV.utils.QgsFmvUtils import (
+    getKlvStreamIndex,
+    getLocationName,
+    getVideoCacheInfo,
+    getVideoLocationInfo,
+    probeKlvStreamData,
+    SetVideoCacheInfo,
+)
+from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+# Cache info values computed by the ingest
+SUMMARY_KEYS = ("klv_index", "location", "footprint", "duration")
+
+
+def _footprintExtent(rows):
+    """ [xmin, ymin, xmax, ymax] of all footprints and frame centers """
+    lons = []
+    lats = []
+    for row in rows:
+        if row["corners"] is not None:
+            lats.extend(c[0] for c in row["corners"])
+            lons.extend(c[1] for c in row["corners"])
+        elif row["frameCenter"] is not None:
+            lons.append(row["frameCenter"][0])
+            lats.append(row["frameCenter"][1])
+    if not lons:
+        return None
+    return [min(lons), min(lats), max(lons), max(lats)]
+
+
+def _startLocation(rows):
+    """ [lat, lon, place name] of the first frame center (or sensor) """
+    for row in rows:
+        if row["frameCenter"] is not None:
+            lon, lat, _ = row["frameCenter"]
+        else:
+            lon, lat, _ = row["sensor"]
+        # The place name is looked up by the manager, without blocking
+        return [lat, lon, getLocationName(lat, lon, online=False)]
+    return []
+
+
+def IngestVideo(videoPath, interval=1000):
+    """Probe a video, index its KLV stream and summarize its telemetry,
+    at most one packet every interval milliseconds.
+    Return a dict with the SUMMARY_KEYS values, also saved to the cache.
+    """
+    cache = getVideoCacheInfo(videoPath)
+    if all(key in cache for key in SUMMARY_KEYS):
+        return {key: cache[key] for key in SUMMARY_KEYS}
+
+    info = FFMpeg().probe(videoPath)
+    if info is None:
+        raise IOError("Failed loading FFMPEG ! ")
+
+    klv_index = cache.get("klv_index")
+    if klv_index is None:
+        klv_index = getKlvStreamIndex(videoPath)
+    rows = ExtractTelemetry(videoPath, klv_index, interval)
+
+    summary = {
+        "klv_index": klv_index,
+        "location": cache.get("location") or _startLocation(rows),
+        "footprint": _footprintExtent(rows),
+        "duration": info.format.duration,
+    }
+    SetVideoCacheInfo(videoPath, **summary)
+    return summary
+
+
+def _executor(workers):
+    """Process pool to ingest videos, or a thread pool when QGIS does not
+    run on a Python interpreter able to start worker processes.
+    Workers are spawned: a fork of the running QGIS would inherit its
+    threads' locks and its QgsApplication.
+    """
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        try:
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initWorker,
+            )
+        except (OSError, NotImplementedError) as e:
+            qgsu.showUserAndLogMessage(
+                "", "Ingest process pool not available: " + str(e), onlyLog=True
+            )
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+class BatchIngestTask(QgsTask):
+    """Ingest many videos concurrently.
+    videoReady is emitted with (video, summary) as every video finishes,
+    summary is None if the ingest failed.
+    """
+
+    videoReady = pyqtSignal(str, object)
+
+    def __init__(self, videos, workers=None):
+        super().__init__("Batch Ingest Videos Task", QgsTask.CanCancel)
+        self.videos = list(videos)
+        self.workers = workers or None
+        self.errors = {}
+
+    def run(self):
+        if not self.videos:
+            return True
+        done = 0
+        with _executor(self.workers) as pool:
+            futures = {pool.submit(IngestVideo, video): video for video in self.videos}
+            for future in as_completed(futures):
+                video = futures[future]
+                summary = None
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    self.errors[video] = str(e)
+                    qgsu.showUserAndLogMessage(
+                        "", "Ingest failed for " + video + ": " + str(e), onlyLog=True
+                    )
+                self.videoReady.emit(video, summary)
+                done += 1
+                self.setProgress(100.0 * done / len(self.videos))
+                if self.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+                    return False
+        return True
+
+
+class VideoLoadTask(QgsTask):
+    """Load a manager row: probe the video, find its KLV stream and its
+    start location, from the video cache when they are known. Place names
+    are only taken from the geocode cache, see ReverseGeocoder.
+    stageChanged is emitted with (row_id, progress) as every stage completes.
+    """
+
+    stageChanged = pyqtSignal(str, int)
+
+    def __init__(self, row_id, videoPath, islocal=False, klv_folder=None):
+        super().__init__(
+            "Load Video Task " + os.path.basename(videoPath), QgsTask.CanCancel
+        )
+        self.row_id = row_id
+        self.videoPath = videoPath
+        self.islocal = islocal
+        self.klv_folder = klv_folder
+        self.klv_index = None
+        self.location = None
+        self.error = None
+
+    def _stage(self, progress):
+        self.setProgress(progress)
+        self.stageChanged.emit(self.row_id, progress)
+
+    def run(self):
+        try:
+            cache = {} if self.islocal else getVideoCacheInfo(self.videoPath)
+            self._stage(30)
+            # KLV of the first second, read while looking for the KLV stream
+            klv_data = None
+            if "klv_index" in cache:
+                self.klv_index = cache["klv_index"]
+            else:
+                if FFMpeg().probe(self.videoPath) is None:
+                    qgsu.showUserAndLogMessage(
+                        "", "Failed loading FFMPEG ! ", onlyLog=True
+                    )
+                self.klv_index, klv_data = probeKlvStreamData(
+                    self.videoPath, self.islocal
+                )
+                if not self.islocal:
+                    SetVideoCacheInfo(self.videoPath, klv_index=self.klv_index)
+            self._stage(60)
+
+            if self.isCanceled():
+                return False
+
+            # init point we can center the video on
+            if "location" in cache:
+                self.location = cache["location"]
+            else:
+                self.location = getVideoLocationInfo(
+                    self.videoPath,
+                    self.islocal,
+                    self.klv_folder,
+                    self.klv_index,
+                    klv_data,
+                    online=False,
+                )
+                if self.location and not self.islocal:
+                    SetVideoCacheInfo(self.videoPath, location=self.location)
+            self._stage(90)
+        except Exception as e:
+            self.error = str(e)
+            qgsu.showUserAndLogMessage(
+                "", "Loading " + self.videoPath + " failed: " + str(e), onlyLog=True
+            )
+            return False
+        return True
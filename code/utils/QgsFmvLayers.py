@@ -1,10 +1,12 @@
 import os
 from qgis.PyQt.QtGui import QColor, QFont, QPolygonF
 from qgis.PyQt.QtWidgets import QApplication
-from qgis.PyQt.QtCore import QCoreApplication, QPointF
+from qgis.PyQt.QtCore import QCoreApplication, QElapsedTimer, QPointF, QTimer
 
+from QGIS_FMV.utils.QgsFmvFields import _toQgsField
+from QGIS_FMV.utils.QgsFmvTrajectory import TrajectoryBuffer
 from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
-from qgis.PyQt.QtCore import QVariant, QSettings
+from qgis.PyQt.QtCore import QSettings
 from qgis.core import (
     QgsPalLayerSettings,
     QgsTextFormat,
@@ -13,7 +15,6 @@ from qgis.core import (
     QgsVectorLayerSimpleLabeling,
     QgsMarkerSymbol,
     QgsLayerTreeLayer,
-    QgsField,
     QgsFields,
     QgsVectorLayer,
     QgsVectorFileWriter,
@@ -59,6 +60,10 @@ from QGIS_FMV.QgsFmvConstants import (
     frames_g,
     Trajectory_lyr,
     epsg,
+    max_refresh_rate,
+    trajectory_chunk_size,
+    trajectory_min_interval,
+    trajectory_tolerance,
 )
 from QGIS_FMV.QgsFmvConstants import encoding
 
@@ -68,13 +73,6 @@ groupName = None
 _layerreg = QgsProject.instance()
 crtSensorSrc = crtSensorSrc2 = crtPltTailNum = "DEFAULT"
 
-TYPE_MAP = {
-    str: QVariant.String,
-    float: QVariant.Double,
-    int: QVariant.Int,
-    bool: QVariant.Bool,
-}
-
 Point = "Point"
 PointZ = "PointZ"
 LineZ = "LineStringZ"
@@ -265,6 +263,83 @@ def AddDrawPolygonOnMap(poly_coordinates):
     return True
 
 
+class VideoLayerRegistry:
+    """Layers of the video groups by (group, layer name), so the packet
+    updates do not walk the layer tree. Layers are forgotten as soon as
+    they are going to be removed from the project, missing layers when
+    new layers are added.
+    """
+
+    def __init__(self, project):
+        self._layers = {}
+        self._project = project
+        project.layersWillBeRemoved.connect(self._layersWillBeRemoved)
+        project.layersAdded.connect(self._layersAdded)
+
+    def dispose(self):
+        """ Disconnect from the project and forget the layers """
+        self._project.layersWillBeRemoved.disconnect(self._layersWillBeRemoved)
+        self._project.layersAdded.disconnect(self._layersAdded)
+        self._layers.clear()
+
+    def register(self, layer, group):
+        """ Keep a video layer """
+        self._layers[(group, layer.name())] = layer
+
+    def layer(self, layerName, group):
+        """ Layer of a video group, None if it does not exist """
+        key = (group, layerName)
+        if key not in self._layers:
+            layer = selectLayerByName(layerName, group)
+            self._layers[key] = layer if isinstance(layer, QgsVectorLayer) else None
+        return self._layers[key]
+
+    def _layersWillBeRemoved(self, layerIds):
+        ids = set(layerIds)
+        for layerId in ids:
+            _trajectories.pop(layerId, None)
+        for key, layer in list(self._layers.items()):
+            if layer is not None and layer.id() in ids:
+                del self._layers[key]
+
+    def _layersAdded(self, _):
+        for key, layer in list(self._layers.items()):
+            if layer is None:
+                del self._layers[key]
+
+
+# Trajectory being drawn by trajectory layer id
+_trajectories = {}
+
+# Created on first use, so importing the module does not touch the project
+_videoLayers = None
+
+
+def VideoLayers():
+    """ Registry of the video layers, connected to the project on first use """
+    global _videoLayers
+    if _videoLayers is None:
+        _videoLayers = VideoLayerRegistry(_layerreg)
+    return _videoLayers
+
+
+def DisposeVideoLayers():
+    """ Disconnect the registry of the video layers from the project """
+    global _videoLayers
+    if _videoLayers is not None:
+        _videoLayers.dispose()
+        _videoLayers = None
+    _trajectories.clear()
+
+
+def _packetSeconds(packet):
+    """ Precision time stamp of a packet in seconds, None if missing """
+    try:
+        return packet[b"\x02"].value.value.timestamp()
+    except (KeyError, AttributeError):
+        return None
+
+
 def SetcrtSensorSrc():
     """ Set Style based on Sensor type """
     global crtSensorSrc, crtSensorSrc2
@@ -284,7 +359,7 @@ def UpdateFootPrintData(
     global crtSensorSrc, groupName
     imgSS = packet.ImageSourceSensor
 
-    footprintLyr = selectLayerByName(Footprint_lyr, groupName)
+    footprintLyr = VideoLayers().layer(Footprint_lyr, groupName)
 
     try:
         if all(
@@ -305,70 +380,46 @@ def UpdateFootPrintData(
                 len(cornerPointLL),
             ]
         ):
-            if imgSS != crtSensorSrc:
+            styled = imgSS != crtSensorSrc
+            if styled:
                 SetDefaultFootprintStyle(footprintLyr, imgSS)
                 crtSensorSrc = imgSS
 
-            footprintLyr.startEditing()
-            if footprintLyr.featureCount() == 0:
-                feature = QgsFeature()
-                feature.setAttributes(
-                    [
-                        cornerPointUL[1],
-                        cornerPointUL[0],
-                        cornerPointUR[1],
-                        cornerPointUR[0],
-                        cornerPointLR[1],
-                        cornerPointLR[0],
-                        cornerPointLL[1],
-                        cornerPointLL[0],
-                    ]
-                )
-                surface = QgsGeometry.fromPolygonXY(
+            attributes = [
+                cornerPointUL[1],
+                cornerPointUL[0],
+                cornerPointUR[1],
+                cornerPointUR[0],
+                cornerPointLR[1],
+                cornerPointLR[0],
+                cornerPointLL[1],
+                cornerPointLL[0],
+            ]
+            surface = QgsGeometry.fromPolygonXY(
+                [
                     [
-                        [
-                            QgsPointXY(cornerPointUL[1], cornerPointUL[0]),
-                            QgsPointXY(cornerPointUR[1], cornerPointUR[0]),
-                            QgsPointXY(cornerPointLR[1], cornerPointLR[0]),
-                            QgsPointXY(cornerPointLL[1], cornerPointLL[0]),
-                            QgsPointXY(cornerPointUL[1], cornerPointUL[0]),
-                        ]
+                        QgsPointXY(cornerPointUL[1], cornerPointUL[0]),
+                        QgsPointXY(cornerPointUR[1], cornerPointUR[0]),
+                        QgsPointXY(cornerPointLR[1], cornerPointLR[0]),
+                        QgsPointXY(cornerPointLL[1], cornerPointLL[0]),
+                        QgsPointXY(cornerPointUL[1], cornerPointUL[0]),
                     ]
-                )
+                ]
+            )
+            if footprintLyr.featureCount() == 0:
+                feature = QgsFeature()
+                feature.setAttributes(attributes)
                 feature.setGeometry(surface)
-                footprintLyr.addFeatures([feature])
+                WriteLayerValues(footprintLyr, features=[feature], symbology=styled)
             else:
                 fetId = 1
-                attrib = {
-                    0: cornerPointUL[1],
-                    1: cornerPointUL[0],
-                    2: cornerPointUR[1],
-                    3: cornerPointUR[0],
-                    4: cornerPointLR[1],
-                    5: cornerPointLR[0],
-                    6: cornerPointLL[1],
-                    7: cornerPointLL[0],
-                }
-
-                footprintLyr.dataProvider().changeAttributeValues({fetId: attrib})
-
-                footprintLyr.dataProvider().changeGeometryValues(
-                    {
-                        fetId: QgsGeometry.fromPolygonXY(
-                            [
-                                [
-                                    QgsPointXY(cornerPointUL[1], cornerPointUL[0]),
-                                    QgsPointXY(cornerPointUR[1], cornerPointUR[0]),
-                                    QgsPointXY(cornerPointLR[1], cornerPointLR[0]),
-                                    QgsPointXY(cornerPointLL[1], cornerPointLL[0]),
-                                    QgsPointXY(cornerPointUL[1], cornerPointUL[0]),
-                                ]
-                            ]
-                        )
-                    }
+                WriteLayerValues(
+                    footprintLyr,
+                    attributes={fetId: dict(enumerate(attributes))},
+                    geometries={fetId: surface},
+                    symbology=styled,
                 )
 
-            CommonLayer(footprintLyr)
             # 3D Style
             if ele:
                 SetDefaultFootprint3DStyle(footprintLyr)
@@ -391,7 +442,7 @@ def UpdateBeamsData(
     alt = packet.SensorTrueAltitude
 
     global groupName
-    beamsLyr = selectLayerByName(Beams_lyr, groupName)
+    beamsLyr = VideoLayers().layer(Beams_lyr, groupName)
 
     try:
         if all(
@@ -415,149 +466,41 @@ def UpdateBeamsData(
                 len(cornerPointLL),
             ]
         ):
-            beamsLyr.startEditing()
+            # UL, UR, LR, LL beams are the features 1 to 4
+            corners = [cornerPointUL, cornerPointUR, cornerPointLR, cornerPointLL]
             if beamsLyr.featureCount() == 0:
-
-                # UL
-                featureUL = QgsFeature()
-                featureUL.setAttributes(
-                    [lon, lat, alt, cornerPointUL[1], cornerPointUL[0]]
-                )
-                featureUL.setGeometry(
-                    QgsLineString(
-                        QgsPoint(lon, lat, alt),
-                        QgsPoint(cornerPointUL[1], cornerPointUL[0]),
-                    )
-                )
-                beamsLyr.addFeatures([featureUL])
-                # UR
-                featureUR = QgsFeature()
-                featureUR.setAttributes(
-                    [lon, lat, alt, cornerPointUR[1], cornerPointUR[0]]
-                )
-                featureUR.setGeometry(
-                    QgsLineString(
-                        QgsPoint(lon, lat, alt),
-                        QgsPoint(cornerPointUR[1], cornerPointUR[0]),
-                    )
-                )
-                beamsLyr.addFeatures([featureUR])
-                # LR
-                featureLR = QgsFeature()
-                featureLR.setAttributes(
-                    [lon, lat, alt, cornerPointLR[1], cornerPointLR[0]]
-                )
-                featureLR.setGeometry(
-                    QgsLineString(
-                        QgsPoint(lon, lat, alt),
-                        QgsPoint(cornerPointLR[1], cornerPointLR[0]),
-                    )
-                )
-                beamsLyr.addFeatures([featureLR])
-                # LL
-                featureLL = QgsFeature()
-                featureLL.setAttributes(
-                    [lon, lat, alt, cornerPointLL[1], cornerPointLL[0]]
-                )
-                featureLL.setGeometry(
-                    QgsLineString(
-                        QgsPoint(lon, lat, alt),
-                        QgsPoint(cornerPointLL[1], cornerPointLL[0]),
+                features = []
+                for corner in corners:
+                    feature = QgsFeature()
+                    feature.setAttributes([lon, lat, alt, corner[1], corner[0]])
+                    feature.setGeometry(
+                        QgsLineString(
+                            QgsPoint(lon, lat, alt), QgsPoint(corner[1], corner[0])
+                        )
                     )
-                )
-                beamsLyr.addFeatures([featureLL])
+                    features.append(feature)
+                WriteLayerValues(beamsLyr, features=features)
 
             else:
-                # UL
-                beamsLyr.dataProvider().changeAttributeValues(
-                    {
-                        1: {
-                            0: lon,
-                            1: lat,
-                            2: alt,
-                            3: cornerPointUL[1],
-                            4: cornerPointUL[0],
-                        }
+                attributes = {}
+                geometries = {}
+                for fetId, corner in enumerate(corners, 1):
+                    attributes[fetId] = {
+                        0: lon,
+                        1: lat,
+                        2: alt,
+                        3: corner[1],
+                        4: corner[0],
                     }
-                )
-                beamsLyr.dataProvider().changeGeometryValues(
-                    {
-                        1: QgsGeometry(
-                            QgsLineString(
-                                QgsPoint(lon, lat, alt),
-                                QgsPoint(cornerPointUL[1], cornerPointUL[0]),
-                            )
-                        )
-                    }
-                )
-                # UR
-                beamsLyr.dataProvider().changeAttributeValues(
-                    {
-                        2: {
-                            0: lon,
-                            1: lat,
-                            2: alt,
-                            3: cornerPointUR[1],
-                            4: cornerPointUR[0],
-                        }
-                    }
-                )
-                beamsLyr.dataProvider().changeGeometryValues(
-                    {
-                        2: QgsGeometry(
-                            QgsLineString(
-                                QgsPoint(lon, lat, alt),
-                                QgsPoint(cornerPointUR[1], cornerPointUR[0]),
-                            )
+                    geometries[fetId] = QgsGeometry(
+                        QgsLineString(
+                            QgsPoint(lon, lat, alt), QgsPoint(corner[1], corner[0])
                         )
-                    }
-                )
-                # LR
-                beamsLyr.dataProvider().changeAttributeValues(
-                    {
-                        3: {
-                            0: lon,
-                            1: lat,
-                            2: alt,
-                            3: cornerPointLR[1],
-                            4: cornerPointLR[0],
-                        }
-                    }
-                )
-                beamsLyr.dataProvider().changeGeometryValues(
-                    {
-                        3: QgsGeometry(
-                            QgsLineString(
-                                QgsPoint(lon, lat, alt),
-                                QgsPoint(cornerPointLR[1], cornerPointLR[0]),
-                            )
-                        )
-                    }
-                )
-                # LL
-                beamsLyr.dataProvider().changeAttributeValues(
-                    {
-                        4: {
-                            0: lon,
-                            1: lat,
-                            2: alt,
-                            3: cornerPointLL[1],
-                            4: cornerPointLL[0],
-                        }
-                    }
-                )
-                beamsLyr.dataProvider().changeGeometryValues(
-                    {
-                        4: QgsGeometry(
-                            QgsLineString(
-                                QgsPoint(lon, lat, alt),
-                                QgsPoint(cornerPointLL[1], cornerPointLL[0]),
-                            )
-                        )
-                    }
+                    )
+                WriteLayerValues(
+                    beamsLyr, attributes=attributes, geometries=geometries
                 )
 
-            CommonLayer(beamsLyr)
             # 3D Style
             if ele:
                 SetDefaultBeams3DStyle(beamsLyr)
@@ -569,40 +512,56 @@ def UpdateBeamsData(
         )
 
 
+def _lineGeometry(vertices):
+    """ LineString geometry of (x, y) vertices """
+    return QgsGeometry(QgsLineString([QgsPoint(x, y) for x, y in vertices]))
+
+
 def UpdateTrajectoryData(packet, ele):
     """ Update Trajectory Values """
     lat = packet.SensorLatitude
     lon = packet.SensorLongitude
 
     global groupName
-    trajectoryLyr = selectLayerByName(Trajectory_lyr, groupName)
+    trajectoryLyr = VideoLayers().layer(Trajectory_lyr, groupName)
 
     try:
         if all(v is not None for v in [trajectoryLyr, lat, lon]):
-            trajectoryLyr.startEditing()
-            f = QgsFeature()
-            if trajectoryLyr.featureCount() == 0:
-                f.setAttributes([lon, lat])
-                f.setGeometry(
-                    QgsLineString(QgsPoint(lon, lat), QgsPoint(lon, lat))
+            trajectory = _trajectories.get(trajectoryLyr.id())
+            if trajectory is None:
+                trajectory = _trajectories[trajectoryLyr.id()] = TrajectoryBuffer(
+                    trajectory_chunk_size, trajectory_min_interval, trajectory_tolerance
                 )
-                trajectoryLyr.addFeatures([f])
-
+            if not trajectory.append(lon, lat, _packetSeconds(packet)):
+                return
+
+            # Vertices are appended to the geometry of the current chunk,
+            # it is only rebuilt when the chunk starts or is full
+            fid = trajectory.fid
+            full = trajectory.isFull()
+            if full:
+                geometry = _lineGeometry(trajectory.closed())
+            elif trajectory.geometry is None or len(trajectory.points) <= 2:
+                geometry = _lineGeometry(trajectory.vertices())
+                trajectory.geometry = geometry
             else:
-                f_last = trajectoryLyr.getFeature(trajectoryLyr.featureCount())
+                geometry = trajectory.geometry
+                geometry.get().addVertex(QgsPoint(lon, lat))
+
+            if fid is None:
+                f = QgsFeature()
                 f.setAttributes([lon, lat])
-                f.setGeometry(
-                    QgsLineString(
-                        QgsPoint(lon, lat),
-                        QgsPoint(
-                            f_last.attribute(0),
-                            f_last.attribute(1),
-                        ),
-                    )
+                f.setGeometry(geometry)
+                added = WriteLayerValues(trajectoryLyr, features=[f])
+                if not full and added:
+                    trajectory.fid = added[0].id()
+            else:
+                WriteLayerValues(
+                    trajectoryLyr,
+                    attributes={fid: {0: lon, 1: lat}},
+                    geometries={fid: geometry},
                 )
-                trajectoryLyr.addFeatures([f])
 
-            CommonLayer(trajectoryLyr)
             # 3D Style
             if ele:
                 SetDefaultTrajectory3DStyle(trajectoryLyr)
@@ -627,39 +586,32 @@ def UpdateFrameAxisData(imgSS, sensor, framecenter, ele):
     fc_lon = framecenter[1]
     fc_alt = framecenter[2]
 
-    frameaxisLyr = selectLayerByName(FrameAxis_lyr, groupName)
+    frameaxisLyr = VideoLayers().layer(FrameAxis_lyr, groupName)
 
     try:
         if all(v is not None for v in [frameaxisLyr, lat, lon, alt, fc_lat, fc_lon]):
-            if imgSS != crtSensorSrc2:
+            styled = imgSS != crtSensorSrc2
+            if styled:
                 SetDefaultFrameAxisStyle(frameaxisLyr, imgSS)
                 crtSensorSrc2 = imgSS
-            frameaxisLyr.startEditing()
+            axis = QgsLineString(
+                QgsPoint(lon, lat, alt), QgsPoint(fc_lon, fc_lat, fc_alt)
+            )
             if frameaxisLyr.featureCount() == 0:
                 f = QgsFeature()
                 f.setAttributes([lon, lat, alt, fc_lon, fc_lat, fc_alt])
-                f.setGeometry(
-                    QgsLineString(
-                        QgsPoint(lon, lat, alt), QgsPoint(fc_lon, fc_lat, fc_alt)
-                    )
-                )
-                frameaxisLyr.addFeatures([f])
+                f.setGeometry(axis)
+                WriteLayerValues(frameaxisLyr, features=[f], symbology=styled)
             else:
-                frameaxisLyr.dataProvider().changeAttributeValues(
-                    {1: {0: lon, 1: lat, 2: alt, 3: fc_lon, 4: fc_lat, 5: fc_alt}}
-                )
-                frameaxisLyr.dataProvider().changeGeometryValues(
-                    {
-                        1: QgsGeometry(
-                            QgsLineString(
-                                QgsPoint(lon, lat, alt),
-                                QgsPoint(fc_lon, fc_lat, fc_alt),
-                            )
-                        )
-                    }
+                WriteLayerValues(
+                    frameaxisLyr,
+                    attributes={
+                        1: {0: lon, 1: lat, 2: alt, 3: fc_lon, 4: fc_lat, 5: fc_alt}
+                    },
+                    geometries={1: QgsGeometry(axis)},
+                    symbology=styled,
                 )
 
-            CommonLayer(frameaxisLyr)
             # 3D Style
             if ele:
                 SetDefaultFrameAxis3DStyle(frameaxisLyr)
@@ -683,30 +635,25 @@ def UpdateFrameCenterData(packet, ele):
         alt = 0.0
 
     global groupName
-    frameCenterLyr = selectLayerByName(FrameCenter_lyr, groupName)
+    frameCenterLyr = VideoLayers().layer(FrameCenter_lyr, groupName)
 
     try:
         if all(v is not None for v in [frameCenterLyr, lat, lon, alt]):
-            frameCenterLyr.startEditing()
-
             if frameCenterLyr.featureCount() == 0:
                 feature = QgsFeature()
                 feature.setAttributes([lon, lat, alt])
                 p = QgsPointXY()
                 p.set(lon, lat)
                 feature.setGeometry(QgsGeometry.fromPointXY(p))
-                frameCenterLyr.addFeatures([feature])
+                WriteLayerValues(frameCenterLyr, features=[feature])
 
             else:
-                frameCenterLyr.dataProvider().changeAttributeValues(
-                    {1: {0: lon, 1: lat, 2: alt}}
-                )
-
-                frameCenterLyr.dataProvider().changeGeometryValues(
-                    {1: QgsGeometry.fromPointXY(QgsPointXY(lon, lat))}
+                WriteLayerValues(
+                    frameCenterLyr,
+                    attributes={1: {0: lon, 1: lat, 2: alt}},
+                    geometries={1: QgsGeometry.fromPointXY(QgsPointXY(lon, lat))},
                 )
 
-            CommonLayer(frameCenterLyr)
             # 3D Style
             if ele:
                 SetDefaultFrameCenter3DStyle(frameCenterLyr)
@@ -729,33 +676,31 @@ def UpdatePlatformData(packet, ele):
     alt = packet.SensorTrueAltitude
     PlatformHeading = packet.PlatformHeadingAngle
     platformTailNumber = packet.PlatformTailNumber
-    platformLyr = selectLayerByName(Platform_lyr, groupName)
+    platformLyr = VideoLayers().layer(Platform_lyr, groupName)
 
     try:
         if all(v is not None for v in [platformLyr, lat, lon, alt, PlatformHeading]):
-            if platformTailNumber != crtPltTailNum:
+            styled = platformTailNumber != crtPltTailNum
+            if styled:
                 SetDefaultPlatformStyle(platformLyr, platformTailNumber)
                 crtPltTailNum = platformTailNumber
 
-            platformLyr.startEditing()
             platformLyr.renderer().symbol().setAngle(float(PlatformHeading))
 
             if platformLyr.featureCount() == 0:
                 feature = QgsFeature()
                 feature.setAttributes([lon, lat, alt])
                 feature.setGeometry(QgsPoint(lon, lat, alt))
-                platformLyr.addFeatures([feature])
+                WriteLayerValues(platformLyr, features=[feature], symbology=styled)
 
             else:
-                platformLyr.dataProvider().changeAttributeValues(
-                    {1: {0: lon, 1: lat, 2: alt}}
+                WriteLayerValues(
+                    platformLyr,
+                    attributes={1: {0: lon, 1: lat, 2: alt}},
+                    geometries={1: QgsGeometry(QgsPoint(lon, lat, alt))},
+                    symbology=styled,
                 )
 
-                platformLyr.dataProvider().changeGeometryValues(
-                    {1: QgsGeometry(QgsPoint(lon, lat, alt))}
-                )
-
-            CommonLayer(platformLyr)
             # 3D Style
             if ele:
                 SetDefaultPlatform3DStyle(platformLyr)
@@ -776,6 +721,107 @@ def CommonLayer(value):
     iface.layerTreeView().refreshLayerSymbology(value.id())
 
 
+# Layers written during the current frame update, see BeginFrameUpdate
+_frameLayers = None
+
+
+def BeginFrameUpdate():
+    """Start a frame update: the layers written by the Update*Data
+    functions are refreshed once by EndFrameUpdate.
+    """
+    global _frameLayers
+    _frameLayers = {}
+
+
+def EndFrameUpdate():
+    """Ask the refresh coalescer to repaint the layers written during the
+    frame update.
+    """
+    global _frameLayers
+    layers, _frameLayers = _frameLayers, None
+    if not layers:
+        return
+    for layer, symbology in layers.values():
+        refreshCoalescer.request(layer, symbology)
+
+
+class RefreshCoalescer:
+    """Repaint the video layers at most max_rate times per second, whatever
+    the metadata rate. Layers asked for between two repaints are repainted
+    once, the other layers of the canvas keep their cached rendering.
+    """
+
+    def __init__(self, max_rate=max_refresh_rate):
+        self.interval = int(1000 / max_rate) if max_rate > 0 else 0
+        self._pending = {}
+        self._timer = None
+        self._elapsed = None
+
+    def request(self, layer, symbology=False):
+        """ Repaint a layer with the next refresh """
+        self._pending[layer.id()] = self._pending.get(layer.id(), False) or symbology
+        if self._timer is None:
+            # Created on first use, when the Qt application is running
+            self._timer = QTimer()
+            self._timer.setSingleShot(True)
+            self._timer.timeout.connect(self.flush)
+            self._elapsed = QElapsedTimer()
+        if self._timer.isActive():
+            return
+        if self._elapsed.isValid():
+            delay = max(self.interval - self._elapsed.elapsed(), 0)
+        else:
+            delay = 0
+        self._timer.start(delay)
+
+    def flush(self):
+        """ Repaint the pending layers now """
+        pending, self._pending = self._pending, {}
+        for layerId, symbology in pending.items():
+            layer = _layerreg.mapLayer(layerId)
+            # Skip layers removed in the meantime
+            if layer is not None:
+                RefreshLayer(layer, symbology)
+        if self._elapsed is not None:
+            self._elapsed.start()
+
+
+refreshCoalescer = RefreshCoalescer()
+
+
+def RefreshLayer(layer, symbology=False):
+    """ Repaint a layer changed through its data provider """
+    layer.updateExtents()
+    layer.triggerRepaint()
+    if symbology:
+        iface.layerTreeView().refreshLayerSymbology(layer.id())
+
+
+def WriteLayerValues(
+    layer, features=None, attributes=None, geometries=None, symbology=False
+):
+    """Add features and change attribute and geometry values straight
+    through the data provider, without an edit session. The layer is
+    refreshed by EndFrameUpdate during a frame update, else right away.
+    Return the added features, with their ids.
+    """
+    provider = layer.dataProvider()
+    added = []
+    if features:
+        _, added = provider.addFeatures(features)
+    if attributes:
+        provider.changeAttributeValues(attributes)
+    if geometries:
+        provider.changeGeometryValues(geometries)
+
+    if _frameLayers is None:
+        RefreshLayer(layer, symbology)
+    else:
+        _, pending = _frameLayers.get(layer.id(), (layer, False))
+        _frameLayers[layer.id()] = (layer, pending or symbology)
+    return added
+
+
 def CreateGroupByName(name=frames_g):
     """ Create Group if not exist """
     global groupName
@@ -806,7 +852,7 @@ def CreateVideoLayers(ele, name):
     global groupName
     groupName = name
 
-    if selectLayerByName(Footprint_lyr, groupName) is None:
+    if VideoLayers().layer(Footprint_lyr, groupName) is None:
         lyr_footprint = newPolygonsLayer(
             None,
             [
@@ -824,14 +870,16 @@ def CreateVideoLayers(ele, name):
         )
         SetDefaultFootprintStyle(lyr_footprint)
         addLayerNoCrsDialog(lyr_footprint, group=groupName)
+        VideoLayers().register(lyr_footprint, groupName)
 
 
-    if selectLayerByName(Platform_lyr, groupName) is None:
+    if VideoLayers().layer(Platform_lyr, groupName) is None:
         lyr_platform = newPointsLayer(
             None, ["longitude", "latitude", "altitude"], epsg, Platform_lyr, PointZ
         )
         SetDefaultPlatformStyle(lyr_platform)
         addLayerNoCrsDialog(lyr_platform, group=groupName)
+        VideoLayers().register(lyr_platform, groupName)
 
     QApplication.processEvents()
 
@@ -998,13 +1046,6 @@ def addLayerNoCrsDialog(layer, loadInLegend=True, group=None, isSubGroup=False):
     return layer
 
 
-def _toQgsField(f):
-    """ Create QgsFiel """
-    if isinstance(f, QgsField):
-        return f
-    return QgsField(f[0], TYPE_MAP.get(f[1], QVariant.String))
-
-
 def newPointsLayer(
     filename, fields, crs, name=None, geometryType=Point, encoding=encoding
 ):
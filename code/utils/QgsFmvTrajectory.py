@@ -0,0 +1,104 @@
+"""
+In-memory trajectory of a video.
+
+The trajectory is drawn as a few long LineStrings (chunks) instead of one
+two point feature per packet. Only the vertices of the chunk being drawn
+are kept in memory; closed chunks can be simplified for display.
+"""
+
+try:
+    from pydevd import *
+except ImportError:
+    None
+
+
+def _distance(point, start, end):
+    """ Distance from point to the segment start - end """
+    x, y = point
+    x1, y1 = start
+    x2, y2 = end
+    dx = x2 - x1
+    dy = y2 - y1
+    if dx == 0 and dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    t = max(0.0, min(1.0, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
+
+
+def simplifyLine(points, tolerance):
+    """Douglas-Peucker simplification of a list of (x, y) vertices.
+    The first and last vertices are always kept.
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index = None
+        farthest = tolerance
+        for i in range(first + 1, last):
+            d = _distance(points[i], points[first], points[last])
+            if d > farthest:
+                index = i
+                farthest = d
+        if index is not None:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+class TrajectoryBuffer:
+    """Vertices of the trajectory chunk being drawn.
+
+    A vertex closer in time than min_interval milliseconds to the previous
+    one is skipped. Once the chunk holds chunk_size vertices it is full:
+    closed() returns its simplified vertices and a new chunk starts at its
+    last vertex, so the trajectory has no gaps.
+    """
+
+    def __init__(self, chunk_size=1000, min_interval=0, tolerance=0.0):
+        self.chunk_size = max(int(chunk_size), 2)
+        self.min_interval = min_interval
+        self.tolerance = tolerance
+        self.points = []
+        # Feature of the chunk in the trajectory layer and its geometry
+        self.fid = None
+        self.geometry = None
+        self._last_time = None
+
+    def append(self, x, y, t=None):
+        """Add a vertex, t in seconds. Return False if it was skipped."""
+        if (
+            t is not None
+            and self._last_time is not None
+            and self.points
+            and (t - self._last_time) * 1000.0 < self.min_interval
+        ):
+            return False
+        if self.points and self.points[-1] == (x, y):
+            return False
+        if t is not None:
+            self._last_time = t
+        self.points.append((x, y))
+        return True
+
+    def isFull(self):
+        return len(self.points) >= self.chunk_size
+
+    def vertices(self):
+        """ Vertices of the chunk, at least two """
+        if len(self.points) == 1:
+            return self.points * 2
+        return list(self.points)
+
+    def closed(self):
+        """Simplified vertices of the full chunk, then start the next one."""
+        points = simplifyLine(self.vertices(), self.tolerance)
+        self.points = self.points[-1:]
+        self.fid = None
+        self.geometry = None
+        return points
@@ -1,18 +1,17 @@
 import numpy as np
 from cv2 import COLOR_BGR2RGB, cvtColor, COLOR_GRAY2RGB, findHomography
+import hashlib
 import inspect
 import json
 from math import sin, atan, tan, sqrt, radians, pi, degrees
 import os
 import shutil
-from qgis.PyQt.QtCore import QSettings, QUrl, QEventLoop, QCoreApplication, Qt
+from qgis.PyQt.QtCore import QSettings, QCoreApplication, Qt
 from qgis.PyQt.QtGui import QImage, QPainter
-from qgis.PyQt.QtNetwork import QNetworkRequest
 from qgis.PyQt.QtWidgets import QFileDialog
 from qgis.core import (
     QgsApplication,
     QgsRectangle,
-    QgsNetworkAccessManager,
     QgsTask,
     QgsRasterLayer,
     QgsProject,
@@ -31,8 +30,11 @@ from QGIS_FMV.QgsFmvConstants import WGS84String
 from QGIS_FMV.geo import QgsGeoUtils
 from QGIS_FMV.klvdata.element import UnknownElement
 from QGIS_FMV.klvdata.streamparser import StreamParser
+from QGIS_FMV.utils.QgsFmvGeocode import fetchPlaceName, geocodeCache
 from QGIS_FMV.utils.QgsFmvLayers import (
     addLayerNoCrsDialog,
+    BeginFrameUpdate,
+    EndFrameUpdate,
     ExpandLayer,
     UpdateFootPrintData,
     UpdateTrajectoryData,
@@ -42,13 +44,12 @@ from QGIS_FMV.utils.QgsFmvLayers import (
     UpdateFrameAxisData,
     SetcrtSensorSrc,
     SetcrtPltTailNum,
-    selectLayerByName,
+    VideoLayers,
 )
 from QGIS_FMV.utils.QgsUtils import QgsUtils as qgsu
 from QGIS_FMV.QgsFmvConstants import (
     isWindows,
     frames_g,
-    Reverse_geocoding_url,
     min_buffer_size,
     Platform_lyr,
     Footprint_lyr,
@@ -57,8 +58,6 @@ from QGIS_FMV.QgsFmvConstants import (
     ffmpegConf,
     ffmpeg_path,
     ffprobe_path,
-    UASLocalMetadataSet,
-    KlvHeaderKeyOther,
     defaultTargetWidth,
 )
 
@@ -79,6 +78,8 @@ dtm_rowLowerBound = 0
 
 _settings = {}
 
+_fingerprints = {}
+
 
 def AddVideoToSettings(row_id, path):
     """ Add video to settings list """
@@ -115,6 +116,53 @@ def getVideoFolder(video_file):
     return os.path.join(homefmv, root)
 
 
+def getVideoFingerprint(video_file):
+    """ Get video identity from size, modification time and first MB hash """
+    st = os.stat(video_file)
+    key = (video_file, st.st_size, st.st_mtime)
+    if key not in _fingerprints:
+        with open(video_file, "rb") as f:
+            digest = hashlib.sha1(f.read(1024 * 1024)).hexdigest()
+        _fingerprints[key] = "%d_%d_%s" % (st.st_size, int(st.st_mtime), digest[:16])
+    return _fingerprints[key]
+
+
+def getVideoCacheFolder(video_file):
+    """ Get or create Video cache folder, shared by all copies of a video """
+    home = os.path.expanduser("~")
+    homefmv = os.path.join(home, "QGIS_FMV")
+    qgsu.createFolderByName(homefmv, ".cache")
+
+    fingerprint = getVideoFingerprint(video_file)
+    cache = os.path.join(homefmv, ".cache")
+    qgsu.createFolderByName(cache, fingerprint)
+    return os.path.join(cache, fingerprint)
+
+
+def getVideoCacheInfo(video_file):
+    """ Get cached info (klv stream index, start location) of a video """
+    try:
+        path = os.path.join(getVideoCacheFolder(video_file), "info.json")
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def SetVideoCacheInfo(video_file, **values):
+    """ Add values to the cached info of a video """
+    info = getVideoCacheInfo(video_file)
+    info.update(values)
+    try:
+        path = os.path.join(getVideoCacheFolder(video_file), "info.json")
+        with open(path, "w") as f:
+            json.dump(info, f)
+    except OSError:
+        qgsu.showUserAndLogMessage(
+            "", "Video cache info could not be saved.", onlyLog=True
+        )
+
+
 def RemoveVideoFolder(filename):
     """ Remove video temporal folder if exist """
     videoFile, _ = os.path.splitext(filename)
@@ -141,56 +189,52 @@ def setCenterMode(mode, interface):
 
 
 def getKlvStreamIndex(videoPath, islocal=False):
-    if islocal:
-        return 0
-    # search for klv data in 5 streams
-    for i in range(6):
-        p = _spawn(
-            [
-                "-i",
-                videoPath,
-                "-ss",
-                "00:00:00",
-                "-to",
-                "00:00:01",
-                "-map",
-                "0:d:" + str(i),
-                "-f",
-                "data",
-                "-",
-            ]
-        )
+    """ Get the number of the KLV data stream of a video """
+    return probeKlvStreamData(videoPath, islocal)[0]
 
-        stdout_data, _ = p.communicate()
 
-        if stdout_data == b"":
-            continue
-        else:
-            # look if stream has valid klv data
-            if UASLocalMetadataSet in stdout_data or KlvHeaderKeyOther in stdout_data:
-                return i
-            else:
-                qgsu.showUserAndLogMessage(
-                    "", "skipping stream " + str(i) + " not a klv stream.", onlyLog=True
-                )
-                continue
+def probeKlvStreamData(videoPath, islocal=False):
+    """Get the number of the KLV data stream of a video and the KLV bytes
+    of its first second, read by the same ffprobe pass.
+    """
+    if islocal:
+        return 0, None
+    # Local import, the KLV index module uses these utils
+    from QGIS_FMV.klvdata.QgsFmvKlvIndex import probeKlvStream
+
+    found = probeKlvStream(videoPath)
+    if found is not None:
+        return found
 
     qgsu.showUserAndLogMessage(
         "Error interpreting klv data, metadata cannot be read.",
         "the parser did not recognize KLV data",
         level=QGis.Warning,
     )
-    return 0
+    return 0, None
 
 
-def getVideoLocationInfo(videoPath, islocal=False, klv_folder=None, klv_index=0):
-    """ Get basic location info about the video """
+def getVideoLocationInfo(
+    videoPath,
+    islocal=False,
+    klv_folder=None,
+    klv_index=0,
+    klv_data=None,
+    online=True,
+):
+    """Get basic location info about the video.
+    klv_data is the KLV of the first second when it is already known (see
+    probeKlvStreamData), so the video is not decoded again. If not online
+    the place name is only looked up in the geocode cache.
+    """
     location = []
     try:
         if islocal:
             dataFile = os.path.join(klv_folder, "0.0.klv")
             f = open(dataFile, "rb")
             stdout_data = f.read()
+        elif klv_data is not None:
+            stdout_data = klv_data
         else:
             p = _spawn(
                 [
@@ -228,38 +272,7 @@ def getVideoLocationInfo(videoPath, islocal=False, klv_folder=None, klv_index=0)
             if centerLat is None and centerLon is None:
                 centerLat = packet.SensorLatitude
                 centerLon = packet.SensorLongitude
-            loc = "-"
-
-            if Reverse_geocoding_url != "":
-                try:
-                    url = QUrl(
-                        Reverse_geocoding_url.format(str(centerLat), str(centerLon))
-                    )
-                    request = QNetworkRequest(url)
-                    reply = QgsNetworkAccessManager.instance().get(request)
-                    loop = QEventLoop()
-                    reply.finished.connect(loop.quit)
-                    loop.exec_()
-                    reply.finished.disconnect(loop.quit)
-                    loop = None
-                    result = reply.readAll()
-                    data = json.loads(result.data())
-
-                    if "village" in data["address"] and "state" in data["address"]:
-                        loc = (
-                            data["address"]["village"] + ", " + data["address"]["state"]
-                        )
-                    elif "town" in data["address"] and "state" in data["address"]:
-                        loc = data["address"]["town"] + ", " + data["address"]["state"]
-                    else:
-                        loc = data["display_name"]
-
-                except Exception:
-                    qgsu.showUserAndLogMessage(
-                        "",
-                        "getVideoLocationInfo: failed to get address from reverse geocoding service.",
-                        onlyLog=True,
-                    )
+            loc = getLocationName(centerLat, centerLon, online)
 
             location = [centerLat, centerLon, loc]
 
@@ -292,6 +305,19 @@ def getVideoLocationInfo(videoPath, islocal=False, klv_folder=None, klv_index=0)
     return location
 
 
+def getLocationName(lat, lon, online=True):
+    """Get the place name of a location, "-" if unknown.
+    Blocking, only the geocode cache is looked up if not online.
+    """
+    if lat is None or lon is None:
+        return "-"
+    if online:
+        name = fetchPlaceName(lat, lon)
+    else:
+        name = geocodeCache().get(lat, lon)
+    return "-" if name is None else name
+
+
 def pluginSetting(name, namespace=None, typ=None):
     def _find_in_cache(name, key):
         """ Find key in QGIS settings """
@@ -430,8 +456,12 @@ def SetGCPsToGeoTransform(
     frameCenterLon,
     frameCenterLat,
     ele,
+    homography=None,
 ):
-    """ Make Geotranform from pixel to lon lat coordinates """
+    """Make Geotranform from pixel to lon lat coordinates.
+    The pixel to [lat, lon] homography is computed from the corners unless
+    it is given.
+    """
     gcps = []
     gv.setCornerUL(cornerPointUL)
     gv.setCornerUR(cornerPointUR)
@@ -497,8 +527,10 @@ def SetGCPsToGeoTransform(
         )
     )
 
+    geotransform = homography
     try:
-        geotransform, _ = findHomography(src, dst)
+        if geotransform is None:
+            geotransform, _ = findHomography(src, dst)
         gv.setTransform(geotransform)
     except Exception:
         pass
@@ -614,8 +646,20 @@ def ResetData():
     SetcrtSensorSrc()
     SetcrtPltTailNum()
 
-def UpdateLayers(packet, parent=None, mosaic=False, group=None):
-    """ Update Layers Values """
+def UpdateLayers(packet, parent=None, mosaic=False, group=None, footprint=True):
+    """Update Layers Values.
+    All the layer changes of the packet are written in a single frame update.
+    Without footprint, the footprint, beams, frame center and geotransform
+    are left to UpdateFootprintSample.
+    """
+    BeginFrameUpdate()
+    try:
+        return _UpdateLayers(packet, parent, mosaic, group, footprint)
+    finally:
+        EndFrameUpdate()
+
+
+def _UpdateLayers(packet, parent, mosaic, group, footprint):
     gv.setGroupName(group)
     groupName = group
     gv.setFrameCenterElevation(packet.FrameCenterElevation)
@@ -655,7 +699,11 @@ def UpdateLayers(packet, parent=None, mosaic=False, group=None):
 
     # qgsu.showUserAndLogMessage("", "FC Alt:"+str(frameCenterPoint[2]), onlyLog=True)
 
-    if OffsetLat1 is not None and LatitudePoint1Full is None:
+    if not footprint:
+        if mosaic:
+            georeferencingVideo(parent)
+
+    elif OffsetLat1 is not None and LatitudePoint1Full is None:
         CornerEstimationWithOffsets(packet)
         if mosaic:
             georeferencingVideo(parent)
@@ -727,14 +775,15 @@ def UpdateLayers(packet, parent=None, mosaic=False, group=None):
         if mosaic:
             georeferencingVideo(parent)
 
-    UpdateFrameCenterData(frameCenterPoint, False)
+    if footprint:
+        UpdateFrameCenterData(frameCenterPoint, False)
     UpdateFrameAxisData(
         packet.ImageSourceSensor, GetSensor(), frameCenterPoint, False
     )
 
     # detect if we need a recenter or not. If Footprint and Platform fits in
     # 80% of the map, do not trigger recenter.
-    p_lyr = selectLayerByName(Platform_lyr, groupName)
+    p_lyr = VideoLayers().layer(Platform_lyr, groupName)
 
     iface = gv.getIface()
     centerMode = gv.getCenterMode()
@@ -774,12 +823,33 @@ def UpdateLayers(packet, parent=None, mosaic=False, group=None):
         if not map_detec_buffer.contains(p_lyr_out_extent) and centerMode == 1:
             iface.mapCanvas().setExtent(p_lyr_out_extent)
 
-        # Refresh Canvas
-        iface.mapCanvas().refresh()
-
         return True
 
 
+def UpdateFootprintSample(sample, group=None):
+    """Update the footprint, beams and frame center layers and the frame
+    geotransform from an interpolated FootprintSample, without decoding
+    any packet.
+    """
+    gv.setGroupName(group)
+    corners = sample.corners.tolist()
+    lat, lon, alt = sample.frameCenter.tolist()
+    gv.setFrameCenterElevation(alt)
+
+    width = GetImageWidth()
+    height = GetImageHeight()
+    homography = sample.transform(width, height) if width and height else None
+
+    BeginFrameUpdate()
+    try:
+        UpdateFootPrintData(sample, *corners, False)
+        UpdateBeamsData(sample, *corners, False)
+        UpdateFrameCenterData([lat, lon, alt], False)
+        SetGCPsToGeoTransform(*corners, lon, lat, False, homography=homography)
+    finally:
+        EndFrameUpdate()
+
+
 def georeferencingVideo(parent):
     """Extract Current Frame Thread
     :param packet: Parent class
@@ -873,23 +943,11 @@ def CornerEstimationWithOffsets(packet):
     :param packet: Metada packet
     """
     try:
-
-        OffsetLat1 = packet.OffsetCornerLatitudePoint1
-        OffsetLon1 = packet.OffsetCornerLongitudePoint1
-        OffsetLat2 = packet.OffsetCornerLatitudePoint2
-        OffsetLon2 = packet.OffsetCornerLongitudePoint2
-        OffsetLat3 = packet.OffsetCornerLatitudePoint3
-        OffsetLon3 = packet.OffsetCornerLongitudePoint3
-        OffsetLat4 = packet.OffsetCornerLatitudePoint4
-        OffsetLon4 = packet.OffsetCornerLongitudePoint4
-        frameCenterLat = packet.FrameCenterLatitude
-        frameCenterLon = packet.FrameCenterLongitude
-
+        corners = ComputeCornersWithOffsets(packet)
+        if corners is None:
+            return False
         # Lat,Lon
-        cornerPointUL = (OffsetLat1 + frameCenterLat, OffsetLon1 + frameCenterLon)
-        cornerPointUR = (OffsetLat2 + frameCenterLat, OffsetLon2 + frameCenterLon)
-        cornerPointLR = (OffsetLat3 + frameCenterLat, OffsetLon3 + frameCenterLon)
-        cornerPointLL = (OffsetLat4 + frameCenterLat, OffsetLon4 + frameCenterLon)
+        cornerPointUL, cornerPointUR, cornerPointLR, cornerPointLL = corners
 
         frameCenterPoint = [
             packet.FrameCenterLatitude,
@@ -969,117 +1027,29 @@ def CornerEstimationWithoutOffsets(
             targetWidth = others[2]
             slantRange = others[3]
 
-        # If target width = 0 (occurs on some platforms), compute it with the slate range.
-        # Otherwise it leaves the footprint as a point.
-        # In some case targetWidth don't have value then equal to 0
-        if targetWidth is None:
-            targetWidth = 0
-        if slantRange is None:
-            slantRange = 0
-        if targetWidth == 0 and slantRange != 0:
-            targetWidth = 2.0 * slantRange * tan(radians(sensorHorizontalFOV / 2.0))
-        elif targetWidth == 0 and slantRange == 0:
-            # default target width to not leave footprint as a point.
-            targetWidth = defaultTargetWidth
-        #             qgsu.showUserAndLogMessage(QCoreApplication.translate(
-        #                 "QgsFmvUtils", "Target width unknown, defaults to: " + str(targetWidth) + "m."))
-
-        # compute distance to ground
-        if (
-            frameCenterElevation != 0
-            and sensorTrueAltitude is not None
-            and frameCenterElevation is not None
-        ):
-            sensorGroundAltitude = sensorTrueAltitude - frameCenterElevation
-        elif frameCenterElevation == 0 and sensorTrueAltitude is not None:
-            sensorGroundAltitude = sensorTrueAltitude
-        else:
-            # can't compute footprint without sensorGroundAltitude
-            return False
-
-        if sensorLatitude == 0:
-            return False
-
-        if sensorLongitude is None or sensorLatitude is None:
-            return False
-
-        if frameCenterLon is None or frameCenterLat is None:
-            return False
-
-        initialPoint = QgsPointXY(sensorLongitude, sensorLatitude)
-        destPoint = QgsPointXY(frameCenterLon, frameCenterLat)
-
-        da = QgsDistanceArea()
-        da.setEllipsoid(WGS84String)
-        distance = da.measureLine(initialPoint, destPoint)
-
-        if distance == 0:
-            return False
-
-        if sensorVerticalFOV > 0 and sensorHorizontalFOV > sensorVerticalFOV:
-            aspectRatio = sensorVerticalFOV / sensorHorizontalFOV
-
-        else:
-            aspectRatio = 0.75
-
-        value2 = (headingAngle + sensorRelativeAzimut) % 360.0  # Heading
-        value3 = targetWidth / 2.0
-
-        value5 = sqrt(pow(distance, 2.0) + pow(sensorGroundAltitude, 2.0))
-        value6 = targetWidth * aspectRatio / 2.0
-
-        degrees_value = degrees(atan(value3 / distance))
-
-        value8 = degrees(atan(distance / sensorGroundAltitude))
-        value9 = degrees(atan(value6 / value5))
-        value10 = value8 + value9
-        value11 = sensorGroundAltitude * tan(radians(value10))
-        value12 = value8 - value9
-        value13 = sensorGroundAltitude * tan(radians(value12))
-        value14 = distance - value13
-        value15 = value11 - distance
-        value16 = value3 - value14 * tan(radians(degrees_value))
-        value17 = value3 + value15 * tan(radians(degrees_value))
-        distance2 = sqrt(pow(value14, 2.0) + pow(value16, 2.0))
-        value19 = sqrt(pow(value15, 2.0) + pow(value17, 2.0))
-        value20 = degrees(atan(value16 / value14))
-        value21 = degrees(atan(value17 / value15))
-
-        # CP Up Left
-        bearing = (value2 + 360.0 - value21) % 360.0
-        cornerPointUL = list(
-            reversed(QgsGeoUtils.destination(destPoint, value19, bearing))
-        )
-
-        # CP Up Right
-        bearing = (value2 + value21) % 360.0
-        cornerPointUR = list(
-            reversed(QgsGeoUtils.destination(destPoint, value19, bearing))
-        )
-
-        # CP Low Right
-        bearing = (value2 + 180.0 - value20) % 360.0
-        cornerPointLR = list(
-            reversed(QgsGeoUtils.destination(destPoint, distance2, bearing))
+        corners = ComputeCornersWithoutOffsets(
+            sensorLatitude,
+            sensorLongitude,
+            sensorTrueAltitude,
+            frameCenterLat,
+            frameCenterLon,
+            frameCenterElevation,
+            sensorVerticalFOV,
+            sensorHorizontalFOV,
+            headingAngle,
+            sensorRelativeAzimut,
+            targetWidth,
+            slantRange,
         )
+        if corners is None:
+            return False
 
-        # CP Low Left
-        bearing = (value2 + 180.0 + value20) % 360.0
-        cornerPointLL = list(
-            reversed(QgsGeoUtils.destination(destPoint, distance2, bearing))
-        )
+        if sensor is not None:
+            return corners
 
+        cornerPointUL, cornerPointUR, cornerPointLR, cornerPointLL = corners
         frameCenterPoint = [frameCenterLat, frameCenterLon, frameCenterElevation]
 
-        # If no frame center (f.i. horizontal target) don't compute footprint,
-        # beams and frame center
-        if frameCenterPoint[0] is None and frameCenterPoint[1] is None:
-            gv.setTransform(None)
-            return True
-
-        if sensor is not None:
-            return cornerPointUL, cornerPointUR, cornerPointLR, cornerPointLL
-
         UpdateFootPrintData(
             packet,
             cornerPointUL,
@@ -1120,6 +1090,189 @@ def CornerEstimationWithoutOffsets(
     return True
 
 
+def ComputeCornersWithOffsets(packet):
+    """Footprint corners (lat, lon) of a packet from the frame center and
+    the corner offsets, None if a value is missing
+    """
+    frameCenterLat = packet.FrameCenterLatitude
+    frameCenterLon = packet.FrameCenterLongitude
+    offsets = [
+        packet.OffsetCornerLatitudePoint1,
+        packet.OffsetCornerLongitudePoint1,
+        packet.OffsetCornerLatitudePoint2,
+        packet.OffsetCornerLongitudePoint2,
+        packet.OffsetCornerLatitudePoint3,
+        packet.OffsetCornerLongitudePoint3,
+        packet.OffsetCornerLatitudePoint4,
+        packet.OffsetCornerLongitudePoint4,
+    ]
+    if None in offsets or frameCenterLat is None or frameCenterLon is None:
+        return None
+    return tuple(
+        (offsets[i] + frameCenterLat, offsets[i + 1] + frameCenterLon)
+        for i in range(0, 8, 2)
+    )
+
+
+def ComputeCornersWithoutOffsets(
+    sensorLatitude,
+    sensorLongitude,
+    sensorTrueAltitude,
+    frameCenterLat,
+    frameCenterLon,
+    frameCenterElevation,
+    sensorVerticalFOV,
+    sensorHorizontalFOV,
+    headingAngle,
+    sensorRelativeAzimut,
+    targetWidth,
+    slantRange,
+):
+    """Footprint corners (UL, UR, LR, LL as [lat, lon]) estimated from the
+    sensor position and field of view, None if they can't be computed.
+    Doesn't touch any layer or global state.
+    """
+    # If target width = 0 (occurs on some platforms), compute it with the slate range.
+    # Otherwise it leaves the footprint as a point.
+    # In some case targetWidth don't have value then equal to 0
+    if targetWidth is None:
+        targetWidth = 0
+    if slantRange is None:
+        slantRange = 0
+    if targetWidth == 0 and slantRange != 0:
+        targetWidth = 2.0 * slantRange * tan(radians(sensorHorizontalFOV / 2.0))
+    elif targetWidth == 0 and slantRange == 0:
+        # default target width to not leave footprint as a point.
+        targetWidth = defaultTargetWidth
+    #             qgsu.showUserAndLogMessage(QCoreApplication.translate(
+    #                 "QgsFmvUtils", "Target width unknown, defaults to: " + str(targetWidth) + "m."))
+
+    # compute distance to ground
+    if (
+        frameCenterElevation != 0
+        and sensorTrueAltitude is not None
+        and frameCenterElevation is not None
+    ):
+        sensorGroundAltitude = sensorTrueAltitude - frameCenterElevation
+    elif frameCenterElevation == 0 and sensorTrueAltitude is not None:
+        sensorGroundAltitude = sensorTrueAltitude
+    else:
+        # can't compute footprint without sensorGroundAltitude
+        return None
+
+    if sensorLatitude == 0:
+        return None
+
+    if sensorLongitude is None or sensorLatitude is None:
+        return None
+
+    if frameCenterLon is None or frameCenterLat is None:
+        return None
+
+    initialPoint = QgsPointXY(sensorLongitude, sensorLatitude)
+    destPoint = QgsPointXY(frameCenterLon, frameCenterLat)
+
+    da = QgsDistanceArea()
+    da.setEllipsoid(WGS84String)
+    distance = da.measureLine(initialPoint, destPoint)
+
+    if distance == 0:
+        return None
+
+    if sensorVerticalFOV > 0 and sensorHorizontalFOV > sensorVerticalFOV:
+        aspectRatio = sensorVerticalFOV / sensorHorizontalFOV
+
+    else:
+        aspectRatio = 0.75
+
+    value2 = (headingAngle + sensorRelativeAzimut) % 360.0  # Heading
+    value3 = targetWidth / 2.0
+
+    value5 = sqrt(pow(distance, 2.0) + pow(sensorGroundAltitude, 2.0))
+    value6 = targetWidth * aspectRatio / 2.0
+
+    degrees_value = degrees(atan(value3 / distance))
+
+    value8 = degrees(atan(distance / sensorGroundAltitude))
+    value9 = degrees(atan(value6 / value5))
+    value10 = value8 + value9
+    value11 = sensorGroundAltitude * tan(radians(value10))
+    value12 = value8 - value9
+    value13 = sensorGroundAltitude * tan(radians(value12))
+    value14 = distance - value13
+    value15 = value11 - distance
+    value16 = value3 - value14 * tan(radians(degrees_value))
+    value17 = value3 + value15 * tan(radians(degrees_value))
+    distance2 = sqrt(pow(value14, 2.0) + pow(value16, 2.0))
+    value19 = sqrt(pow(value15, 2.0) + pow(value17, 2.0))
+    value20 = degrees(atan(value16 / value14))
+    value21 = degrees(atan(value17 / value15))
+
+    # CP Up Left
+    bearing = (value2 + 360.0 - value21) % 360.0
+    cornerPointUL = list(
+        reversed(QgsGeoUtils.destination(destPoint, value19, bearing))
+    )
+
+    # CP Up Right
+    bearing = (value2 + value21) % 360.0
+    cornerPointUR = list(
+        reversed(QgsGeoUtils.destination(destPoint, value19, bearing))
+    )
+
+    # CP Low Right
+    bearing = (value2 + 180.0 - value20) % 360.0
+    cornerPointLR = list(
+        reversed(QgsGeoUtils.destination(destPoint, distance2, bearing))
+    )
+
+    # CP Low Left
+    bearing = (value2 + 180.0 + value20) % 360.0
+    cornerPointLL = list(
+        reversed(QgsGeoUtils.destination(destPoint, distance2, bearing))
+    )
+
+    return cornerPointUL, cornerPointUR, cornerPointLR, cornerPointLL
+
+
+def ComputePacketCorners(packet):
+    """Footprint corners of a packet the same way UpdateLayers does:
+    full corners, frame center offsets or estimation from the sensor.
+    None if they can't be computed.
+    """
+    if (
+        packet.OffsetCornerLatitudePoint1 is not None
+        and packet.CornerLatitudePoint1Full is None
+    ):
+        return ComputeCornersWithOffsets(packet)
+
+    if packet.CornerLatitudePoint1Full is None:
+        return ComputeCornersWithoutOffsets(
+            packet.SensorLatitude,
+            packet.SensorLongitude,
+            packet.SensorTrueAltitude,
+            packet.FrameCenterLatitude,
+            packet.FrameCenterLongitude,
+            packet.FrameCenterElevation,
+            packet.SensorVerticalFieldOfView,
+            packet.SensorHorizontalFieldOfView,
+            packet.PlatformHeadingAngle,
+            packet.SensorRelativeAzimuthAngle,
+            packet.targetWidth,
+            packet.SlantRange,
+        )
+
+    corners = (
+        [packet.CornerLatitudePoint1Full, packet.CornerLongitudePoint1Full],
+        [packet.CornerLatitudePoint2Full, packet.CornerLongitudePoint2Full],
+        [packet.CornerLatitudePoint3Full, packet.CornerLongitudePoint3Full],
+        [packet.CornerLatitudePoint4Full, packet.CornerLongitudePoint4Full],
+    )
+    if any(None in corner for corner in corners):
+        return None
+    return corners
+
+
 def GetDemAltAt(lon, lat):
     """ Obtain height for Point,intersecting with DEM """
     alt = 0
@@ -4,7 +4,7 @@ from qgis.PyQt.QtWidgets import QMessageBox, QSpacerItem, QSizePolicy
 from QGIS_FMV.utils.QgsFmvLog import log
 from qgis.core import Qgis as QGis
 from qgis.utils import iface
-from qgis.PyQt.QtCore import QSettings, Qt
+from qgis.PyQt.QtCore import QCoreApplication, QSettings, QThread, Qt
 from datetime import datetime
 
 try:
@@ -91,6 +91,16 @@ class QgsUtils(object):
 
         return secs
 
+    @staticmethod
+    def _time_to_milliseconds(dateStr):
+        """
+        Time to integer milliseconds, without datetime parsing
+        @type dateStr: String
+        @param dateStr: "HH:MM:SS.ffff" time string value
+        """
+        h, m, s = dateStr.split(":")
+        return int(round((int(h) * 3600 + int(m) * 60 + float(s)) * 1000))
+
     @staticmethod
     def _seconds_to_time(sec):
         """Returns a string representation of the length of time provided.
@@ -136,8 +146,10 @@ class QgsUtils(object):
     def showUserAndLogMessage(
         before, text="", level=QGis.Info, duration=3, onlyLog=False
     ):
-        """ Show user & log info/warning/error messages """
-        if not onlyLog:
+        """Show user & log info/warning/error messages.
+        Messages from background tasks and threads are only logged.
+        """
+        if not onlyLog and QgsUtils.isMainThread():
             iface.messageBar().popWidget()
             iface.messageBar().pushMessage(before, text, level=level, duration=duration)
         if level == QGis.Info:
@@ -148,6 +160,16 @@ class QgsUtils(object):
             log.error(text)
         return
 
+    @staticmethod
+    def isMainThread():
+        """ True when called from the GUI thread of QGIS """
+        app = QCoreApplication.instance()
+        return (
+            iface is not None
+            and app is not None
+            and QThread.currentThread() == app.thread()
+        )
+
     @staticmethod
     def removeFile(path):
         try: